@@ -2,9 +2,11 @@ from django.urls import path
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count
+from django.db.models import Sum
 from authentication.models import User, InstructorRequest
-from courses.models import Course, Enrollment
+from courses.models import Course
+from analytics.models import CourseDailyRollup
+from notifications.presence import presence
 
 
 @api_view(['GET'])
@@ -20,11 +22,12 @@ def summary(request):
         status='pending').count()
     pending_courses = Course.objects.filter(status='pending').count()
 
-    # Completions per course: approximate by enrollments for now (placeholder)
+    # Completions per course from the daily rollups
     completions = (
-        Enrollment.objects
+        CourseDailyRollup.objects
         .values('course_id')
-        .annotate(count=Count('id'))
+        .annotate(count=Sum('completions'))
+        .filter(count__gt=0)
         .order_by('-count')[:20]
     )
     completions_by_course = {
@@ -41,6 +44,7 @@ def summary(request):
             'courses': pending_courses,
         },
         'completions_by_course': completions_by_course,
+        'online': presence.online_counts(),
     })
 
 
@@ -22,11 +22,19 @@ try:
     from channels.routing import ProtocolTypeRouter, URLRouter
     from channels.auth import AuthMiddlewareStack
     from notifications.routing import websocket_urlpatterns
+    from notifications.routing import http_urlpatterns as notification_http_urlpatterns
+    from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns
+    from chat.routing import http_urlpatterns as chat_http_urlpatterns
+    from django.urls import re_path
 
     application = ProtocolTypeRouter({
-        "http": django_asgi_app,
+        # Long-poll/SSE endpoints bypass Django; everything else goes to it
+        "http": URLRouter(
+            chat_http_urlpatterns + notification_http_urlpatterns
+            + [re_path(r"", django_asgi_app)]
+        ),
         "websocket": AuthMiddlewareStack(
-            URLRouter(websocket_urlpatterns)
+            URLRouter(websocket_urlpatterns + chat_websocket_urlpatterns)
         ),
     })
 except ImportError:
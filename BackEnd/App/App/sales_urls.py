@@ -2,12 +2,12 @@ from django.urls import path
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDay, TruncWeek
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek
 from django.utils import timezone
 from datetime import timedelta
 
-from courses.models import Course, Enrollment
+from analytics.models import CourseDailyRollup, CategoryDailyRollup
 
 
 def _forbidden_if_not_admin(request):
@@ -23,11 +23,12 @@ def sales_per_course(request):
     if forbidden:
         return forbidden
 
-    # Count paid enrollments per course and sum revenue as sum of course.price over enrollments
+    # Completed payments and revenue per course from the Transaction ledger,
+    # read from the daily rollups maintained by `manage.py rollup_analytics`
     rows = (
-        Enrollment.objects.select_related("course")
+        CourseDailyRollup.objects
         .values("course_id", "course__title")
-        .annotate(sales=Count("id"), revenue=Sum("course__price"))
+        .annotate(sales=Sum("sales"), revenue=Sum("revenue"))
         .order_by("-sales")[:200]
     )
 
@@ -50,15 +51,15 @@ def sales_per_category(request):
         return forbidden
 
     rows = (
-        Enrollment.objects.select_related("course", "course__category")
-        .values("course__category__name")
-        .annotate(sales=Count("id"), revenue=Sum("course__price"))
+        CategoryDailyRollup.objects
+        .values("category__name")
+        .annotate(sales=Sum("sales"), revenue=Sum("revenue"))
         .order_by("-sales")
     )
 
     data = [
         {
-            "name": r["course__category__name"] or "Uncategorized",
+            "name": r["category__name"] or "Uncategorized",
             "value": int(r["sales"] or 0),  # primary for pie percentage
             "sales": int(r["sales"] or 0),
             "revenue": float(r["revenue"] or 0),
@@ -76,35 +77,25 @@ def revenue_trends(request):
         return forbidden
 
     range_param = request.query_params.get("range", "last_month")
-    now = timezone.now()
+    today = timezone.localdate()
 
+    # Daily totals come from the category rollups (one row per category per day)
     if range_param == "last_3_months":
-        start = now - timedelta(days=90)
         qs = (
-            Enrollment.objects.filter(enrolled_at__gte=start)
-            .annotate(period=TruncWeek("enrolled_at"))
+            CategoryDailyRollup.objects.filter(day__gte=today - timedelta(days=90))
+            .annotate(period=TruncWeek("day"))
             .values("period")
-            .annotate(revenue=Sum("course__price"))
+            .annotate(revenue=Sum("revenue"))
+            .order_by("period")
+        )
+    else:
+        # Default: last month daily
+        qs = (
+            CategoryDailyRollup.objects.filter(day__gte=today - timedelta(days=30))
+            .values(period=F("day"))
+            .annotate(revenue=Sum("revenue"))
             .order_by("period")
         )
-        points = [
-            {
-                "date": (row["period"].date() if hasattr(row["period"], "date") else row["period"]).isoformat(),
-                "revenue": float(row["revenue"] or 0),
-            }
-            for row in qs
-        ]
-        return Response(points)
-
-    # Default: last month daily
-    start = now - timedelta(days=30)
-    qs = (
-        Enrollment.objects.filter(enrolled_at__gte=start)
-        .annotate(period=TruncDay("enrolled_at"))
-        .values("period")
-        .annotate(revenue=Sum("course__price"))
-        .order_by("period")
-    )
     points = [
         {
             "date": (row["period"].date() if hasattr(row["period"], "date") else row["period"]).isoformat(),
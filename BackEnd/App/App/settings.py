@@ -58,6 +58,7 @@ INSTALLED_APPS = [
     'cloudinary',
     'cloudinary_storage',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # pg_trgm lookups for course search
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -71,7 +72,10 @@ INSTALLED_APPS = [
     'stripe',
     'chatBot',
     'chat',  # Chat system for user-admin communication
-    'transactions'
+    'transactions',
+    'jobs',  # Database-backed background job queue
+    'uploads',  # Resumable chunked uploads
+    'analytics',  # Daily rollups for the admin dashboards
 ]
 
 MIDDLEWARE = [
@@ -200,7 +204,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.principal.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -328,6 +332,106 @@ REDIS_USERNAME = os.environ.get('REDIS_USERNAME', 'default')
 REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD', '')
 REDIS_DB = int(os.environ.get('REDIS_DB', 0))
 
+# Cache configuration
+# In-process LocMemCache (LRU eviction + TTL) by default. Set
+# CACHE_BACKEND=redis to share cached catalog responses and their version
+# counters across workers using the Redis settings above. The catalog version
+# counters live in their own 'catalog_versions' alias so that culling cached
+# responses can never evict them.
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 60))
+if os.environ.get('CACHE_BACKEND', '').lower() == 'redis':
+    _cache_redis_url = os.environ.get('REDIS_URL')
+    if not _cache_redis_url:
+        _cache_scheme = 'rediss' if os.environ.get(
+            'REDIS_SSL', 'false').lower() == 'true' else 'redis'
+        _cache_redis_url = f"{_cache_scheme}://{REDIS_USERNAME}:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _cache_redis_url,
+            'TIMEOUT': CATALOG_CACHE_TTL,
+        },
+        'catalog_versions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _cache_redis_url,
+            'TIMEOUT': None,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'educational-platform',
+            'TIMEOUT': CATALOG_CACHE_TTL,
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+        'catalog_versions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'catalog-versions',
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': 1000000},
+        },
+    }
+
+# Background jobs (see jobs.queue). Every deployment must run at least one
+# `manage.py run_worker` process next to the web process (see Procfile and
+# railway.worker.toml); without one, queued jobs are never delivered.
+# JOBS_ALWAYS_EAGER runs tasks inline, e.g. for local development without a
+# worker. Uploads are staged in JOBS_STAGING_DIR, which must be shared by the
+# web and worker processes.
+JOBS_ALWAYS_EAGER = os.environ.get(
+    'JOBS_ALWAYS_EAGER', 'false').lower() == 'true'
+JOBS_STAGING_DIR = os.environ.get(
+    'JOBS_STAGING_DIR', str(BASE_DIR / 'job_staging'))
+
+# Resumable chunked uploads (see uploads.storage). Partial files live in the
+# upload storage backend until a job publishes them to Cloudinary.
+UPLOAD_STORAGE = {
+    'BACKEND': os.environ.get('UPLOAD_STORAGE_BACKEND', 'uploads.storage.LocalUploadStorage'),
+    'OPTIONS': {
+        'location': os.environ.get('UPLOAD_STORAGE_DIR', str(BASE_DIR / 'upload_staging')),
+    },
+}
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 2 * 1024 ** 3))
+UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get(
+    'UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 ** 2))
+
+# Seconds a token's user row is cached (see authentication.principal); never
+# longer than the token itself is valid. User saves only clear the entry in a
+# shared cache: with the per-process LocMemCache the other workers would keep
+# a deactivated user or an old role until the TTL runs out, so it stays at a
+# few seconds unless CACHE_BACKEND=redis.
+_SHARED_CACHE = 'locmem' not in CACHES['default']['BACKEND']
+AUTH_PRINCIPAL_CACHE_TTL = int(os.environ.get(
+    'AUTH_PRINCIPAL_CACHE_TTL', 300 if _SHARED_CACHE else 5))
+
+# Large exam item analyses (see exams.analysis) are built by the job worker,
+# which hands the result to the web processes through the cache. That only
+# works with a shared cache, so with LocMemCache they are built in the request.
+ANALYSIS_BUILD_IN_WORKER = _SHARED_CACHE
+
+# Longest a long-poll request (?wait=) may hold its connection, in seconds
+# (chat and notification poll endpoints)
+LONG_POLL_MAX_WAIT = int(os.environ.get('LONG_POLL_MAX_WAIT', 30))
+
+
+# Online presence (see notifications.presence). 'redis' is required whenever
+# more than one process serves traffic (gunicorn workers, or a WSGI dashboard
+# beside ASGI sockets): 'memory' only counts sockets held by the same process.
+PRESENCE_REDIS_URL = os.environ.get('PRESENCE_REDIS_URL') or os.environ.get('REDIS_URL')
+PRESENCE_BACKEND = os.environ.get(
+    'PRESENCE_BACKEND', 'redis' if PRESENCE_REDIS_URL else 'memory').lower()
+PRESENCE_TIMEOUT = int(os.environ.get('PRESENCE_TIMEOUT', 60))
+PRESENCE_BROADCAST_INTERVAL = float(os.environ.get('PRESENCE_BROADCAST_INTERVAL', 1.0))
+
+# Notification retention (see notifications.retention): read notifications
+# older than NOTIFICATION_RETENTION_DAYS leave the live table; bursts of at
+# least NOTIFICATION_DIGEST_MIN_SIZE same-type notifications per receiver
+# and hour are folded into a digest once NOTIFICATION_DIGEST_AFTER_HOURS old
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+NOTIFICATION_DIGEST_AFTER_HOURS = int(os.environ.get('NOTIFICATION_DIGEST_AFTER_HOURS', 24))
+NOTIFICATION_DIGEST_MIN_SIZE = int(os.environ.get('NOTIFICATION_DIGEST_MIN_SIZE', 5))
+
 
 # Email settings
 EMAIL_BACKEND = os.environ.get(
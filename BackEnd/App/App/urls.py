@@ -59,4 +59,6 @@ urlpatterns = [
     # Payment transactions
     path('api/transactions/', include('transactions.urls')),
     path('api/instructor/', include('App.instructor_urls')),
+    # Resumable chunked uploads
+    path('api/uploads/', include('uploads.urls')),
 ]
@@ -0,0 +1,30 @@
+from django.contrib import admin
+from .models import CourseDailyRollup, CategoryDailyRollup, InstructorDailyRollup, RollupWatermark
+
+
+@admin.register(CourseDailyRollup)
+class CourseDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'course', 'sales',
+                    'revenue', 'enrollments', 'completions']
+    list_filter = ['day']
+    raw_id_fields = ['course']
+
+
+@admin.register(CategoryDailyRollup)
+class CategoryDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'category', 'sales',
+                    'revenue', 'enrollments', 'completions']
+    list_filter = ['day']
+
+
+@admin.register(InstructorDailyRollup)
+class InstructorDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'instructor', 'sales',
+                    'revenue', 'enrollments', 'completions']
+    list_filter = ['day']
+    raw_id_fields = ['instructor']
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_id', 'last_timestamp', 'updated_at']
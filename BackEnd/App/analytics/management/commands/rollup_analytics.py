@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollup import DEFAULT_LAG, backfill, rollup_incremental
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = ('Update the daily analytics rollups from new enrollments and completions. '
+            'Run it periodically (e.g. every few minutes from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Rebuild every day instead of only new rows; without --since/--until this also resets the watermarks'
+        )
+        parser.add_argument(
+            '--since',
+            type=_parse_day,
+            help='With --backfill, first day to rebuild (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--until',
+            type=_parse_day,
+            help='With --backfill, last day to rebuild (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--lag-seconds',
+            type=int,
+            default=int(DEFAULT_LAG.total_seconds()),
+            help='Ignore rows newer than this many seconds (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            days = backfill(options['since'], options['until'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Backfilled rollups for {days} day(s)'))
+            return
+        if options['since'] or options['until']:
+            raise CommandError('--since/--until require --backfill')
+        days = rollup_incremental(timedelta(seconds=options['lag_seconds']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated rollups for {days} day(s)'))
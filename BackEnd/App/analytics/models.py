@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import models
+from courses.models import Course, Category
+
+
+class DailyRollup(models.Model):
+    """
+    Per-day metrics written by `manage.py rollup_analytics`. `sales` and
+    `revenue` count/sum completed Transactions created that day;
+    `enrollments` and `completions` come from Enrollment.
+    """
+    day = models.DateField()
+    sales = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    enrollments = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class CourseDailyRollup(DailyRollup):
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='daily_rollups')
+
+    class Meta:
+        db_table = 'analytics_course_daily'
+        unique_together = ('day', 'course')
+        indexes = [models.Index(fields=['course', 'day'])]
+
+
+class CategoryDailyRollup(DailyRollup):
+    # NULL groups uncategorized courses
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_rollups')
+
+    class Meta:
+        db_table = 'analytics_category_daily'
+        indexes = [models.Index(fields=['day', 'category'])]
+
+
+class InstructorDailyRollup(DailyRollup):
+    instructor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_rollups')
+
+    class Meta:
+        db_table = 'analytics_instructor_daily'
+        indexes = [models.Index(fields=['instructor', 'day'])]
+
+
+class RollupWatermark(models.Model):
+    """How far each rollup source has been processed."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_watermarks'
+
+
+class DirtyRollupDay(models.Model):
+    """A day whose rollups must be recomputed (e.g. an enrollment was deleted)."""
+    day = models.DateField(primary_key=True)
+
+    class Meta:
+        db_table = 'analytics_dirty_days'
@@ -0,0 +1,194 @@
+"""
+Daily analytics rollups for the admin dashboards.
+
+``rollup_days`` recomputes every rollup row for a set of days straight from
+``Enrollment`` and the ``Transaction`` ledger (delete + insert, so it is
+idempotent). ``rollup_incremental`` only touches days that gained
+enrollments, completions or payment changes since the stored watermarks,
+plus days flagged dirty by deletions (see analytics.signals).
+``backfill`` rebuilds a whole date range.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from courses.models import Course, Enrollment
+from transactions.analytics import daily_course_ledger, day_ranges
+from transactions.models import Transaction
+from .models import (CourseDailyRollup, CategoryDailyRollup, InstructorDailyRollup,
+                     RollupWatermark, DirtyRollupDay)
+
+ENROLLMENT_WATERMARK = 'enrollments'
+COMPLETION_WATERMARK = 'completions'
+TRANSACTION_WATERMARK = 'transactions'
+DAYS_PER_BATCH = 31
+# Rows newer than this may still belong to open transactions; leave them
+# for the next run so the watermark never skips a late commit
+DEFAULT_LAG = timedelta(minutes=1)
+
+
+def _course_rows(days):
+    """
+    Aggregate metrics per (day, course) for ``days``: sales and revenue from
+    the Transaction ledger, enrollments and completions from Enrollment.
+    """
+    enrolled = (
+        Enrollment.objects.filter(day_ranges(days, 'enrolled_at'))
+        .annotate(day=TruncDate('enrolled_at'))
+        .values('day', 'course_id')
+        .annotate(enrollments=Count('id'))
+        .order_by()
+    )
+    completed = (
+        Enrollment.objects.filter(day_ranges(days, 'completed_at'))
+        .annotate(day=TruncDate('completed_at'))
+        .values('day', 'course_id')
+        .annotate(completions=Count('id'))
+        .order_by()
+    )
+    rows = {}
+
+    def row_for(r):
+        return rows.setdefault((r['day'], r['course_id']), {
+            'day': r['day'], 'course_id': r['course_id'], 'sales': 0,
+            'revenue': Decimal(0), 'enrollments': 0, 'completions': 0})
+
+    for r in daily_course_ledger(days):
+        row = row_for(r)
+        row['sales'] = r['sales']
+        row['revenue'] = r['revenue']
+    for r in enrolled:
+        row_for(r)['enrollments'] = r['enrollments']
+    for r in completed:
+        row_for(r)['completions'] = r['completions']
+
+    courses = {
+        c['id']: c for c in Course.objects.filter(
+            id__in={course_id for _, course_id in rows}).values('id', 'category_id', 'instructor_id')
+    }
+    for row in rows.values():
+        course = courses.get(row['course_id'], {})
+        row['category_id'] = course.get('category_id')
+        row['instructor_id'] = course.get('instructor_id')
+    return rows.values()
+
+
+def _rollup_batch(days):
+    course_rollups = []
+    by_category = defaultdict(lambda: defaultdict(int))
+    by_instructor = defaultdict(lambda: defaultdict(int))
+    for row in _course_rows(days):
+        metrics = {
+            'sales': row['sales'],
+            'revenue': row['revenue'],
+            'enrollments': row['enrollments'],
+            'completions': row['completions'],
+        }
+        course_rollups.append(CourseDailyRollup(
+            day=row['day'], course_id=row['course_id'], **metrics))
+        for totals in (by_category[(row['day'], row['category_id'])],
+                       by_instructor[(row['day'], row['instructor_id'])]):
+            for name, value in metrics.items():
+                totals[name] += value
+
+    with transaction.atomic():
+        for model in (CourseDailyRollup, CategoryDailyRollup, InstructorDailyRollup):
+            model.objects.filter(day__in=days).delete()
+        CourseDailyRollup.objects.bulk_create(course_rollups, batch_size=1000)
+        CategoryDailyRollup.objects.bulk_create([
+            CategoryDailyRollup(day=day, category_id=category_id, **totals)
+            for (day, category_id), totals in by_category.items()
+        ], batch_size=1000)
+        InstructorDailyRollup.objects.bulk_create([
+            InstructorDailyRollup(
+                day=day, instructor_id=instructor_id, **totals)
+            for (day, instructor_id), totals in by_instructor.items()
+        ], batch_size=1000)
+
+
+def rollup_days(days):
+    """Recompute the rollups of ``days``; returns the number of days processed."""
+    days = sorted(set(days))
+    for i in range(0, len(days), DAYS_PER_BATCH):
+        _rollup_batch(days[i:i + DAYS_PER_BATCH])
+    return len(days)
+
+
+def rollup_incremental(lag=DEFAULT_LAG):
+    """Roll up only what changed since the last run."""
+    cutoff = timezone.now() - lag
+    enrollment_mark, _ = RollupWatermark.objects.get_or_create(
+        name=ENROLLMENT_WATERMARK)
+    completion_mark, _ = RollupWatermark.objects.get_or_create(
+        name=COMPLETION_WATERMARK)
+    transaction_mark, _ = RollupWatermark.objects.get_or_create(
+        name=TRANSACTION_WATERMARK)
+
+    days = set()
+    last_id = Enrollment.objects.filter(
+        id__gt=enrollment_mark.last_id, enrolled_at__lte=cutoff).aggregate(m=Max('id'))['m']
+    if last_id:
+        days.update(Enrollment.objects.filter(
+            id__gt=enrollment_mark.last_id, id__lte=last_id).dates('enrolled_at', 'day'))
+
+    completions = Enrollment.objects.filter(completed_at__lte=cutoff)
+    if completion_mark.last_timestamp:
+        completions = completions.filter(
+            completed_at__gt=completion_mark.last_timestamp)
+    days.update(completions.dates('completed_at', 'day'))
+
+    # New payments and status changes (e.g. refunds) touch updated_at
+    changed = Transaction.objects.filter(updated_at__lte=cutoff)
+    if transaction_mark.last_timestamp:
+        changed = changed.filter(
+            updated_at__gt=transaction_mark.last_timestamp)
+    days.update(changed.dates('created_at', 'day'))
+
+    dirty = list(DirtyRollupDay.objects.values_list('day', flat=True))
+    days.update(dirty)
+
+    processed = rollup_days(days)
+    if last_id:
+        enrollment_mark.last_id = last_id
+        enrollment_mark.save(update_fields=['last_id', 'updated_at'])
+    for mark in (completion_mark, transaction_mark):
+        mark.last_timestamp = cutoff
+        mark.save(update_fields=['last_timestamp', 'updated_at'])
+    DirtyRollupDay.objects.filter(day__in=dirty).delete()
+    return processed
+
+
+def backfill(since=None, until=None):
+    """
+    Rebuild every day in ``[since, until]`` (defaults: first enrollment or
+    payment, today). A full backfill also resets the watermarks.
+    """
+    started = timezone.now()
+    max_id = Enrollment.objects.aggregate(m=Max('id'))['m'] or 0
+    first = since
+    if first is None:
+        bounds = Enrollment.objects.aggregate(
+            first=Min('enrolled_at'), first_completed=Min('completed_at'))
+        bounds.update(Transaction.objects.aggregate(
+            first_payment=Min('created_at')))
+        candidates = [value for value in bounds.values() if value]
+        if not candidates:
+            return 0
+        first = timezone.localdate(min(candidates))
+    last = until or timezone.localdate()
+    days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+    processed = rollup_days(days)
+
+    if since is None and until is None:
+        RollupWatermark.objects.update_or_create(
+            name=ENROLLMENT_WATERMARK, defaults={'last_id': max_id})
+        for name in (COMPLETION_WATERMARK, TRANSACTION_WATERMARK):
+            RollupWatermark.objects.update_or_create(
+                name=name, defaults={'last_timestamp': started})
+        DirtyRollupDay.objects.all().delete()
+    return processed
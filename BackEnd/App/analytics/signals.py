@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from courses.models import Enrollment
+from transactions.models import Transaction
+from .models import DirtyRollupDay
+
+
+@receiver(post_delete, sender=Enrollment)
+def mark_rollup_days_dirty(sender, instance, **kwargs):
+    # Deletions leave no row behind for the watermarks to find
+    for moment in (instance.enrolled_at, instance.completed_at):
+        if moment:
+            DirtyRollupDay.objects.get_or_create(
+                day=timezone.localdate(moment))
+
+
+@receiver(post_delete, sender=Transaction)
+def mark_payment_day_dirty(sender, instance, **kwargs):
+    if instance.created_at:
+        DirtyRollupDay.objects.get_or_create(
+            day=timezone.localdate(instance.created_at))
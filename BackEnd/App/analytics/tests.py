@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from courses.models import Category, Course, Enrollment
+from transactions.models import Transaction
+from .models import CourseDailyRollup, CategoryDailyRollup, InstructorDailyRollup
+from .rollup import backfill, rollup_incremental
+
+
+class AnalyticsRollupTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='admin')
+        self.instructor = User.objects.create_user(
+            username='inst', email='inst@example.com', password='pw', role='instructor')
+        self.category = Category.objects.create(name='Programming')
+        self.paid = Course.objects.create(
+            title='Django', description='d', instructor=self.instructor,
+            category=self.category, price=20, status='approved')
+        self.free = Course.objects.create(
+            title='Intro', description='d', instructor=self.instructor, price=0, status='approved')
+        self.students = [
+            User.objects.create_user(
+                username=f's{i}', email=f's{i}@example.com', password='pw', role='student')
+            for i in range(3)
+        ]
+        self.yesterday = timezone.now() - timedelta(days=1)
+
+    def _enroll(self, student, course, when=None, completed=None, payment_status='completed'):
+        when = when or self.yesterday
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        Enrollment.objects.filter(id=enrollment.id).update(
+            enrolled_at=when, completed_at=completed)
+        if course.price:
+            payment = Transaction.objects.create(
+                transaction_id=f'TXN_{enrollment.id}', student=student, course=course,
+                amount=course.price, payment_status=payment_status)
+            Transaction.objects.filter(id=payment.id).update(created_at=when)
+        return enrollment
+
+    def test_backfill_builds_course_category_and_instructor_rows(self):
+        self._enroll(self.students[0], self.paid, completed=self.yesterday)
+        self._enroll(self.students[1], self.paid)
+        self._enroll(self.students[2], self.paid, payment_status='refunded')
+        self._enroll(self.students[0], self.free)
+        backfill()
+
+        day = timezone.localdate(self.yesterday)
+        paid = CourseDailyRollup.objects.get(day=day, course=self.paid)
+        self.assertEqual((paid.sales, paid.enrollments,
+                         paid.completions), (2, 3, 1))
+        self.assertEqual(paid.revenue, 40)
+        free = CourseDailyRollup.objects.get(day=day, course=self.free)
+        self.assertEqual((free.sales, free.enrollments), (0, 1))
+        self.assertEqual(CategoryDailyRollup.objects.get(
+            day=day, category=self.category).enrollments, 3)
+        self.assertEqual(CategoryDailyRollup.objects.get(
+            day=day, category=None).enrollments, 1)
+        self.assertEqual(InstructorDailyRollup.objects.get(
+            day=day, instructor=self.instructor).enrollments, 4)
+
+    def test_incremental_only_touches_new_days_and_handles_deletes(self):
+        self._enroll(self.students[0], self.paid)
+        backfill()
+        old = timezone.now() - timedelta(days=5)
+        self._enroll(self.students[1], self.paid, when=old)
+        self.assertEqual(rollup_incremental(timedelta()), 1)
+        self.assertEqual(CourseDailyRollup.objects.get(
+            day=timezone.localdate(old)).enrollments, 1)
+
+        Transaction.objects.filter(student=self.students[1]).update(
+            payment_status='refunded', updated_at=timezone.now())
+        rollup_incremental(timedelta())
+        self.assertEqual(CourseDailyRollup.objects.get(
+            day=timezone.localdate(old)).revenue, 0)
+
+        Enrollment.objects.filter(student=self.students[0]).delete()
+        Transaction.objects.filter(student=self.students[0]).delete()
+        self.assertEqual(rollup_incremental(timedelta()), 1)
+        self.assertFalse(CourseDailyRollup.objects.filter(
+            day=timezone.localdate(self.yesterday)).exists())
+        self.assertEqual(rollup_incremental(timedelta()), 0)
+
+    def test_dashboard_reads_rollups(self):
+        self._enroll(self.students[0], self.paid)
+        self._enroll(self.students[1], self.paid)
+        backfill()
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        res = client.get('/api/admin/sales/courses/')
+        self.assertEqual(
+            res.data, [{'course': 'Django', 'sales': 2, 'revenue': 40.0}])
+        res = client.get('/api/admin/sales/categories/')
+        self.assertEqual(res.data[0]['name'], 'Programming')
+        res = client.get('/api/admin/sales/revenue/')
+        self.assertEqual(res.data, [{'date': timezone.localdate(
+            self.yesterday).isoformat(), 'revenue': 40.0}])
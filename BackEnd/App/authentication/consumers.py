@@ -0,0 +1,84 @@
+import json
+import re
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.http import AsyncHttpConsumer
+from django.conf import settings
+
+from .principal import user_from_token
+
+
+class JWTHttpConsumer(AsyncHttpConsumer):
+    """
+    Base for HTTP endpoints served by the ASGI router ahead of Django
+    (long-poll, server-sent events), where a held request must not pin a
+    worker thread. Provides what Django's middleware would otherwise do:
+    Bearer-token authentication, CORS headers and preflight replies.
+    """
+
+    # EventSource can't set headers, so streams may pass ?token= instead
+    allow_query_token = False
+
+    @property
+    def query_params(self):
+        if not hasattr(self, '_query_params'):
+            self._query_params = {key: values[-1] for key, values in parse_qs(
+                self.scope['query_string'].decode()).items()}
+        return self._query_params
+
+    def header(self, name):
+        return dict(self.scope.get('headers', [])).get(name.encode(), b'').decode()
+
+    @database_sync_to_async
+    def authenticate(self):
+        """The active user for the request's access token, or None."""
+        scheme, _, token = self.header('authorization').partition(' ')
+        if scheme == 'Bearer':
+            return user_from_token(token)
+        if self.allow_query_token:
+            return user_from_token(self.query_params.get('token'))
+        return None
+
+    def cors_headers(self):
+        """CORS headers for an allowed Origin, matching the corsheaders settings."""
+        origin = self.header('origin')
+        allowed = origin and (
+            getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False)
+            or origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', [])
+            or any(re.match(pattern, origin)
+                   for pattern in getattr(settings, 'CORS_ALLOWED_ORIGIN_REGEXES', [])))
+        if not allowed:
+            return []
+        headers = [(b'Access-Control-Allow-Origin', origin.encode()), (b'Vary', b'Origin')]
+        if getattr(settings, 'CORS_ALLOW_CREDENTIALS', False):
+            headers.append((b'Access-Control-Allow-Credentials', b'true'))
+        return headers
+
+    async def send_preflight(self):
+        await self.send_response(200, b'', headers=self.cors_headers() + [
+            (b'Access-Control-Allow-Methods', b'GET, OPTIONS'),
+            (b'Access-Control-Allow-Headers', b'authorization, content-type, last-event-id'),
+        ])
+
+    async def send_json_response(self, status, content):
+        await self.send_response(
+            status, json.dumps(content).encode(),
+            headers=[(b'Content-Type', b'application/json')] + self.cors_headers())
+
+    async def handle_common(self):
+        """
+        Answer preflights, non-GET methods and unauthenticated requests.
+        Returns the user, or None once a response has been sent.
+        """
+        if self.scope['method'] == 'OPTIONS':
+            await self.send_preflight()
+            return None
+        if self.scope['method'] != 'GET':
+            await self.send_json_response(405, {'error': 'Method not allowed'})
+            return None
+        user = await self.authenticate()
+        if not user:
+            await self.send_json_response(
+                401, {'error': 'Authentication credentials were not provided or are invalid'})
+        return user
@@ -0,0 +1,75 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import User
+from authentication.principal import invalidate_principal, stats
+from notifications.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    help = ('Benchmark notification WebSocket connects/sec during a reconnect storm, '
+            'with and without the principal cache')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=200,
+            help='Distinct users reconnecting (default: 200)'
+        )
+        parser.add_argument(
+            '--reconnects',
+            type=int,
+            default=5,
+            help='Connects per user (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        # Not wrapped in a rolled-back transaction: database_sync_to_async
+        # closes connections that are inside one. Clean up explicitly.
+        try:
+            self._run(options['users'], options['reconnects'])
+        finally:
+            User.objects.filter(username__startswith='bench_ws_').delete()
+
+    def _run(self, users, reconnects):
+        User.objects.bulk_create([
+            User(username=f'bench_ws_{i}', email=f'bench_ws_{i}@example.com', role='student')
+            for i in range(users)
+        ])
+        tokens = [(user.id, str(AccessToken.for_user(user)))
+                  for user in User.objects.filter(username__startswith='bench_ws_')]
+        application = URLRouter(websocket_urlpatterns)
+
+        async def connect(token):
+            communicator = WebsocketCommunicator(application, '/ws/notifications/')
+            await communicator.connect()
+            await communicator.send_json_to({'type': 'auth', 'token': token})
+            response = await communicator.receive_json_from()
+            assert response['type'] == 'auth_success', response
+            await communicator.disconnect()
+
+        @async_to_sync
+        async def storm(cached):
+            for _ in range(reconnects):
+                for user_id, token in tokens:
+                    if not cached:
+                        invalidate_principal(user_id)
+                    await connect(token)
+
+        self.stdout.write(f"{'mode':>9} {'connects/s':>11} {'cache hits':>11} {'misses':>7}")
+        for cached in (False, True):
+            stats.clear()
+            for user_id, _ in tokens:
+                invalidate_principal(user_id)
+            started = time.perf_counter()
+            storm(cached)
+            rate = users * reconnects / (time.perf_counter() - started)
+            self.stdout.write(
+                f"{'cached' if cached else 'uncached':>9} {rate:>11.0f} "
+                f"{stats['cache_hits']:>11} {stats['cache_misses']:>7}")
@@ -0,0 +1,100 @@
+"""
+Cached token-to-user resolution shared by DRF and the WebSocket consumers.
+
+JWTs are still verified on every request (signature and expiry are local
+checks); what is cached is the user row the token points to, under
+``auth:principal:<user_id>``, for at most AUTH_PRINCIPAL_CACHE_TTL seconds
+and never beyond the expiry of the token that loaded it. User saves and
+deletes drop the entry (see authentication.signals), so deactivation and
+role changes apply on the next request. That only reaches every worker
+through a shared cache; with the default per-process LocMemCache the TTL
+defaults to a few seconds instead (see settings). Reconnect storms after a
+deploy then cost one query per user instead of one per socket.
+
+``stats`` counts cache hits/misses and token failures in-process.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+PRINCIPAL_CACHE_TTL = getattr(settings, 'AUTH_PRINCIPAL_CACHE_TTL', 5)
+_PRINCIPAL_PREFIX = 'auth:principal:'
+
+stats = Counter()
+
+
+def _principal_key(user_id):
+    return f'{_PRINCIPAL_PREFIX}{user_id}'
+
+
+def get_principal(user_id, expires_at=None):
+    """The user with ``user_id`` (or None), cached until ``expires_at`` at the latest."""
+    key = _principal_key(user_id)
+    user = cache.get(key)
+    if user is not None:
+        stats['cache_hits'] += 1
+        return user
+    stats['cache_misses'] += 1
+    # The password hash stays out of the cache; it loads on access
+    user = get_user_model().objects.defer('password').filter(
+        **{api_settings.USER_ID_FIELD: user_id}).first()
+    if user is None:
+        return None
+    ttl = PRINCIPAL_CACHE_TTL
+    if expires_at:
+        ttl = min(ttl, int(expires_at - time.time()))
+    if ttl > 0:
+        cache.set(key, user, ttl)
+    return user
+
+
+def invalidate_principal(user_id):
+    cache.delete(_principal_key(user_id))
+
+
+def user_from_token(raw_token):
+    """Active user for a raw access token, or None (for WebSocket auth frames)."""
+    if not raw_token:
+        stats['missing_tokens'] += 1
+        return None
+    try:
+        token = AccessToken(raw_token)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        stats['invalid_tokens'] += 1
+        return None
+    user = get_principal(user_id, token.get('exp'))
+    if user is None or not user.is_active:
+        stats['rejected_users'] += 1
+        return None
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the token's user through get_principal()."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_principal(user_id, validated_token.get('exp'))
+        if user is None:
+            stats['rejected_users'] += 1
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            stats['rejected_users'] += 1
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Defer to the stock checks, which compare the password hash
+            return super().get_user(validated_token)
+        return user
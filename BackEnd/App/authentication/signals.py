@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .principal import invalidate_principal
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def drop_cached_principal(sender, instance, **kwargs):
+    """Deactivation, role changes etc. must not be served from the cache."""
+    invalidate_principal(instance.pk)
+    # Again after commit, in case a request re-cached the old row meanwhile
+    transaction.on_commit(lambda: invalidate_principal(instance.pk))
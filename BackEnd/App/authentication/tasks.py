@@ -0,0 +1,75 @@
+from django.core.files import File
+from django.core.files.storage import default_storage
+from cloudinary.uploader import upload as cloudinary_upload
+
+from jobs.queue import task, enqueue
+from jobs.staging import open_staged, discard_staged
+from notifications.views import send_bulk_notification
+from .models import User, InstructorRequest, IdentityVerificationRequest
+
+
+def _upload_staged(staged_name, original_name, folder):
+    """Upload a staged file to Cloudinary, falling back to default storage."""
+    with open_staged(staged_name) as fh:
+        try:
+            result = cloudinary_upload(fh, folder=folder)
+            if result and 'secure_url' in result:
+                return result['secure_url'], str(result.get('resource_type'))
+        except Exception:
+            # proceed to storage fallback
+            fh.seek(0)
+        stored_name = default_storage.save(
+            f"{folder}/{original_name}", File(fh, name=original_name))
+        return default_storage.url(stored_name), None
+
+
+@task('authentication.upload_instructor_documents', max_attempts=3)
+def upload_instructor_documents(user_id, files):
+    """Upload staged instructor request documents, then notify admins."""
+    ir = InstructorRequest.objects.select_related('user').get(user_id=user_id)
+    uploaded_urls = []
+    primary_photo_url = None
+    for f in files:
+        url, resource_type = _upload_staged(
+            f['staged'], f['name'], f"instructors/{user_id}")
+        uploaded_urls.append(url)
+        is_image = resource_type == 'image' if resource_type else \
+            str(f.get('content_type') or '').startswith('image/')
+        if not primary_photo_url and is_image:
+            primary_photo_url = url
+    if not primary_photo_url and uploaded_urls:
+        primary_photo_url = uploaded_urls[0]
+
+    ir.documents = uploaded_urls
+    ir.photo_url = primary_photo_url or ir.photo_url
+    ir.save(update_fields=['documents', 'photo_url'])
+    # Notify from its own job: a failure there must not retry the uploads
+    # after their staged files are gone
+    enqueue('authentication.notify_instructor_request', user_id=ir.user_id)
+    for f in files:
+        discard_staged(f['staged'])
+
+
+def notify_admins_of_instructor_request(user):
+    send_bulk_notification(
+        sender_id=user.id,
+        receiver_ids=User.objects.filter(
+            role='admin').values_list('id', flat=True),
+        notification_type='announcement',
+        title='Instructor Request',
+        message=f"{user.get_full_name() or user.email} requested to become an instructor."
+    )
+
+
+@task('authentication.notify_instructor_request')
+def notify_instructor_request(user_id):
+    notify_admins_of_instructor_request(User.objects.get(id=user_id))
+
+
+@task('authentication.upload_identity_photo', max_attempts=3)
+def upload_identity_photo(user_id, staged, name):
+    """Upload a staged ID photo and attach it to the user's verification request."""
+    url, _ = _upload_staged(staged, name, f"id_verifications/{user_id}")
+    IdentityVerificationRequest.objects.filter(
+        user_id=user_id).update(id_photo_url=url)
+    discard_staged(staged)
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import User
+from authentication.principal import stats, user_from_token
+
+
+class PrincipalCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password='pw', role='student')
+        self.token = str(AccessToken.for_user(self.user))
+
+    def test_token_user_is_cached_until_the_user_changes(self):
+        self.assertEqual(user_from_token(self.token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_from_token(self.token).role, 'student')
+
+        self.user.role = 'instructor'
+        self.user.save(update_fields=['role'])
+        self.assertEqual(user_from_token(self.token).role, 'instructor')
+
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertIsNone(user_from_token(self.token))
+        self.assertIsNone(user_from_token('garbage'))
+
+    def test_drf_requests_share_the_cache(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        stats.clear()
+        for _ in range(3):
+            res = client.get('/api/chat/unread-count/')
+            self.assertEqual(res.status_code, 200)
+        self.assertEqual((stats['cache_misses'], stats['cache_hits']), (1, 2))
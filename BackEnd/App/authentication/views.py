@@ -17,13 +17,15 @@ from django.conf import settings
 from django.core.mail import send_mail
 from django.utils.http import urlencode
 from django.utils import timezone
-from notifications.views import send_notification
+from notifications.tasks import queue_notification
+from jobs.queue import enqueue
+from jobs.staging import stage_file
+from django.db import transaction
 from django.core.files.storage import default_storage
 from django.db.models import Q, Count
 from courses.models import Course, Enrollment
 from django.core.validators import validate_email as django_validate_email
 from django.core.exceptions import ValidationError as DjangoValidationError
-from cloudinary.uploader import upload as cloudinary_upload
 
 
 @api_view(['POST'])
@@ -172,34 +174,27 @@ def request_identity_verification(request):
     if not file:
         return Response({'error': 'No file provided'}, status=400)
 
-    # Try Cloudinary first; fallback to default storage
-    url = None
+    # Upload to Cloudinary in the background; the URL is filled in by the job
     try:
-        result = cloudinary_upload(
-            file, folder=f"id_verifications/{request.user.id}")
-        url = result.get('secure_url') if result else None
+        staged = stage_file(file)
     except Exception:
-        url = None
-    if not url:
-        try:
-            stored_name = default_storage.save(
-                f"id_verifications/{request.user.id}/{file.name}", file)
-            url = default_storage.url(stored_name)
-        except Exception:
-            return Response({'error': 'Upload failed'}, status=400)
+        return Response({'error': 'Upload failed'}, status=400)
 
     notes = request.data.get('notes', '')
 
-    ivr, _ = IdentityVerificationRequest.objects.update_or_create(
-        user=request.user,
-        defaults={
-            'id_photo_url': url,
-            'notes': notes,
-            'status': 'pending',
-            'reviewed_at': None,
-            'reviewed_by': None,
-        }
-    )
+    with transaction.atomic():
+        ivr, _ = IdentityVerificationRequest.objects.update_or_create(
+            user=request.user,
+            defaults={
+                'id_photo_url': '',
+                'notes': notes,
+                'status': 'pending',
+                'reviewed_at': None,
+                'reviewed_by': None,
+            }
+        )
+        enqueue('authentication.upload_identity_photo',
+                user_id=request.user.id, staged=staged, name=file.name)
 
     # Mark user as pending
     if getattr(request.user, 'verified', 'not_verified') != 'verified':
@@ -214,6 +209,7 @@ def request_identity_verification(request):
             'id_photo_url': ivr.id_photo_url,
             'status': ivr.status,
             'notes': ivr.notes,
+            'upload_status': 'processing',
         },
         'user': UserProfileSerializer(request.user).data
     }, status=201)
@@ -276,7 +272,7 @@ def approve_identity_verification(request, request_id: int):
     req.user.verified = 'verified'
     req.user.save(update_fields=['verified'])
     try:
-        send_notification(
+        queue_notification(
             sender_id=request.user.id,
             receiver_id=req.user_id,
             notification_type='announcement',
@@ -307,7 +303,7 @@ def reject_identity_verification(request, request_id: int):
         req.user.verified = 'not_verified'
         req.user.save(update_fields=['verified'])
     try:
-        send_notification(
+        queue_notification(
             sender_id=request.user.id,
             receiver_id=req.user_id,
             notification_type='announcement',
@@ -335,8 +331,6 @@ def request_instructor(request):
     degree = request.data.get('degree', '')
     certifications = request.data.get('certifications', '')
 
-    uploaded_urls = []
-    primary_photo_url = None
     # Handle multiple files (try common keys)
     files = []
     if hasattr(request, 'FILES'):
@@ -346,64 +340,41 @@ def request_instructor(request):
             or request.FILES.getlist('documents')
             or []
         )
+    # Stage files locally; Cloudinary uploads run in the job worker
+    staged_files = []
     for f in files:
-        # Try Cloudinary first
         try:
-            from cloudinary.uploader import upload as cloudinary_upload
-            result = cloudinary_upload(
-                f, folder=f"instructors/{request.user.id}")
-            if result and 'secure_url' in result:
-                uploaded_urls.append(result['secure_url'])
-                if not primary_photo_url and str(result.get('resource_type')) == 'image':
-                    primary_photo_url = result['secure_url']
-                continue
+            staged_files.append({
+                'staged': stage_file(f),
+                'name': f.name,
+                'content_type': f.content_type,
+            })
         except Exception:
-            # proceed to storage fallback
-            ...
-        # Fallback to default storage (Cloudinary storage or local media)
-        try:
-            stored_name = default_storage.save(
-                f"instructors/{request.user.id}/{f.name}", f)
-            url = default_storage.url(stored_name)
-            uploaded_urls.append(url)
-            if not primary_photo_url and str(f.content_type or '').startswith('image/'):
-                primary_photo_url = url
-        except Exception:
-            # Ignore individual file upload failures
+            # Ignore individual file staging failures
             pass
 
-    # If we uploaded something but didn't determine a primary photo, pick first
-    if not primary_photo_url and uploaded_urls:
-        primary_photo_url = uploaded_urls[0]
-
-    ir, _ = InstructorRequest.objects.update_or_create(
-        user=request.user,
-        defaults={
-            'motivation': motivation,
-            'full_name': full_name,
-            'degree': degree,
-            'certifications': certifications,
-            'documents': uploaded_urls or (existing.documents if existing else []),
-            'photo_url': primary_photo_url or (existing.photo_url if existing else ''),
-            'status': 'pending',
-            'reviewed_at': None,
-            'reviewed_by': None,
-        }
-    )
-    # notify admins
-    try:
-        admin_ids = list(User.objects.filter(
-            role='admin').values_list('id', flat=True))
-        for admin_id in admin_ids:
-            send_notification(
-                sender_id=request.user.id,
-                receiver_id=admin_id,
-                notification_type='announcement',
-                title='Instructor Request',
-                message=f"{request.user.get_full_name() or request.user.email} requested to become an instructor."
-            )
-    except Exception:
-        pass
+    with transaction.atomic():
+        ir, _ = InstructorRequest.objects.update_or_create(
+            user=request.user,
+            defaults={
+                'motivation': motivation,
+                'full_name': full_name,
+                'degree': degree,
+                'certifications': certifications,
+                'documents': existing.documents if existing else [],
+                'photo_url': existing.photo_url if existing else '',
+                'status': 'pending',
+                'reviewed_at': None,
+                'reviewed_by': None,
+            }
+        )
+        # notify admins once the documents are uploaded
+        if staged_files:
+            enqueue('authentication.upload_instructor_documents',
+                    user_id=request.user.id, files=staged_files)
+        else:
+            enqueue('authentication.notify_instructor_request',
+                    user_id=request.user.id)
     return Response({
         'message': 'Request submitted',
         'request': {
@@ -417,6 +388,7 @@ def request_instructor(request):
             'documents': ir.documents,
             'photo_url': ir.photo_url,
             'status': ir.status,
+            'upload_status': 'processing' if staged_files else 'none',
         }
     }, status=201)
 
@@ -522,7 +494,7 @@ def approve_instructor(request, request_id):
     req.user.role = 'instructor'
     req.user.save(update_fields=['role'])
     try:
-        send_notification(
+        queue_notification(
             sender_id=request.user.id,
             receiver_id=req.user_id,
             notification_type='announcement',
@@ -549,7 +521,7 @@ def reject_instructor(request, request_id):
     req.reviewed_by = request.user
     req.save(update_fields=['status', 'reviewed_at', 'reviewed_by'])
     try:
-        send_notification(
+        queue_notification(
             sender_id=request.user.id,
             receiver_id=req.user_id,
             notification_type='announcement',
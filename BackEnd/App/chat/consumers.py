@@ -0,0 +1,302 @@
+import asyncio
+import json
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from authentication.consumers import JWTHttpConsumer
+from authentication.principal import user_from_token
+
+from . import counters
+from .models import Conversation, Message
+from .history import InvalidAnchor, keyset_page, page_size
+from .services import send_message
+from .events import ADMINS_GROUP, conversation_group, event_groups, message_payload
+
+# Messages replayed per sync frame when a client resumes
+RESUME_BATCH_SIZE = 200
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Real-time chat. After connecting, the client sends
+    {"type": "auth", "token": <JWT>, "last_message_id": <int, optional>}.
+    Users join their conversation's group, admins the all-conversations
+    group; a given last_message_id replays only the messages missed since.
+
+    Client frames: send_message, mark_read, typing, resume.
+    Server frames: auth_success/auth_error, sync, message, read, typing, error.
+    """
+
+    async def connect(self):
+        await self.accept()
+        self.user = None
+        self.groups_joined = []
+
+    async def disconnect(self, close_code):
+        for group in self.groups_joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send_json({'type': 'error', 'message': 'Invalid JSON'})
+            return
+        message_type = data.get('type')
+
+        if message_type == 'auth' and not self.user:
+            await self.authenticate(data)
+        elif not self.user:
+            await self.send_json({'type': 'error', 'message': 'Authenticate first'})
+        elif message_type == 'send_message':
+            await self.handle_send_message(data)
+        elif message_type == 'mark_read':
+            await self.handle_mark_read(data)
+        elif message_type == 'typing':
+            await self.handle_typing(data)
+        elif message_type == 'resume':
+            await self.send_sync(data.get('last_message_id'), data.get('conversation_id'))
+        else:
+            await self.send_json({'type': 'error', 'message': 'Unknown message type'})
+
+    async def authenticate(self, data):
+        user = await self.get_user_from_token(data.get('token'))
+        if not user:
+            await self.send_json({'type': 'auth_error', 'message': 'Invalid token'})
+            await self.close(code=1011)
+            return
+        self.user = user
+        if user.role == 'admin':
+            self.conversation_id = None
+            self.groups_joined = [ADMINS_GROUP]
+        else:
+            self.conversation_id = await self.get_own_conversation_id()
+            self.groups_joined = [conversation_group(self.conversation_id)]
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.send_json({
+            'type': 'auth_success',
+            'conversation_id': self.conversation_id,
+        })
+        if data.get('last_message_id') is not None:
+            await self.send_sync(data.get('last_message_id'), data.get('conversation_id'))
+
+    async def send_sync(self, last_message_id, conversation_id=None):
+        """Replay messages newer than last_message_id (the reconnect gap)."""
+        try:
+            last_message_id = int(last_message_id or 0)
+        except (TypeError, ValueError):
+            await self.send_json({'type': 'error', 'message': 'Invalid last_message_id'})
+            return
+        messages, has_more = await self.get_messages_after(last_message_id, conversation_id)
+        await self.send_json({'type': 'sync', 'messages': messages, 'has_more': has_more})
+
+    async def handle_send_message(self, data):
+        content = (data.get('content') or '').strip()
+        if not content:
+            await self.send_json({'type': 'error', 'message': 'Message content is required'})
+            return
+        payload = await self.create_message(
+            data.get('conversation_id'), content, data.get('message_type') or 'text')
+        if payload is None:
+            await self.send_json({'type': 'error', 'message': 'Conversation not found'})
+            return
+        await self.group_send_all(payload['conversation'], {
+            'type': 'chat.message',
+            'message': payload,
+        })
+
+    async def handle_mark_read(self, data):
+        conversation_id, message_ids = await self.mark_read(
+            data.get('conversation_id'), data.get('message_ids'))
+        if message_ids:
+            await self.group_send_all(conversation_id, {
+                'type': 'chat.read',
+                'conversation_id': conversation_id,
+                'message_ids': message_ids,
+                'reader_id': self.user.id,
+                'reader_role': self.user.role,
+            })
+
+    async def handle_typing(self, data):
+        conversation_id = self.conversation_id or data.get('conversation_id')
+        if not conversation_id:
+            return
+        await self.group_send_all(conversation_id, {
+            'type': 'chat.typing',
+            'conversation_id': conversation_id,
+            'user_id': self.user.id,
+            'user_role': self.user.role,
+            'is_typing': bool(data.get('is_typing', True)),
+            'sender_channel': self.channel_name,
+        })
+
+    async def group_send_all(self, conversation_id, event):
+        for group in event_groups(conversation_id):
+            await self.channel_layer.group_send(group, event)
+
+    # Channel layer event handlers
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_messages(self, event):
+        # Broadcast batches (admins group); clients still get one frame per message
+        for message in event['messages']:
+            await self.send_json({'type': 'message', 'message': message})
+
+    async def chat_read(self, event):
+        await self.send_json({
+            'type': 'read',
+            'conversation_id': event['conversation_id'],
+            'message_ids': event['message_ids'],
+            'reader_id': event['reader_id'],
+            'reader_role': event['reader_role'],
+        })
+
+    async def chat_typing(self, event):
+        # Don't echo typing indicators back to the typing socket
+        if event.get('sender_channel') == self.channel_name:
+            return
+        await self.send_json({
+            'type': 'typing',
+            'conversation_id': event['conversation_id'],
+            'user_id': event['user_id'],
+            'user_role': event['user_role'],
+            'is_typing': event['is_typing'],
+        })
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+
+    # Database helpers
+
+    def _conversation_for(self, conversation_id):
+        """The conversation this user may act on, or None."""
+        if self.user.role == 'admin':
+            return Conversation.objects.filter(id=conversation_id).first() if conversation_id else None
+        return Conversation.objects.filter(id=self.conversation_id).first()
+
+    @database_sync_to_async
+    def get_own_conversation_id(self):
+        conversation, _ = Conversation.objects.get_or_create(
+            user=self.user, defaults={'is_active': True})
+        return conversation.id
+
+    @database_sync_to_async
+    def get_messages_after(self, last_message_id, conversation_id=None):
+        messages = Message.objects.filter(
+            id__gt=last_message_id).select_related('sender')
+        if self.user.role != 'admin':
+            messages = messages.filter(conversation_id=self.conversation_id)
+        elif conversation_id:
+            messages = messages.filter(conversation_id=conversation_id)
+        batch = list(messages.order_by('id')[:RESUME_BATCH_SIZE + 1])
+        return [message_payload(m) for m in batch[:RESUME_BATCH_SIZE]], len(batch) > RESUME_BATCH_SIZE
+
+    @database_sync_to_async
+    def create_message(self, conversation_id, content, message_type):
+        conversation = self._conversation_for(conversation_id)
+        if not conversation:
+            return None
+        if message_type not in dict(Message.MESSAGE_TYPES):
+            message_type = 'text'
+        message = send_message(conversation, self.user, content, message_type)
+        return message_payload(message)
+
+    @database_sync_to_async
+    def mark_read(self, conversation_id, message_ids=None):
+        """Mark the other side's unread messages read; returns (conversation_id, ids)."""
+        conversation = self._conversation_for(conversation_id)
+        if not conversation:
+            return None, []
+        unread = conversation.messages.filter(is_read=False)
+        if self.user.role == 'admin':
+            unread = unread.filter(sender_id=conversation.user_id)
+        else:
+            unread = unread.filter(sender__role='admin')
+        if message_ids:
+            unread = unread.filter(id__in=message_ids)
+        return conversation.id, counters.mark_read(unread).get(conversation.id, [])
+
+    @database_sync_to_async
+    def get_user_from_token(self, token):
+        """Get user from JWT access token"""
+        return user_from_token(token)
+
+class ChatPollConsumer(JWTHttpConsumer):
+    """
+    Long-poll for new messages:
+    GET /api/chat/conversations/<id>/messages/poll/?after_id=<id>&wait=<seconds>
+    with the usual "Authorization: Bearer <JWT>" header.
+
+    Answers at once if there are messages after after_id, otherwise parks
+    on the conversation's channel group for up to ``wait`` seconds
+    (capped at LONG_POLL_MAX_WAIT) and returns an empty page on
+    timeout. Routed ahead of Django, so a waiting request holds neither a
+    worker thread nor a database connection.
+    """
+
+    async def handle(self, body):
+        user = await self.handle_common()
+        if not user:
+            return
+        params = self.query_params
+        try:
+            wait = max(0.0, min(float(params.get('wait', 0)),
+                                settings.LONG_POLL_MAX_WAIT))
+        except ValueError:
+            await self.send_json_response(400, {'error': 'wait must be a number of seconds'})
+            return
+
+        error = await self.load_conversation(
+            user, self.scope['url_route']['kwargs']['conversation_id'])
+        if error:
+            await self.send_json_response(*error)
+            return
+        code, page = await self.get_page(params)
+        if code != 200 or page['results'] or not wait:
+            await self.send_json_response(code, page)
+            return
+
+        channel = await self.channel_layer.new_channel()
+        group = conversation_group(self.conversation.id)
+        await self.channel_layer.group_add(group, channel)
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            # Re-check after joining the group so a message sent in between isn't missed
+            code, page = await self.get_page(params)
+            while code == 200 and not page['results'] and loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(self.channel_layer.receive(channel),
+                                           deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                code, page = await self.get_page(params)
+        finally:
+            await self.channel_layer.group_discard(group, channel)
+        await self.send_json_response(code, page)
+
+    @database_sync_to_async
+    def load_conversation(self, user, conversation_id):
+        """Check access; returns (status, body) on failure."""
+        self.conversation = Conversation.objects.filter(id=conversation_id).first()
+        if not self.conversation:
+            return 404, {'error': 'Conversation not found'}
+        if user.role != 'admin' and self.conversation.user_id != user.id:
+            return 403, {'error': 'You can only view your own conversation'}
+        return None
+
+    @database_sync_to_async
+    def get_page(self, params):
+        try:
+            messages, has_more = keyset_page(
+                self.conversation.messages.select_related('sender'),
+                after_id=params.get('after_id') or 0,
+                limit=page_size(params.get('page_size')))
+        except InvalidAnchor as e:
+            return 400, {'error': str(e)}
+        return 200, {'results': [message_payload(m) for m in messages], 'has_more': has_more}
@@ -0,0 +1,95 @@
+"""
+Maintained unread counters for chat.
+
+Conversation.unread_for_user counts unread admin messages,
+Conversation.unread_for_admin unread messages from the conversation's
+user, and the 'admin' ChatUnreadCounter row sums unread_for_admin over all
+conversations. They are adjusted with F() expressions when messages are
+created or marked read, so unread badges are single-row reads.
+`manage.py repair_chat_unread_counters` recomputes them if they drift.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import ChatUnreadCounter, Conversation, Message
+
+ADMIN_COUNTER = 'admin'
+
+
+def admin_unread_total():
+    counter = ChatUnreadCounter.objects.filter(key=ADMIN_COUNTER).first()
+    return max(counter.count, 0) if counter else 0
+
+
+def bump_admin_unread(delta):
+    if not delta:
+        return
+    updated = ChatUnreadCounter.objects.filter(
+        key=ADMIN_COUNTER).update(count=F('count') + delta)
+    if not updated:
+        ChatUnreadCounter.objects.get_or_create(key=ADMIN_COUNTER)
+        ChatUnreadCounter.objects.filter(
+            key=ADMIN_COUNTER).update(count=F('count') + delta)
+
+
+def counter_field(sender_role):
+    """Which Conversation counter a new unread message from ``sender_role`` increments."""
+    return 'unread_for_user' if sender_role == 'admin' else 'unread_for_admin'
+
+
+def mark_read(messages):
+    """
+    Mark the unread messages in ``messages`` read and decrement the counters
+    of every conversation involved. Returns ``{conversation_id: [ids]}``.
+    """
+    with transaction.atomic():
+        # Row locks make concurrent mark-read calls count each message once
+        rows = list(
+            messages.filter(is_read=False).select_for_update(of=('self',))
+            .values_list('id', 'conversation_id', 'sender__role'))
+        if not rows:
+            return {}
+        Message.objects.filter(id__in=[row[0] for row in rows]).update(is_read=True)
+
+        by_conversation = defaultdict(list)
+        deltas = defaultdict(lambda: defaultdict(int))
+        for message_id, conversation_id, sender_role in rows:
+            by_conversation[conversation_id].append(message_id)
+            deltas[conversation_id][counter_field(sender_role)] += 1
+        for conversation_id, fields in deltas.items():
+            Conversation.objects.filter(id=conversation_id).update(**{
+                field: F(field) - count for field, count in fields.items()})
+        bump_admin_unread(-sum(fields.get('unread_for_admin', 0)
+                               for fields in deltas.values()))
+    return dict(by_conversation)
+
+
+def repair_unread_counters(dry_run=False):
+    """Recompute every counter from Message rows; returns the number of fixed conversations."""
+    with transaction.atomic():
+        actual = {
+            row['conversation_id']: row for row in
+            Message.objects.filter(is_read=False).values('conversation_id').annotate(
+                for_user=Count('id', filter=Q(sender__role='admin')),
+                for_admin=Count('id', filter=~Q(sender__role='admin')),
+            ).order_by()
+        }
+        drifted = []
+        for conversation in Conversation.objects.only(
+                'id', 'unread_for_user', 'unread_for_admin').iterator(chunk_size=2000):
+            row = actual.get(conversation.id, {})
+            for_user, for_admin = row.get('for_user', 0), row.get('for_admin', 0)
+            if (conversation.unread_for_user, conversation.unread_for_admin) != (for_user, for_admin):
+                conversation.unread_for_user = for_user
+                conversation.unread_for_admin = for_admin
+                drifted.append(conversation)
+        if not dry_run:
+            Conversation.objects.bulk_update(
+                drifted, ['unread_for_user', 'unread_for_admin'], batch_size=1000)
+            total = Conversation.objects.aggregate(
+                total=Sum('unread_for_admin'))['total'] or 0
+            ChatUnreadCounter.objects.update_or_create(
+                key=ADMIN_COUNTER, defaults={'count': total})
+    return len(drifted)
@@ -0,0 +1,95 @@
+"""
+Channel-layer events for real-time chat (see chat.consumers.ChatConsumer).
+
+Every event is sent to the conversation's group (the user's sockets) and to
+the admins group, so admins see all conversations on one socket. REST
+views publish through these helpers after their transaction commits.
+Broadcasts go through publish_messages from the 'chat.publish_messages'
+job: admins get one 'chat.messages' event per batch instead of one event
+per conversation, and the conversation sends run concurrently.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .serializers import MessageSerializer
+
+logger = logging.getLogger(__name__)
+
+ADMINS_GROUP = 'chat_admins'
+# Messages per 'chat.messages' event to the admins group
+ADMIN_BATCH_SIZE = 200
+
+
+def conversation_group(conversation_id):
+    return f'chat_conversation_{conversation_id}'
+
+
+def event_groups(conversation_id):
+    return [conversation_group(conversation_id), ADMINS_GROUP]
+
+
+def message_payload(message):
+    """JSON-safe MessageSerializer data (channel layers cannot carry datetimes)."""
+    return json.loads(json.dumps(MessageSerializer(message).data, cls=DjangoJSONEncoder))
+
+
+async def _group_send(conversation_id, event):
+    channel_layer = get_channel_layer()
+    for group in event_groups(conversation_id):
+        await channel_layer.group_send(group, event)
+
+
+def _publish(conversation_id, event):
+    def send():
+        try:
+            async_to_sync(_group_send)(conversation_id, event)
+        except Exception:
+            logger.exception('Chat event publish failed')
+    transaction.on_commit(send)
+
+
+def publish_message(message):
+    _publish(message.conversation_id, {
+        'type': 'chat.message',
+        'message': message_payload(message),
+    })
+
+
+def publish_read_receipt(conversation_id, message_ids, reader):
+    if not message_ids:
+        return
+    _publish(conversation_id, {
+        'type': 'chat.read',
+        'conversation_id': conversation_id,
+        'message_ids': list(message_ids),
+        'reader_id': reader.id,
+        'reader_role': reader.role,
+    })
+
+
+def publish_messages(messages):
+    """Publish many new messages at once (see the module docstring)."""
+    payloads = [message_payload(message) for message in messages]
+    if not payloads:
+        return
+
+    async def send():
+        channel_layer = get_channel_layer()
+        await asyncio.gather(*[
+            channel_layer.group_send(ADMINS_GROUP, {
+                'type': 'chat.messages',
+                'messages': payloads[start:start + ADMIN_BATCH_SIZE],
+            }) for start in range(0, len(payloads), ADMIN_BATCH_SIZE)
+        ], *[
+            channel_layer.group_send(conversation_group(payload['conversation']), {
+                'type': 'chat.message',
+                'message': payload,
+            }) for payload in payloads
+        ])
+    async_to_sync(send)()
@@ -0,0 +1,55 @@
+"""
+Keyset pagination over a conversation's messages.
+
+Pages are anchored on a message id: ``after_id`` returns the messages that
+follow it, ``before_id`` the ones preceding it, both oldest first. The
+anchor's (created_at, id) bounds a range scan on the
+(conversation, created_at) index, so there is no OFFSET and no COUNT;
+fetching one extra row tells whether there is more.
+"""
+from django.db.models import Q
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidAnchor(Exception):
+    pass
+
+
+def page_size(value):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def keyset_page(messages, after_id=None, before_id=None, limit=PAGE_SIZE):
+    """
+    Return ``(messages, has_more)`` for one conversation's ``messages``
+    queryset. Raises InvalidAnchor if the anchor isn't one of them.
+    """
+    anchor_id = after_id if after_id is not None else before_id
+    try:
+        anchor_id = int(anchor_id)
+    except (TypeError, ValueError):
+        raise InvalidAnchor('Message id must be an integer')
+    anchor = messages.filter(id=anchor_id).values_list('created_at', flat=True).first()
+    if anchor is None:
+        if anchor_id == 0 and after_id is not None:
+            # after_id=0: from the start of the conversation
+            page = messages
+        else:
+            raise InvalidAnchor('Message not found in this conversation')
+    elif after_id is not None:
+        page = messages.filter(Q(created_at__gt=anchor) |
+                               Q(created_at=anchor, id__gt=anchor_id))
+    else:
+        page = messages.filter(Q(created_at__lt=anchor) |
+                               Q(created_at=anchor, id__lt=anchor_id))
+
+    if after_id is not None:
+        rows = list(page.order_by('created_at', 'id')[:limit + 1])
+        return rows[:limit], len(rows) > limit
+    rows = list(page.order_by('-created_at', '-id')[:limit + 1])
+    return rows[:limit][::-1], len(rows) > limit
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import User
+from chat.models import Conversation
+from chat.services import broadcast_message, send_message
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark chat message throughput: send_message loop vs broadcast_message (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Conversation counts to benchmark (default: 1000 10000)'
+        )
+        parser.add_argument(
+            '--loop-sample',
+            type=int,
+            default=1000,
+            help='Messages timed with the send_message loop (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'messages':>10} {'send (msg/s)':>14} {'broadcast (msg/s)':>18}")
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['loop_sample'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, loop_sample):
+        admin = User.objects.create_user(
+            username='bench_admin', email='bench_admin@example.com',
+            password=None, role='admin')
+        User.objects.bulk_create([
+            User(username=f'bench_{i}', email=f'bench_{i}@example.com', role='student')
+            for i in range(size)
+        ], batch_size=5000)
+        Conversation.objects.bulk_create([
+            Conversation(user_id=user_id) for user_id in User.objects.filter(
+                username__startswith='bench_', role='student').values_list('id', flat=True)
+        ], batch_size=5000)
+        conversations = list(Conversation.objects.filter(
+            user__username__startswith='bench_').select_related('user'))
+
+        sample = conversations[:min(loop_sample, size)]
+        started = time.perf_counter()
+        for conversation in sample:
+            # Alternate senders so both unread counters are exercised
+            send_message(conversation, admin, 'Benchmark reply')
+            send_message(conversation, conversation.user, 'Benchmark question')
+        send_rate = 2 * len(sample) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        sent = broadcast_message(admin, [c.id for c in conversations], 'Benchmark broadcast')
+        broadcast_rate = len(sent) / (time.perf_counter() - started)
+
+        self.stdout.write(
+            f"{size:>10} {send_rate:>14.0f} {broadcast_rate:>18.0f}")
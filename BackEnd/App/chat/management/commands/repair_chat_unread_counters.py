@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from chat.counters import repair_unread_counters
+
+
+class Command(BaseCommand):
+    help = ('Recompute the chat unread counters from the messages table. '
+            'Safe to run at any time; only drifted conversations are written.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted conversations without fixing them'
+        )
+
+    def handle(self, *args, **options):
+        drifted = repair_unread_counters(dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{drifted} conversation(s) have drifted unread counters')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired unread counters for {drifted} conversation(s)'))
@@ -1,9 +1,35 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Substr
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 
 User = get_user_model()
 
+# Characters kept for inbox previews; one extra tells us to add an ellipsis
+PREVIEW_LENGTH = 100
+
+
+class ConversationQuerySet(models.QuerySet):
+    def with_inbox_fields(self):
+        """
+        Annotate unread counts (admin_unread, user_unread, from the
+        maintained counters) and the last message's id, content prefix,
+        sender role and timestamp with correlated subqueries served by the
+        (conversation, created_at) index, so an inbox page is a single query.
+        """
+        messages = Message.objects.filter(conversation=OuterRef('pk'))
+        last = messages.order_by('-created_at', '-id')
+        return self.select_related('user').annotate(
+            admin_unread=F('unread_for_admin'),
+            user_unread=F('unread_for_user'),
+            last_message_id=Subquery(last.values('id')[:1]),
+            last_message_content=Subquery(last.annotate(
+                preview=Substr('content', 1, PREVIEW_LENGTH + 1)).values('preview')[:1]),
+            last_message_sender_role=Subquery(
+                last.values('sender__role')[:1]),
+            last_message_created_at=Subquery(last.values('created_at')[:1]),
+        )
+
 
 class Conversation(models.Model):
     """
@@ -19,6 +45,13 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_message_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True, help_text="Whether the conversation is active")
+    # Maintained by chat.counters
+    unread_for_user = models.IntegerField(
+        default=0, help_text="Unread messages from admin")
+    unread_for_admin = models.IntegerField(
+        default=0, help_text="Unread messages from the user")
+
+    objects = ConversationQuerySet.as_manager()
     
     class Meta:
         ordering = ['-last_message_at']
@@ -30,18 +63,12 @@ class Conversation(models.Model):
     @property
     def unread_count(self):
         """Count of unread messages for the user (messages from admin)"""
-        return self.messages.filter(
-            sender__role='admin',
-            is_read=False
-        ).count()
-    
+        return max(self.unread_for_user, 0)
+
     @property
     def admin_unread_count(self):
         """Count of unread messages for admin (messages from user)"""
-        return self.messages.filter(
-            sender=self.user,
-            is_read=False
-        ).count()
+        return max(self.unread_for_admin, 0)
 
 
 class Message(models.Model):
@@ -93,10 +120,17 @@ class Message(models.Model):
         return f"{self.sender.email}: {self.content[:50]}..."
     
     def save(self, *args, **kwargs):
-        # Update conversation's last_message_at when a new message is created
-        super().save(*args, **kwargs)
-        self.conversation.last_message_at = timezone.now()
-        self.conversation.save(update_fields=['last_message_at'])
+        if not self._state.adding:
+            # Edits (e.g. marking read) leave the conversation alone
+            super().save(*args, **kwargs)
+            return
+        from .services import bump_conversations
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Update conversation's last_message_at and unread counter in one UPDATE
+            bump_conversations([self.conversation_id], self.sender.role,
+                               self.created_at, unread=not self.is_read)
+        self.conversation.last_message_at = self.created_at
 
 
 class MessageReadStatus(models.Model):
@@ -111,3 +145,12 @@ class MessageReadStatus(models.Model):
         unique_together = ['message', 'user']
         db_table = 'chat_message_read_status'
 
+
+
+class ChatUnreadCounter(models.Model):
+    """Global unread counters (key 'admin': unread user messages for admins)"""
+    key = models.CharField(max_length=30, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'chat_unread_counters'
@@ -0,0 +1,12 @@
+from django.urls import path, re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'^ws/chat/?$', consumers.ChatConsumer.as_asgi()),
+]
+
+# Served by the ASGI router ahead of Django (see App/asgi.py)
+http_urlpatterns = [
+    path('api/chat/conversations/<int:conversation_id>/messages/poll/',
+         consumers.ChatPollConsumer.as_asgi()),
+]
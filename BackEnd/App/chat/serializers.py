@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Conversation, Message
+from .models import Conversation, Message, PREVIEW_LENGTH
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -47,7 +47,8 @@ class ConversationSerializer(serializers.ModelSerializer):
 
     def get_last_message(self, obj):
         """Get the last message in the conversation"""
-        last_msg = obj.messages.last()
+        last_msg = obj.messages.select_related(
+            'sender').order_by('-created_at', '-id').first()
         if last_msg:
             return MessageSerializer(last_msg).data
         return None
@@ -71,21 +72,39 @@ class ConversationListSerializer(serializers.ModelSerializer):
     def get_unread_count(self, obj):
         """Get unread count based on the requesting user's role"""
         request = self.context.get('request')
-        if request and request.user.role == 'admin':
+        is_admin = request and request.user.role == 'admin'
+        # Prefer the Conversation.objects.with_inbox_fields() annotations
+        if hasattr(obj, 'admin_unread'):
+            return obj.admin_unread if is_admin else obj.user_unread
+        if is_admin:
             return obj.admin_unread_count
         else:
             return obj.unread_count
 
     def get_last_message_preview(self, obj):
         """Get a preview of the last message"""
-        last_msg = obj.messages.last()
-        if last_msg:
-            return {
-                'content': last_msg.content[:100] + '...' if len(last_msg.content) > 100 else last_msg.content,
-                'sender_role': last_msg.sender.role,
-                'created_at': last_msg.created_at
-            }
-        return None
+        if hasattr(obj, 'last_message_id'):
+            if obj.last_message_id is None:
+                return None
+            message_id = obj.last_message_id
+            content = obj.last_message_content or ''
+            sender_role = obj.last_message_sender_role
+            created_at = obj.last_message_created_at
+        else:
+            last_msg = obj.messages.select_related(
+                'sender').order_by('-created_at', '-id').first()
+            if not last_msg:
+                return None
+            message_id = last_msg.id
+            content = last_msg.content
+            sender_role = last_msg.sender.role
+            created_at = last_msg.created_at
+        return {
+            'id': message_id,
+            'content': content[:PREVIEW_LENGTH] + '...' if len(content) > PREVIEW_LENGTH else content,
+            'sender_role': sender_role,
+            'created_at': created_at
+        }
 
 
 class MessageCreateSerializer(serializers.ModelSerializer):
@@ -110,3 +129,15 @@ class MarkMessagesReadSerializer(serializers.Serializer):
         allow_empty=False,
         help_text="List of message IDs to mark as read"
     )
+
+
+class BroadcastMessageSerializer(serializers.Serializer):
+    """Serializer for admin broadcasts"""
+    content = serializers.CharField()
+    message_type = serializers.ChoiceField(
+        choices=Message.MESSAGE_TYPES, default='text')
+    conversation_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text="Conversations to message; all active conversations if omitted"
+    )
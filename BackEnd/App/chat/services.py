@@ -0,0 +1,55 @@
+"""
+Write path for chat messages.
+
+Sending inserts the message and bumps its conversation (last_message_at
+plus the unread counter from chat.counters) with one UPDATE, inside a
+single transaction. broadcast_message() does the same for many
+conversations with one bulk INSERT and one UPDATE per batch.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .counters import bump_admin_unread, counter_field
+from .models import Conversation, Message
+
+BROADCAST_BATCH_SIZE = 1000
+
+
+def bump_conversations(conversation_ids, sender_role, at, unread=True):
+    """Record one new message from ``sender_role`` in each conversation."""
+    fields = {'last_message_at': at}
+    if unread:
+        field = counter_field(sender_role)
+        fields[field] = F(field) + 1
+        if field == 'unread_for_admin':
+            bump_admin_unread(len(conversation_ids))
+    Conversation.objects.filter(id__in=conversation_ids).update(**fields)
+
+
+def send_message(conversation, sender, content='', message_type='text', attachment=None):
+    """Insert a message and bump its conversation; returns the Message."""
+    # Message.save() does the bump when inserting
+    return Message.objects.create(
+        conversation=conversation, sender=sender, content=content,
+        message_type=message_type, attachment=attachment)
+
+
+def broadcast_message(sender, conversation_ids, content, message_type='text',
+                      batch_size=BROADCAST_BATCH_SIZE):
+    """
+    Send the same message to every conversation in ``conversation_ids``
+    (e.g. an admin announcement). Returns the created messages.
+    """
+    conversation_ids = list(conversation_ids)
+    created = []
+    with transaction.atomic():
+        for start in range(0, len(conversation_ids), batch_size):
+            batch = conversation_ids[start:start + batch_size]
+            messages = Message.objects.bulk_create([
+                Message(conversation_id=conversation_id, sender=sender,
+                        content=content, message_type=message_type)
+                for conversation_id in batch
+            ])
+            bump_conversations(batch, sender.role, messages[0].created_at)
+            created.extend(messages)
+    return created
@@ -0,0 +1,11 @@
+from jobs.queue import task
+
+from .events import publish_messages
+from .models import Message
+
+
+@task('chat.publish_messages')
+def publish_broadcast(message_ids):
+    """Push broadcast messages to their conversations' sockets from the job worker."""
+    publish_messages(Message.objects.filter(id__in=message_ids)
+                     .select_related('sender').order_by('id'))
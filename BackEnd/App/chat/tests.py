@@ -0,0 +1,264 @@
+import asyncio
+import json
+from unittest import mock
+from urllib.parse import urlencode
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import User
+from jobs.queue import run_pending_jobs
+from .counters import admin_unread_total, repair_unread_counters
+from .events import ADMINS_GROUP, conversation_group, publish_message
+from .models import Conversation, Message
+from .services import send_message
+from .routing import http_urlpatterns, websocket_urlpatterns
+
+
+class ChatTestMixin:
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='admin')
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='pw', role='student')
+            for i in range(3)
+        ]
+        self.conversations = [
+            Conversation.objects.create(user=student) for student in self.students]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class AdminInboxTest(ChatTestMixin, TestCase):
+    def test_inbox_is_one_query_per_page(self):
+        for conversation in self.conversations:
+            Message.objects.create(conversation=conversation,
+                                   sender=conversation.user, content='hello ' * 30)
+            Message.objects.create(conversation=conversation,
+                                   sender=self.admin, content='reply')
+        # pagination COUNT + the annotated page
+        with self.assertNumQueries(2):
+            res = self.client.get('/api/chat/conversations/')
+        self.assertEqual(res.status_code, 200)
+        first = res.data['results'][0]
+        self.assertEqual(first['unread_count'], 1)
+        self.assertEqual(first['last_message_preview']['content'], 'reply')
+        self.assertEqual(first['last_message_preview']['sender_role'], 'admin')
+
+    def test_unread_only_uses_annotation(self):
+        Message.objects.create(conversation=self.conversations[0],
+                               sender=self.students[0], content='x' * 150)
+        Message.objects.create(conversation=self.conversations[0],
+                               sender=self.students[0], content='second')
+        Message.objects.create(conversation=self.conversations[1],
+                               sender=self.students[1], content='read', is_read=True)
+        res = self.client.get('/api/chat/conversations/?unread_only=true')
+        self.assertEqual(res.data['count'], 1)
+        row = res.data['results'][0]
+        self.assertEqual(row['id'], self.conversations[0].id)
+        self.assertEqual(row['unread_count'], 2)
+        self.assertEqual(row['last_message_preview']['content'], 'second')
+
+
+class UnreadCounterTest(ChatTestMixin, TestCase):
+    def _counts(self, conversation):
+        conversation.refresh_from_db()
+        return conversation.unread_for_user, conversation.unread_for_admin
+
+    def test_counters_follow_sends_and_reads(self):
+        first, second = self.conversations[:2]
+        for _ in range(2):
+            Message.objects.create(conversation=first, sender=self.students[0], content='q')
+        Message.objects.create(conversation=second, sender=self.students[1], content='q')
+        Message.objects.create(conversation=first, sender=self.admin, content='a')
+        self.assertEqual(self._counts(first), (1, 2))
+        self.assertEqual(admin_unread_total(), 3)
+
+        res = self.client.post(f'/api/chat/conversations/{first.id}/mark-read/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self._counts(first), (1, 0))
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/chat/unread-count/')
+        self.assertEqual(res.data['unread_count'], 1)
+
+    def test_repair_fixes_drift(self):
+        Message.objects.create(conversation=self.conversations[0],
+                               sender=self.students[0], content='q')
+        Conversation.objects.filter(id=self.conversations[0].id).update(unread_for_admin=7)
+        Conversation.objects.filter(id=self.conversations[1].id).update(unread_for_user=2)
+        self.assertEqual(repair_unread_counters(dry_run=True), 2)
+        self.assertEqual(repair_unread_counters(), 2)
+        self.assertEqual(self._counts(self.conversations[0]), (0, 1))
+        self.assertEqual(self._counts(self.conversations[1]), (0, 0))
+        self.assertEqual(admin_unread_total(), 1)
+        self.assertEqual(repair_unread_counters(), 0)
+
+
+class MessageSendTest(ChatTestMixin, TestCase):
+    def test_send_is_insert_plus_one_update(self):
+        conversation = self.conversations[0]
+        with CaptureQueriesContext(connection) as ctx:
+            message = send_message(conversation, self.admin, 'hi')
+        statements = [q['sql'] for q in ctx.captured_queries
+                      if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(statements), 2)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_at, message.created_at)
+        self.assertEqual(conversation.unread_for_user, 1)
+
+        # Edits don't touch the conversation
+        message.is_read = True
+        with self.assertNumQueries(1):
+            message.save(update_fields=['is_read'])
+
+    def test_broadcast(self):
+        res = self.client.post('/api/chat/broadcast/', {
+            'content': 'maintenance tonight',
+            'conversation_ids': [c.id for c in self.conversations[:2]],
+        }, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data['sent_count'], 2)
+        for conversation in self.conversations[:2]:
+            conversation.refresh_from_db()
+            self.assertEqual(conversation.unread_for_user, 1)
+            self.assertEqual(conversation.messages.get().content, 'maintenance tonight')
+        self.assertFalse(self.conversations[2].messages.exists())
+
+        # Sockets hear about it from the job: one admins event, one per conversation
+        layer = mock.Mock(group_send=mock.AsyncMock())
+        with mock.patch('chat.events.get_channel_layer', return_value=layer):
+            self.assertEqual(run_pending_jobs(), 1)
+        groups = [c.args[0] for c in layer.group_send.call_args_list]
+        self.assertEqual(sorted(groups), sorted(
+            [ADMINS_GROUP] + [conversation_group(c.id) for c in self.conversations[:2]]))
+        admins_event = layer.group_send.call_args_list[groups.index(ADMINS_GROUP)].args[1]
+        self.assertEqual((admins_event['type'], len(admins_event['messages'])), ('chat.messages', 2))
+
+        student = APIClient()
+        student.force_authenticate(self.students[0])
+        res = student.post('/api/chat/broadcast/', {'content': 'x'}, format='json')
+        self.assertEqual(res.status_code, 403)
+
+
+class MessageHistoryTest(ChatTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.conversation = self.conversations[0]
+        self.messages = [
+            send_message(self.conversation, self.students[0], f'm{i}') for i in range(5)]
+        self.url = f'/api/chat/conversations/{self.conversation.id}/messages/'
+
+    def test_after_and_before_pages(self):
+        with self.assertNumQueries(3):  # conversation, anchor, page
+            res = self.client.get(self.url, {'after_id': self.messages[1].id, 'page_size': 2})
+        self.assertEqual([m['content'] for m in res.data['results']], ['m2', 'm3'])
+        self.assertTrue(res.data['has_more'])
+        self.assertNotIn('count', res.data)
+
+        res = self.client.get(self.url, {'after_id': self.messages[3].id})
+        self.assertEqual([m['content'] for m in res.data['results']], ['m4'])
+        self.assertFalse(res.data['has_more'])
+
+        res = self.client.get(self.url, {'before_id': self.messages[3].id, 'page_size': 2})
+        self.assertEqual([m['content'] for m in res.data['results']], ['m1', 'm2'])
+        self.assertTrue(res.data['has_more'])
+
+    def test_anchor_must_belong_to_conversation(self):
+        other = send_message(self.conversations[1], self.students[1], 'x')
+        res = self.client.get(self.url, {'after_id': other.id})
+        self.assertEqual(res.status_code, 400)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTest(ChatTestMixin, TransactionTestCase):
+    async def _connect(self, user, **auth):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), '/ws/chat/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_json_to(
+            dict(type='auth', token=str(AccessToken.for_user(user)), **auth))
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'auth_success')
+        return communicator
+
+    async def test_messages_reach_user_and_admin(self):
+        student = await self._connect(self.students[0])
+        admin = await self._connect(self.admin)
+
+        await student.send_json_to({'type': 'send_message', 'content': 'help'})
+        for communicator in (student, admin):
+            event = await communicator.receive_json_from()
+            self.assertEqual(event['type'], 'message')
+            self.assertEqual(event['message']['content'], 'help')
+
+        await admin.send_json_to({'type': 'typing', 'conversation_id': self.conversations[0].id})
+        event = await student.receive_json_from()
+        self.assertEqual(event['type'], 'typing')
+        self.assertTrue(await admin.receive_nothing())
+
+        await admin.send_json_to({'type': 'mark_read', 'conversation_id': self.conversations[0].id})
+        event = await student.receive_json_from()
+        self.assertEqual(event['type'], 'read')
+        self.assertEqual(len(event['message_ids']), 1)
+        await student.disconnect()
+        await admin.disconnect()
+
+    async def test_resume_only_sends_the_gap(self):
+        create = database_sync_to_async(Message.objects.create)
+        first = await create(conversation=self.conversations[0],
+                             sender=self.students[0], content='one')
+        await create(conversation=self.conversations[0], sender=self.admin, content='two')
+        await create(conversation=self.conversations[1], sender=self.students[1], content='other')
+
+        student = await self._connect(self.students[0], last_message_id=first.id)
+        sync = await student.receive_json_from()
+        self.assertEqual(sync['type'], 'sync')
+        self.assertEqual([m['content'] for m in sync['messages']], ['two'])
+        self.assertFalse(sync['has_more'])
+        await student.disconnect()
+
+    async def test_rest_send_is_pushed_to_sockets(self):
+        admin = await self._connect(self.admin)
+        client = APIClient()
+        client.force_authenticate(self.students[0])
+        await database_sync_to_async(client.post)(
+            f'/api/chat/conversations/{self.conversations[0].id}/messages/',
+            {'content': 'via rest'}, format='json')
+        event = await admin.receive_json_from()
+        self.assertEqual(event['message']['content'], 'via rest')
+        await admin.disconnect()
+
+    async def _poll(self, user, token=None, **params):
+        communicator = HttpCommunicator(
+            URLRouter(http_urlpatterns), 'GET',
+            f'/api/chat/conversations/{self.conversations[0].id}/messages/poll/?{urlencode(params)}',
+            headers=[(b'authorization', f'Bearer {token or AccessToken.for_user(user)}'.encode())])
+        response = await communicator.get_response(timeout=10)
+        return response['status'], json.loads(response['body'])
+
+    async def test_long_poll_wakes_on_new_message(self):
+        status, body = await self._poll(self.students[0], after_id=0, wait=0.2)
+        self.assertEqual((status, body), (200, {'results': [], 'has_more': False}))
+
+        poll = asyncio.ensure_future(self._poll(self.students[0], after_id=0, wait=5))
+        await asyncio.sleep(0.3)
+        self.assertFalse(poll.done())
+
+        def reply():
+            publish_message(send_message(self.conversations[0], self.admin, 'answer'))
+        await database_sync_to_async(reply)()
+        status, body = await asyncio.wait_for(poll, 2)
+        self.assertEqual([m['content'] for m in body['results']], ['answer'])
+
+        status, _ = await self._poll(self.students[1], after_id=0)
+        self.assertEqual(status, 403)
+        status, _ = await self._poll(self.students[0], token='nope')
+        self.assertEqual(status, 401)
@@ -12,6 +12,7 @@ urlpatterns = [
     # Message endpoints
     path('conversations/<int:conversation_id>/messages/', 
          views.MessageListCreateView.as_view(), name='message-list-create'),
+    path('broadcast/', views.broadcast, name='broadcast'),
     
     # Read status endpoints
     path('messages/mark-read/', views.mark_messages_read, name='mark-messages-read'),
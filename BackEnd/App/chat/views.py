@@ -1,15 +1,21 @@
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.contrib.auth import get_user_model
+from jobs.queue import enqueue
 
 from .models import Conversation, Message
+from .events import publish_message, publish_read_receipt
+from .counters import admin_unread_total, mark_read
+from .services import broadcast_message, send_message
+from .history import InvalidAnchor, keyset_page, page_size
 from .serializers import (
     MessageSerializer, ConversationSerializer, ConversationListSerializer,
-    MessageCreateSerializer, MarkMessagesReadSerializer
+    MessageCreateSerializer, MarkMessagesReadSerializer, BroadcastMessageSerializer
 )
 
 User = get_user_model()
@@ -81,8 +87,9 @@ def conversations_list(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
+    # One query per page: unread counts and last message are annotations
     conversations = Conversation.objects.filter(
-        is_active=True).order_by('-last_message_at')
+        is_active=True).with_inbox_fields().order_by('-last_message_at', '-id')
 
     # Search functionality
     search = request.query_params.get('search', None)
@@ -96,10 +103,7 @@ def conversations_list(request):
     # Filter by unread messages
     unread_only = request.query_params.get('unread_only', None)
     if unread_only == 'true':
-        conversations = conversations.filter(
-            messages__sender__role__in=['student', 'instructor'],
-            messages__is_read=False
-        ).distinct()
+        conversations = conversations.filter(unread_for_admin__gt=0)
 
     paginator = ConversationPagination()
     page = paginator.paginate_queryset(conversations, request)
@@ -142,31 +146,60 @@ class MessageListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = MessagePagination
 
+    def get_conversation(self):
+        """The URL's conversation, fetched once per request."""
+        if not hasattr(self, '_conversation'):
+            self._conversation = get_object_or_404(
+                Conversation, id=self.kwargs.get('conversation_id'))
+        return self._conversation
+
     def get_queryset(self):
-        conversation_id = self.kwargs.get('conversation_id')
-        conversation = get_object_or_404(Conversation, id=conversation_id)
+        conversation = self.get_conversation()
 
         # Users can only see their own conversation, admins can see all
-        if self.request.user.role != 'admin' and conversation.user != self.request.user:
+        if self.request.user.role != 'admin' and conversation.user_id != self.request.user.id:
             return Message.objects.none()
 
         return Message.objects.filter(conversation=conversation).order_by('created_at')
 
+    def list(self, request, *args, **kwargs):
+        """
+        Page numbers by default; ?after_id= / ?before_id= switch to keyset
+        pages ({results, has_more}) without a COUNT.
+        """
+        after_id = request.query_params.get('after_id')
+        before_id = request.query_params.get('before_id')
+        if after_id is None and before_id is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            messages, has_more = keyset_page(
+                self.get_queryset().select_related('sender'),
+                after_id=after_id, before_id=before_id,
+                limit=page_size(request.query_params.get('page_size')))
+        except InvalidAnchor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MessageSerializer(
+            messages, many=True, context={'request': request})
+        return Response({'results': serializer.data, 'has_more': has_more})
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return MessageCreateSerializer
         return MessageSerializer
 
     def perform_create(self, serializer):
-        conversation_id = self.kwargs.get('conversation_id')
-        conversation = get_object_or_404(Conversation, id=conversation_id)
+        conversation = self.get_conversation()
 
         # Users can only send messages to their own conversation, admins can reply to any
-        if self.request.user.role != 'admin' and conversation.user != self.request.user:
-            raise PermissionError(
+        if self.request.user.role != 'admin' and conversation.user_id != self.request.user.id:
+            raise PermissionDenied(
                 "You can only send messages to your own conversation")
 
-        serializer.save(conversation=conversation, sender=self.request.user)
+        serializer.instance = send_message(
+            conversation, self.request.user, **serializer.validated_data)
+        publish_message(serializer.instance)
 
     def create(self, request, *args, **kwargs):
         """Override create to return full message data"""
@@ -181,6 +214,43 @@ class MessageListCreateView(generics.ListCreateAPIView):
         return Response(full_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def broadcast(request):
+    """
+    Send one message to many conversations (admin only).
+    Defaults to every active conversation.
+    """
+    if request.user.role != 'admin':
+        return Response(
+            {'error': 'Only admins can broadcast messages'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    serializer = BroadcastMessageSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    conversations = Conversation.objects.filter(is_active=True)
+    conversation_ids = serializer.validated_data.get('conversation_ids')
+    if conversation_ids:
+        conversations = conversations.filter(id__in=conversation_ids)
+
+    messages = broadcast_message(
+        request.user,
+        conversations.values_list('id', flat=True),
+        serializer.validated_data['content'],
+        serializer.validated_data['message_type'],
+    )
+    # Socket delivery happens in the job worker, not in this request
+    enqueue('chat.publish_messages', message_ids=[message.id for message in messages])
+
+    return Response({
+        'message': f'Message sent to {len(messages)} conversations',
+        'sent_count': len(messages)
+    }, status=status.HTTP_201_CREATED)
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def mark_messages_read(request):
@@ -203,8 +273,11 @@ def mark_messages_read(request):
                 conversation__user=user
             )
 
-        # Mark messages as read
-        updated_count = messages.update(is_read=True)
+        # Mark messages as read and push read receipts per conversation
+        by_conversation = mark_read(messages)
+        updated_count = sum(len(ids) for ids in by_conversation.values())
+        for conversation_id, ids in by_conversation.items():
+            publish_read_receipt(conversation_id, ids, user)
 
         return Response({
             'message': f'{updated_count} messages marked as read',
@@ -232,16 +305,19 @@ def mark_conversation_read(request, conversation_id):
     # Mark appropriate messages as read based on user role
     if request.user.role == 'admin':
         # Admin marks user messages as read
-        updated_count = conversation.messages.filter(
+        unread = conversation.messages.filter(
             sender=conversation.user,
             is_read=False
-        ).update(is_read=True)
+        )
     else:
         # User marks admin messages as read
-        updated_count = conversation.messages.filter(
+        unread = conversation.messages.filter(
             sender__role='admin',
             is_read=False
-        ).update(is_read=True)
+        )
+    message_ids = mark_read(unread).get(conversation.id, [])
+    updated_count = len(message_ids)
+    publish_read_receipt(conversation.id, message_ids, request.user)
 
     return Response({
         'message': f'{updated_count} messages marked as read',
@@ -259,10 +335,7 @@ def unread_count(request):
 
     if user.role == 'admin':
         # Admin gets count of unread messages from all users
-        count = Message.objects.filter(
-            sender__role__in=['student', 'instructor'],
-            is_read=False
-        ).count()
+        count = admin_unread_total()
     else:
         # User gets count of unread messages from admin
         if hasattr(user, 'conversation'):
@@ -294,3 +367,4 @@ def conversation_unread_count(request, conversation_id):
         count = conversation.unread_count
 
     return Response({'unread_count': count})
+
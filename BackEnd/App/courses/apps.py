@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # noqa: F401
+        from .search import create_search_indexes
+        from .stats import create_stats_indexes, seed_missing_course_stats
+        post_migrate.connect(create_search_indexes, sender=self)
+        post_migrate.connect(create_stats_indexes, sender=self)
+        post_migrate.connect(seed_missing_course_stats, sender=self)
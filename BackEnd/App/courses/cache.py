@@ -0,0 +1,113 @@
+"""
+Versioned response cache for the public (AllowAny) catalog endpoints.
+
+Anonymous GET responses are cached under a key built from the view, its
+URL kwargs, the normalized query string and the current version of every
+scope the view depends on (``catalog``, ``categories``, ``course:<id>`` ...).
+Write paths bump those versions (see courses.signals), which makes stale
+entries unreachable; they then age out through the cache TTL/LRU. Cached
+responses carry an ETag and answer If-None-Match with 304.
+
+Versions are kept in the separate ``catalog_versions`` cache so response
+churn cannot cull them. A counter that is missing anyway is seeded from the
+clock, never from 0, so losing it only invalidates, never resurrects, old
+responses.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.response import Response
+
+CACHE_TTL = getattr(settings, 'CATALOG_CACHE_TTL', 60)
+_VERSION_PREFIX = 'catalog:v:'
+_RESPONSE_PREFIX = 'catalog:resp:'
+
+
+def _version_key(scope):
+    return f'{_VERSION_PREFIX}{scope}'
+
+
+def _versions_cache():
+    return caches['catalog_versions']
+
+
+def get_versions(scopes):
+    versions = _versions_cache()
+    keys = [_version_key(scope) for scope in scopes]
+    found = versions.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        seed = time.time_ns()
+        for key in missing:
+            versions.add(key, seed, timeout=None)
+        found.update(versions.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def bump_versions(*scopes):
+    """Invalidate every cached response depending on any of ``scopes``."""
+    versions = _versions_cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        # Version keys never expire; add() seeds the counter the first time
+        versions.add(key, time.time_ns(), timeout=None)
+        try:
+            versions.incr(key)
+        except ValueError:
+            versions.set(key, time.time_ns(), timeout=None)
+
+
+def _etag(data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+
+def _response_key(view_name, kwargs, query_params, versions):
+    query = urlencode(sorted(
+        (key, value) for key in query_params for value in sorted(query_params.getlist(key))))
+    raw = f'{view_name}|{sorted(kwargs.items())}|{query}|{versions}'
+    return _RESPONSE_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _conditional(request, etag, data):
+    if request.headers.get('If-None-Match') == etag:
+        response = Response(status=304)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    response['Vary'] = 'Authorization'
+    return response
+
+
+def cache_public_response(scopes):
+    """
+    Cache successful anonymous GET responses of a DRF function view.
+    ``scopes`` is a list of scope names or a callable ``(**kwargs) -> list``.
+    Must be applied below @api_view so ``request`` is a DRF Request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            view_scopes = scopes(**kwargs) if callable(scopes) else scopes
+            key = _response_key(view.__name__, kwargs, request.query_params,
+                                get_versions(view_scopes))
+            cached = cache.get(key)
+            if cached is not None:
+                etag, data = cached
+                return _conditional(request, etag, data)
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            etag = _etag(response.data)
+            cache.set(key, (etag, response.data), CACHE_TTL)
+            return _conditional(request, etag, response.data)
+        return wrapper
+    return decorator
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from courses.search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild course search documents (and tsvectors on PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Courses indexed per batch (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_search_documents(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total} course(s)')
+        )
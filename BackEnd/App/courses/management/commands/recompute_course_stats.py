@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from courses.stats import recompute_course_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild denormalized CourseStats rows from enrollments, reviews and videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            type=int,
+            action='append',
+            dest='course_ids',
+            help='Only recompute the given course id (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        written = recompute_course_stats(options['course_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Recomputed stats for {written} course(s)')
+        )
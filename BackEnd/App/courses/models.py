@@ -2,6 +2,9 @@ from django.db import models
 from django.conf import settings
 from cloudinary.models import CloudinaryField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Exists, F, FloatField, OuterRef, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.contrib.postgres.search import SearchVectorField
 
 
 class Category(models.Model):
@@ -13,6 +16,31 @@ class Category(models.Model):
         return self.name
 
 
+class CourseQuerySet(models.QuerySet):
+    def with_list_stats(self, user=None):
+        """
+        Annotate everything CourseSerializer needs for a course card so that
+        serializing a page costs a constant number of queries.
+        """
+        if user is not None and user.is_authenticated:
+            user_enrolled = Exists(Enrollment.objects.filter(
+                course=OuterRef('pk'), student=user))
+        else:
+            user_enrolled = Value(False)
+        return self.select_related('instructor', 'category').prefetch_related(
+            'instructor__interests'
+        ).annotate(
+            num_enrollments=Coalesce(F('stats__enrollments_count'), 0),
+            # Raw (nullable) value behind the 'enrollments' ordering's cursors
+            enrollments_count=F('stats__enrollments_count'),
+            num_ratings=Coalesce(F('stats__ratings_count'), 0),
+            avg_rating=Cast('stats__rating_sum', FloatField()) /
+            NullIf(F('stats__ratings_count'), 0),
+            num_videos=Coalesce(F('stats__video_count'), 0),
+            user_enrolled=user_enrolled,
+        )
+
+
 class Course(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -53,6 +81,15 @@ class Course(models.Model):
     requirements = models.JSONField(default=list, blank=True)
     target_audience = models.JSONField(default=list, blank=True)
 
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the public catalog (see courses.pagination)
+            models.Index(fields=['status', 'price', 'id']),
+            models.Index(fields=['status', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -67,6 +104,11 @@ class Enrollment(models.Model):
 
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            # Day-range scans of the analytics rollups (see analytics.rollup)
+            models.Index(fields=['enrolled_at']),
+            models.Index(fields=['completed_at']),
+        ]
 
     def __str__(self):
         return f"{self.student.email} enrolled in {self.course.title}"
@@ -106,6 +148,9 @@ class CourseReview(models.Model):
 
     class Meta:
         unique_together = ('course', 'rater')
+        indexes = [
+            models.Index(fields=['course', '-posted_at', '-id']),
+        ]
 
     def __str__(self):
         return f"Review by {self.rater.email} on {self.course.title}"
@@ -120,5 +165,67 @@ class CourseNote(models.Model):
     posted_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', '-posted_at', '-id']),
+        ]
+
     def __str__(self):
         return f"Note by {self.author.email} on {self.course.title}"
+
+
+class CourseStats(models.Model):
+    """
+    Denormalized per-course counters shown on every course card.
+    Maintained incrementally by courses.signals. Rows for courses that
+    predate the table are created after `migrate` (see
+    courses.stats.seed_missing_course_stats); repair drift with
+    `python manage.py recompute_course_stats`.
+    """
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    enrollments_count = models.PositiveIntegerField(default=0)
+    ratings_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    video_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'course_stats'
+        # The "popular" index (enrollments_count DESC NULLS LAST) is created
+        # after migrate on PostgreSQL, see courses.stats.create_stats_indexes
+
+    @property
+    def average_rating(self):
+        if not self.ratings_count:
+            return None
+        return self.rating_sum / self.ratings_count
+
+    def __str__(self):
+        return f"Stats for course {self.course_id}"
+
+
+class CourseSearchDocument(models.Model):
+    """
+    Flattened, searchable text for a course. On PostgreSQL `search_vector`
+    holds a weighted tsvector and `title` is trigram indexed; both GIN
+    indexes are created after migrate by courses.search.create_search_indexes,
+    so the model state is the same on every database. Other databases use the
+    in-process inverted index in courses.search built from the text columns.
+    """
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    status = models.CharField(max_length=20, db_index=True)
+    title = models.CharField(max_length=255)
+    category_name = models.CharField(max_length=100, blank=True)
+    instructor_name = models.CharField(max_length=255, blank=True)
+    objectives = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    search_vector = SearchVectorField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        db_table = 'course_search_documents'
+
+    def __str__(self):
+        return f"Search document for course {self.course_id}"
@@ -0,0 +1,175 @@
+"""
+Pagination for course, review and note listings.
+
+Two modes share the same limit handling:
+
+* keyset (cursor) mode, selected with ``?cursor=`` (empty for the first
+  page). Each page seeks past the last row of the previous one using an
+  opaque cursor encoding ``(sort key, id)``, so latency stays flat however
+  deep a client scrolls.
+* legacy ``?page=`` offset mode, kept for existing clients.
+
+Both cap ``limit`` at MAX_PAGE_SIZE. ``?count=`` selects how ``total`` is
+produced: ``exact`` (default), ``estimate`` (planner statistics on
+PostgreSQL) or ``none`` to skip counting entirely.
+"""
+import base64
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+
+MAX_PAGE_SIZE = 100
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+
+class PaginationError(ValueError):
+    """Raised for malformed pagination parameters; views answer with HTTP 400."""
+
+
+@dataclass(frozen=True)
+class SortKey:
+    field: str
+    descending: bool = False
+    nullable: bool = False
+    # Attribute holding the cursor value when ``field`` spans a relation
+    attr: str = None
+
+    def order_by(self):
+        # Only nullable keys spell out NULLS LAST; the others keep the plain
+        # direction their indexes are declared with
+        nulls_last = True if self.nullable else None
+        expression = F(self.field).desc(nulls_last=nulls_last) if self.descending \
+            else F(self.field).asc(nulls_last=nulls_last)
+        pk = '-id' if self.descending else 'id'
+        return expression, pk
+
+
+def _parse_positive_int(raw, name, default):
+    if raw in (None, ''):
+        return default
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise PaginationError(f'{name} must be an integer')
+    if value < 1:
+        raise PaginationError(f'{name} must be positive')
+    return value
+
+
+def parse_limit(request, default=5):
+    limit = _parse_positive_int(
+        request.query_params.get('limit'), 'limit', default)
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_count_mode(request):
+    mode = request.query_params.get('count', 'exact')
+    if mode not in COUNT_MODES:
+        raise PaginationError(f"count must be one of {', '.join(COUNT_MODES)}")
+    return mode
+
+
+def encode_cursor(order_name, value, pk):
+    payload = json.dumps({'o': order_name, 'v': value, 'id': pk},
+                         cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, order_name, queryset, sort_key):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, pk = payload['v'], int(payload['id'])
+    except (ValueError, KeyError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if payload.get('o') != order_name:
+        raise PaginationError('Cursor does not match the requested ordering')
+    if value is not None:
+        try:
+            field = queryset.model._meta.get_field(sort_key.field)
+            value = field.to_python(value)
+        except FieldDoesNotExist:
+            pass  # annotations (counts, ranks) round-trip as JSON numbers
+        except Exception:
+            raise PaginationError('Invalid cursor')
+    return value, pk
+
+
+def _seek_filter(sort_key, value, pk):
+    """Rows strictly after (value, pk) in the ordering described by sort_key."""
+    field = sort_key.field
+    op = 'lt' if sort_key.descending else 'gt'
+    id_after = Q(**{f'id__{op}': pk})
+    if value is None:
+        # NULL keys sort last, so only rows with NULL and a later id remain
+        return Q(**{f'{field}__isnull': True}) & id_after
+    after = Q(**{f'{field}__{op}': value}) | (Q(**{field: value}) & id_after)
+    if sort_key.nullable:
+        after |= Q(**{f'{field}__isnull': True})
+    return after
+
+
+def estimate_count(queryset):
+    """Row estimate from the PostgreSQL planner; exact count elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(queryset, mode):
+    if mode == 'none':
+        return None
+    if mode == 'estimate':
+        return estimate_count(queryset)
+    return queryset.count()
+
+
+def paginate(request, queryset, order_name, sort_key, default_limit=5):
+    """
+    Paginate ``queryset`` and return ``(objects, meta)`` where ``meta`` is
+    the response envelope without ``results``. Raises PaginationError for
+    bad parameters.
+    """
+    limit = parse_limit(request, default_limit)
+    count_mode = parse_count_mode(request)
+    queryset = queryset.order_by(*sort_key.order_by())
+
+    if 'cursor' not in request.query_params:
+        page = _parse_positive_int(
+            request.query_params.get('page'), 'page', 1)
+        total = count_rows(queryset, count_mode)
+        start = (page - 1) * limit
+        objects = list(queryset[start:start + limit])
+        meta = {'total': total, 'page': page, 'limit': limit,
+                'pages': (total + limit - 1) // limit if total is not None else None}
+        return objects, meta
+
+    total = count_rows(queryset, count_mode)
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        value, pk = decode_cursor(cursor, order_name, queryset, sort_key)
+        queryset = queryset.filter(_seek_filter(sort_key, value, pk))
+
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    objects = list(queryset[:limit + 1])
+    has_more = len(objects) > limit
+    objects = objects[:limit]
+    next_cursor = None
+    if has_more:
+        last = objects[-1]
+        next_cursor = encode_cursor(
+            order_name, getattr(last, sort_key.attr or sort_key.field), last.pk)
+    meta = {'total': total, 'limit': limit,
+            'next_cursor': next_cursor, 'has_more': has_more}
+    return objects, meta
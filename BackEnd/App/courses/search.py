@@ -0,0 +1,324 @@
+"""
+Full-text search for the course catalog.
+
+Every course has a CourseSearchDocument holding its flattened text. On
+PostgreSQL, matching and ranking use the weighted `search_vector` column,
+and pg_trgm word similarity on titles adds typo tolerance and serves
+suggestions; both are GIN indexed (see create_search_indexes).
+Elsewhere (SQLite in tests and local development), a pure-Python inverted
+index built from the same documents does both, plus typo correction. Only
+that fallback keeps documents in process memory.
+"""
+import bisect
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.db import connection, connections
+from django.db.models import Case, Count, F, FloatField, Max, Q, Value, When
+from django.db.models.functions import Length
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity)
+
+from .models import Course, CourseSearchDocument
+
+# Same relative weights PostgreSQL uses for tsvector labels A-D
+FIELD_WEIGHTS = (
+    ('title', 'A', 1.0),
+    ('category_name', 'B', 0.4),
+    ('instructor_name', 'B', 0.4),
+    ('objectives', 'C', 0.2),
+    ('body', 'D', 0.1),
+)
+SEARCH_CONFIG = 'english'
+MAX_RESULTS = 1000
+INDEX_RECHECK_SECONDS = 5
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with',
+))
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if t not in _STOPWORDS]
+
+
+def _within_edit_distance(a, b, max_distance):
+    """
+    Bounded Damerau-Levenshtein (optimal string alignment) check, so a
+    swapped pair of letters counts as one typo. Bails out as soon as a row
+    exceeds the bound.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            )
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before_previous[j - 2] + 1)
+            current.append(cost)
+        if min(current) > max_distance:
+            return False
+        before_previous, previous = previous, current
+    return previous[-1] <= max_distance
+
+
+# ---------- document maintenance ----------
+
+def create_search_indexes(using='default', **kwargs):
+    """
+    Create the PostgreSQL-only GIN indexes (tsvector, and title trigrams for
+    pg_trgm) if missing. Connected to post_migrate; a no-op elsewhere.
+    """
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+    table = CourseSearchDocument._meta.db_table
+    with db.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS course_search_vector_gin '
+            f'ON {table} USING gin (search_vector)')
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS course_search_title_trgm '
+            f'ON {table} USING gin (title gin_trgm_ops)')
+
+
+def _document_fields(course):
+    instructor = course.instructor
+    objectives = course.learning_objectives or []
+    if not isinstance(objectives, (list, tuple)):
+        objectives = [objectives]
+    return {
+        'status': course.status,
+        'title': course.title or '',
+        'category_name': course.category.name if course.category else '',
+        'instructor_name': (instructor.get_full_name() if instructor else '')[:255],
+        'objectives': ' '.join(str(o) for o in objectives),
+        'body': course.description or '',
+    }
+
+
+def _weighted_vector():
+    vector = None
+    for field, weight, _ in FIELD_WEIGHTS:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def index_courses(courses):
+    """Create or refresh the search documents for the given Course instances."""
+    course_ids = []
+    for course in courses:
+        CourseSearchDocument.objects.update_or_create(
+            course_id=course.pk, defaults=_document_fields(course))
+        course_ids.append(course.pk)
+    if course_ids and connection.vendor == 'postgresql':
+        CourseSearchDocument.objects.filter(course_id__in=course_ids).update(
+            search_vector=_weighted_vector())
+    invalidate_index()
+    return len(course_ids)
+
+
+def rebuild_search_documents(batch_size=500):
+    queryset = Course.objects.select_related(
+        'category', 'instructor').order_by('pk')
+    total = 0
+    batch = []
+    for course in queryset.iterator(chunk_size=batch_size):
+        batch.append(course)
+        if len(batch) >= batch_size:
+            total += index_courses(batch)
+            batch = []
+    if batch:
+        total += index_courses(batch)
+    return total
+
+
+# ---------- in-process inverted index ----------
+
+class InvertedIndex:
+    def __init__(self, documents):
+        self.postings = defaultdict(dict)
+        self.titles = {}
+        title_tokens = defaultdict(set)
+        for doc in documents:
+            if doc['status'] == 'approved':
+                self.titles[doc['course_id']] = doc['title']
+            for field, _, weight in FIELD_WEIGHTS:
+                for token in tokenize(doc[field]):
+                    scores = self.postings[token]
+                    scores[doc['course_id']] = scores.get(
+                        doc['course_id'], 0.0) + weight
+                    if field == 'title':
+                        title_tokens[token].add(doc['course_id'])
+        self.vocabulary = sorted(self.postings)
+        self.title_vocabulary = sorted(title_tokens)
+        self.title_postings = title_tokens
+        self.document_count = len(documents)
+
+    def _prefixed(self, vocabulary, prefix):
+        i = bisect.bisect_left(vocabulary, prefix)
+        while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+            yield vocabulary[i]
+            i += 1
+
+    def expand(self, term):
+        """Vocabulary tokens matching ``term`` exactly, by prefix, or within a small edit distance."""
+        matches = list(self._prefixed(self.vocabulary, term))
+        if matches or len(term) < 4:
+            return matches
+        max_distance = 1 if len(term) < 8 else 2
+        return [
+            token for token in self.vocabulary
+            if token[0] == term[0] and _within_edit_distance(term, token, max_distance)
+        ]
+
+    def correct(self, terms):
+        """Replace terms that match nothing with their most common close spelling."""
+        corrected = []
+        for term in terms:
+            if term in self.postings or next(self._prefixed(self.vocabulary, term), None):
+                corrected.append(term)
+                continue
+            expanded = self.expand(term)
+            corrected.append(
+                max(expanded, key=lambda t: len(self.postings[t])) if expanded else term)
+        return corrected
+
+    def search(self, text, limit=MAX_RESULTS):
+        terms = tokenize(text)
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for token in self.expand(term):
+                # Exact hits outrank prefix or fuzzy expansions
+                factor = 1.0 if token == term else 0.5
+                for course_id, score in self.postings[token].items():
+                    term_scores[course_id] += score * factor
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {cid: scores[cid] + s for cid, s in term_scores.items() if cid in scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def suggest(self, text, limit=8):
+        terms = tokenize(text)
+        if not terms:
+            return []
+        candidates = None
+        for term in terms:
+            matched = set()
+            for token in self._prefixed(self.title_vocabulary, term):
+                matched |= self.title_postings[token]
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+        ids = sorted((cid for cid in candidates if cid in self.titles),
+                     key=lambda cid: (len(self.titles[cid]), cid))[:limit]
+        return [{'id': cid, 'title': self.titles[cid]} for cid in ids]
+
+
+_index_lock = threading.Lock()
+_index_state = {'index': None, 'version': None, 'checked_at': 0.0}
+
+
+def invalidate_index():
+    _index_state['checked_at'] = 0.0
+
+
+def get_index():
+    """Return the process-wide inverted index, rebuilding it when documents changed."""
+    state = _index_state
+    if state['index'] is not None and time.monotonic() - state['checked_at'] < INDEX_RECHECK_SECONDS:
+        return state['index']
+    with _index_lock:
+        version = CourseSearchDocument.objects.aggregate(
+            count=Count('pk'), latest=Max('updated_at'))
+        version = (version['count'], version['latest'])
+        if state['index'] is None or version != state['version']:
+            documents = list(CourseSearchDocument.objects.values(
+                'course_id', 'status', *[field for field, _, _ in FIELD_WEIGHTS]))
+            state['index'] = InvertedIndex(documents)
+            state['version'] = version
+        state['checked_at'] = time.monotonic()
+        return state['index']
+
+
+# ---------- query entry points ----------
+
+def _tsquery(terms):
+    # Prefix-match every term; terms are \w+ tokens so quoting is safe
+    raw = ' & '.join(f"'{term}':*" for term in terms)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def _no_results(queryset):
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+
+def search_courses(queryset, text):
+    """
+    Filter ``queryset`` to courses matching ``text`` and annotate a
+    `search_rank` to order by (higher is better).
+    """
+    if connection.vendor == 'postgresql':
+        terms = tokenize(text)
+        if not terms:
+            return _no_results(queryset)
+        query = _tsquery(terms)
+        # Titles within pg_trgm's word_similarity_threshold catch typos
+        text = ' '.join(terms)
+        return queryset.filter(
+            Q(search_document__search_vector=query)
+            | Q(search_document__title__trigram_word_similar=text)
+        ).annotate(search_rank=(
+            SearchRank(F('search_document__search_vector'), query)
+            + TrigramWordSimilarity(text, 'search_document__title')))
+    index = get_index()
+    terms = index.correct(tokenize(text))
+    if not terms:
+        return _no_results(queryset)
+    ranked = index.search(' '.join(terms))
+    if not ranked:
+        return _no_results(queryset)
+    return queryset.filter(id__in=[cid for cid, _ in ranked]).annotate(
+        search_rank=Case(
+            *[When(id=cid, then=Value(score)) for cid, score in ranked],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def suggest_courses(text, limit=8):
+    if connection.vendor != 'postgresql':
+        return get_index().suggest(text, limit=limit)
+    terms = tokenize(text)
+    if not terms:
+        return []
+    # A typed prefix scores high word similarity against the title word it
+    # starts; the %> match is served by the title trigram index
+    text = ' '.join(terms)
+    documents = CourseSearchDocument.objects.filter(
+        status='approved', title__trigram_word_similar=text,
+    ).annotate(similarity=TrigramWordSimilarity(text, 'title'))
+    return [{'id': course_id, 'title': title} for course_id, title in
+            documents.order_by('-similarity', Length('title'), 'course_id')
+            .values_list('course_id', 'title')[:limit]]
@@ -52,25 +52,40 @@ class CourseSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
 
+    # Course querysets built with Course.objects.with_list_stats() carry the
+    # card statistics as annotations; fall back to per-course queries otherwise.
+
     def get_ratings_count(self, obj):
+        if hasattr(obj, 'num_ratings'):
+            return obj.num_ratings
         return CourseReview.objects.filter(course=obj).count()
 
     def get_average_rating(self, obj):
-        reviews = CourseReview.objects.filter(course=obj)
-        if reviews.exists():
-            return round(reviews.aggregate(models.Avg("rating"))["rating__avg"], 2)
+        if hasattr(obj, 'avg_rating'):
+            avg = obj.avg_rating
+        else:
+            avg = CourseReview.objects.filter(
+                course=obj).aggregate(models.Avg("rating"))["rating__avg"]
+        if avg is not None:
+            return round(avg, 2)
         return 4.2
 
     def get_is_enrolled(self, obj):
         request = self.context.get('request', None)
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if hasattr(obj, 'user_enrolled'):
+                return bool(obj.user_enrolled)
             return Enrollment.objects.filter(course=obj, student=request.user).exists()
         return False
 
     def get_enrollments_count(self, obj):
+        if hasattr(obj, 'num_enrollments'):
+            return obj.num_enrollments
         return Enrollment.objects.filter(course=obj).count()
 
     def get_video_count(self, obj):
+        if hasattr(obj, 'num_videos'):
+            return obj.num_videos
         return Video.objects.filter(course=obj).count()
 
 
@@ -0,0 +1,152 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.conf import settings
+from django.dispatch import receiver
+from .models import (
+    Course, CourseSearchDocument, CourseStats, Enrollment, CourseReview, Video, Category)
+from .stats import apply_course_stats_delta
+from .search import index_courses
+from .cache import bump_versions
+
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+@receiver(post_save, sender=Course)
+def update_course_search_document(sender, instance, **kwargs):
+    index_courses([instance])
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_documents(sender, instance, created, **kwargs):
+    if not created:
+        index_courses(instance.courses.select_related('category', 'instructor'))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def update_instructor_search_documents(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.role != 'instructor':
+        return
+    # Only the name is indexed; skips last_login and other partial saves
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    name = instance.get_full_name()[:255]
+    if CourseSearchDocument.objects.filter(
+            course__instructor=instance).exclude(instructor_name=name).exists():
+        index_courses(
+            instance.created_courses.select_related('category', 'instructor'))
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_created(sender, instance, created, **kwargs):
+    if created:
+        apply_course_stats_delta(instance.course_id, enrollments_count=1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    apply_course_stats_delta(instance.course_id, enrollments_count=-1)
+
+
+@receiver(pre_save, sender=CourseReview)
+def remember_previous_rating(sender, instance, **kwargs):
+    # Needed to apply only the rating difference when a review is edited
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = CourseReview.objects.filter(
+            pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=CourseReview)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_course_stats_delta(
+            instance.course_id, ratings_count=1, rating_sum=instance.rating)
+    elif getattr(instance, '_previous_rating', None) is not None:
+        apply_course_stats_delta(
+            instance.course_id, rating_sum=instance.rating - instance._previous_rating)
+
+
+@receiver(post_delete, sender=CourseReview)
+def review_deleted(sender, instance, **kwargs):
+    apply_course_stats_delta(
+        instance.course_id, ratings_count=-1, rating_sum=-instance.rating)
+
+
+@receiver(post_save, sender=Video)
+def video_created(sender, instance, created, **kwargs):
+    if created:
+        apply_course_stats_delta(instance.course_id, video_count=1)
+
+
+@receiver(post_delete, sender=Video)
+def video_deleted(sender, instance, **kwargs):
+    apply_course_stats_delta(instance.course_id, video_count=-1)
+
+
+# ---------- public response cache invalidation ----------
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    bump_versions('catalog', f'course:{instance.pk}')
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=CourseReview)
+@receiver(post_delete, sender=CourseReview)
+def invalidate_course_content_cache(sender, instance, **kwargs):
+    bump_versions('catalog', f'course:{instance.course_id}')
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_cache(sender, instance, created=True, **kwargs):
+    # Only the course's own pages: bumping 'catalog' on every enrollment would
+    # empty every cached list page, whose counts may lag by CATALOG_CACHE_TTL
+    if created:
+        bump_versions(f'course:{instance.course_id}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    bump_versions('catalog', 'categories')
+
+
+# Fields shown by the public instructor list (InstructorSerializer)
+INSTRUCTOR_LISTED_FIELDS = ('email', 'username', 'first_name', 'last_name', 'role')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_instructor_listing(sender, instance, update_fields=None, **kwargs):
+    # Skips the lookup for partial saves of other fields, e.g. last_login
+    instance._previous_listing = None
+    if not instance.pk or (
+            update_fields is not None and not set(INSTRUCTOR_LISTED_FIELDS) & set(update_fields)):
+        return
+    instance._previous_listing = sender.objects.filter(
+        pk=instance.pk).values_list(*INSTRUCTOR_LISTED_FIELDS).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_instructor_cache(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_listing', None)
+    listing = tuple(getattr(instance, field) for field in INSTRUCTOR_LISTED_FIELDS)
+    if created:
+        changed = instance.role == 'instructor'
+    else:
+        # Listed before (previous role) or after the save, with a visible change
+        changed = previous is not None and previous != listing and 'instructor' in (
+            previous[-1], instance.role)
+    if changed:
+        bump_versions('instructors')
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_deleted_instructor_cache(sender, instance, **kwargs):
+    if instance.role == 'instructor':
+        bump_versions('instructors')
@@ -0,0 +1,102 @@
+from django.db import connections, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from .models import Course, CourseStats, Enrollment, CourseReview, Video
+
+
+def apply_course_stats_delta(course_id, **deltas):
+    """
+    Atomically add ``deltas`` (e.g. enrollments_count=1) to a course's
+    CourseStats row. A missing row is rebuilt from the source tables when
+    the delta is an increment; decrements on a missing row (for example
+    while the course itself is being deleted) are ignored.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not course_id or not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = CourseStats.objects.filter(course_id=course_id).update(
+        updated_at=timezone.now(), **updates)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        recompute_course_stats([course_id])
+
+
+def _grouped(queryset, **aggregates):
+    rows = queryset.order_by().values('course_id').annotate(**aggregates)
+    return {row['course_id']: row for row in rows}
+
+
+@transaction.atomic
+def recompute_course_stats(course_ids=None):
+    """
+    Rebuild CourseStats rows from Enrollment, CourseReview and Video.
+    Recomputes every course when ``course_ids`` is None. Returns the number
+    of rows written.
+    """
+    courses = Course.objects.all()
+    enrollments = Enrollment.objects.all()
+    reviews = CourseReview.objects.all()
+    videos = Video.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+        enrollments = enrollments.filter(course_id__in=course_ids)
+        reviews = reviews.filter(course_id__in=course_ids)
+        videos = videos.filter(course_id__in=course_ids)
+
+    enrollment_rows = _grouped(enrollments, total=Count('id'))
+    review_rows = _grouped(reviews, total=Count('id'), rating_sum=Sum('rating'))
+    video_rows = _grouped(videos, total=Count('id'))
+
+    ids = list(courses.values_list('id', flat=True))
+    existing = set(CourseStats.objects.filter(
+        course_id__in=ids).values_list('course_id', flat=True))
+    now = timezone.now()
+    to_create, to_update = [], []
+    for course_id in ids:
+        review = review_rows.get(course_id, {})
+        stats = CourseStats(
+            course_id=course_id,
+            enrollments_count=enrollment_rows.get(
+                course_id, {}).get('total', 0),
+            ratings_count=review.get('total', 0),
+            rating_sum=review.get('rating_sum') or 0,
+            video_count=video_rows.get(course_id, {}).get('total', 0),
+            updated_at=now,
+        )
+        (to_update if course_id in existing else to_create).append(stats)
+
+    CourseStats.objects.bulk_create(to_create, batch_size=500)
+    CourseStats.objects.bulk_update(
+        to_update,
+        ['enrollments_count', 'ratings_count',
+            'rating_sum', 'video_count', 'updated_at'],
+        batch_size=500,
+    )
+    return len(to_create) + len(to_update)
+
+
+def create_stats_indexes(using='default', **kwargs):
+    """
+    Index enrollments_count in the exact order of the "popular" sorts
+    (DESC NULLS LAST, then course id), so their top-N walks the index.
+    Connected to post_migrate; PostgreSQL only, as SQLite cannot declare
+    NULLS LAST in an index.
+    """
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS course_stats_popular_idx ON {CourseStats._meta.db_table} '
+            f'(enrollments_count DESC NULLS LAST, course_id DESC)')
+
+
+def seed_missing_course_stats(**kwargs):
+    """
+    Create CourseStats for courses that have none (those that predate the
+    table). Connected to post_migrate, so the migration that adds the table
+    also fills it; `manage.py recompute_course_stats` repairs drift later.
+    """
+    missing = list(Course.objects.filter(stats__isnull=True).values_list('id', flat=True))
+    if missing:
+        recompute_course_stats(missing)
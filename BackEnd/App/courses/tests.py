@@ -1,3 +1,366 @@
+from io import StringIO
+from unittest import mock
+
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import Course, Category, Enrollment, CourseReview, Video, CourseStats
+from .stats import seed_missing_course_stats
+
+User = get_user_model()
+
+
+class CourseListQueryCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Programming')
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Instructor',
+            role='instructor'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+        for i in range(12):
+            course = Course.objects.create(
+                title=f'Course {i}',
+                description='Test Description',
+                price=10 + i,
+                category=self.category,
+                instructor=self.instructor,
+                status='approved'
+            )
+            Enrollment.objects.create(student=self.student, course=course)
+            CourseReview.objects.create(
+                course=course, rater=self.student, content='Great', rating=4)
+            Video.objects.create(
+                course=course, title='Intro', url='https://example.com/v.mp4')
+
+    def _count_queries(self, limit):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                '/api/courses/', {'limit': limit, 'order_by': 'enrollments'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant_for_page_size(self):
+        """Serializing a bigger page must not issue more queries"""
+        self.assertEqual(self._count_queries(2), self._count_queries(12))
+
+    def test_query_count_is_constant_for_authenticated_user(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self._count_queries(2), self._count_queries(12))
+
+    def test_annotated_stats_match_course_data(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get('/api/courses/', {'limit': 1})
+        course = response.data['results'][0]
+        self.assertEqual(course['enrollments_count'], 1)
+        self.assertEqual(course['ratings_count'], 1)
+        self.assertEqual(course['average_rating'], 4)
+        self.assertEqual(course['video_count'], 1)
+        self.assertTrue(course['is_enrolled'])
+        self.assertEqual(course['category_name'], 'Programming')
+
+
+class CourseStatsTest(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='testpass123',
+            role='instructor'
+        )
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=99.99,
+            instructor=self.instructor
+        )
+
+    def stats(self):
+        return CourseStats.objects.get(course=self.course)
+
+    def test_counters_follow_writes(self):
+        enrollment = Enrollment.objects.create(
+            student=self.student, course=self.course)
+        review = CourseReview.objects.create(
+            course=self.course, rater=self.student, content='Good', rating=3)
+        video = Video.objects.create(
+            course=self.course, title='Intro', url='https://example.com/v.mp4')
+        stats = self.stats()
+        self.assertEqual(stats.enrollments_count, 1)
+        self.assertEqual(stats.ratings_count, 1)
+        self.assertEqual(stats.average_rating, 3)
+        self.assertEqual(stats.video_count, 1)
+
+        review.rating = 5
+        review.save()
+        self.assertEqual(self.stats().average_rating, 5)
+
+        review.delete()
+        video.delete()
+        enrollment.delete()
+        stats = self.stats()
+        self.assertEqual(stats.enrollments_count, 0)
+        self.assertEqual(stats.ratings_count, 0)
+        self.assertIsNone(stats.average_rating)
+        self.assertEqual(stats.video_count, 0)
+
+    def test_recompute_command_repairs_drift(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        CourseStats.objects.filter(course=self.course).update(
+            enrollments_count=42, video_count=7)
+        call_command('recompute_course_stats', stdout=StringIO())
+        stats = self.stats()
+        self.assertEqual(stats.enrollments_count, 1)
+        self.assertEqual(stats.video_count, 0)
+
+    def test_missing_stats_are_seeded_after_migrate(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        # As for a course that predates the CourseStats table
+        CourseStats.objects.filter(course=self.course).delete()
+        seed_missing_course_stats()
+        self.assertEqual(self.stats().enrollments_count, 1)
+
+    def test_course_delete_cascades_stats(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.course.delete()
+        self.assertFalse(CourseStats.objects.exists())
+
+
+class CourseSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        web = Category.objects.create(name='Web Development')
+        data = Category.objects.create(name='Data Science')
+        instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='testpass123',
+            first_name='Grace',
+            last_name='Hopper',
+            role='instructor'
+        )
+        self.django = Course.objects.create(
+            title='Django for Beginners', description='Build web apps with Python',
+            category=web, instructor=instructor, status='approved')
+        self.pandas = Course.objects.create(
+            title='Python Data Analysis with Pandas', description='Python dataframes',
+            learning_objectives=['Clean data', 'Plot charts'],
+            category=data, instructor=instructor, status='approved')
+        self.draft = Course.objects.create(
+            title='Django Internals', description='Unreleased',
+            instructor=instructor, status='pending')
+
+    def search(self, text):
+        response = self.client.get(
+            '/api/courses/', {'search': text, 'search_mode': 'fulltext', 'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return [c['id'] for c in response.data['results']]
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.search('python'), [
+                         self.pandas.id, self.django.id])
+        self.assertEqual(self.search('django'), [self.django.id])
+
+    def test_prefix_typo_and_related_fields(self):
+        self.assertEqual(self.search('panda'), [self.pandas.id])
+        self.assertEqual(self.search('djnago'), [self.django.id])
+        self.assertEqual(self.search('plot charts'), [self.pandas.id])
+        self.assertEqual(self.search('hopper data'), [self.pandas.id])
+
+    def test_index_follows_course_updates(self):
+        self.draft.status = 'approved'
+        self.draft.save()
+        self.assertEqual(self.search('internals'), [self.draft.id])
+
+    def test_instructor_saves_reindex_only_on_name_changes(self):
+        instructor = self.django.instructor
+        with mock.patch('courses.signals.index_courses') as index_courses:
+            instructor.last_login = timezone.now()
+            instructor.save(update_fields=['last_login'])
+            instructor.save()
+            index_courses.assert_not_called()
+            instructor.last_name = 'Lovelace'
+            instructor.save()
+            index_courses.assert_called_once()
+
+    def test_suggest_only_approved_titles(self):
+        response = self.client.get('/api/courses/search/suggest/', {'q': 'dja'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+                         {'id': self.django.id, 'title': 'Django for Beginners'}])
+
+
+class CoursePaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='testpass123',
+            role='instructor'
+        )
+        for i in range(7):
+            Course.objects.create(
+                title=f'Course {i}', description='Test Description',
+                price=[30, 10, 20, 10, 50, 40, 10][i],
+                instructor=instructor, status='approved')
+
+    def walk(self, **params):
+        ids, cursor = [], ''
+        while True:
+            response = self.client.get(
+                '/api/courses/', {'limit': 3, 'cursor': cursor, **params})
+            self.assertEqual(response.status_code, 200)
+            ids += [c['id'] for c in response.data['results']]
+            if not response.data['has_more']:
+                self.assertIsNone(response.data['next_cursor'])
+                return ids
+            cursor = response.data['next_cursor']
+
+    def test_cursor_walk_matches_full_ordering(self):
+        for order_by, ordering in [
+            ('price_asc', ('price', 'id')),
+            ('price_desc', ('-price', '-id')),
+            ('recent', ('-created_at', '-id')),
+        ]:
+            expected = list(Course.objects.order_by(
+                *ordering).values_list('id', flat=True))
+            self.assertEqual(self.walk(order_by=order_by), expected)
+
+    def test_enrollments_cursor_walk_puts_missing_stats_last(self):
+        students = [User.objects.create_user(
+            username=f's{i}', email=f's{i}@test.com', password='pw', role='student')
+            for i in range(3)]
+        courses = list(Course.objects.order_by('id'))
+        for i, student in enumerate(students):
+            for course in courses[:i + 1]:
+                Enrollment.objects.create(student=student, course=course)
+        CourseStats.objects.filter(course=courses[-1]).delete()
+        expected = [courses[0].id, courses[1].id, courses[2].id] + \
+            [c.id for c in reversed(courses[3:-1])] + [courses[-1].id]
+        self.assertEqual(self.walk(order_by='enrollments'), expected)
+
+    def test_limit_is_capped_and_count_can_be_skipped(self):
+        response = self.client.get(
+            '/api/courses/', {'limit': 10000, 'count': 'none', 'cursor': ''})
+        self.assertEqual(response.data['limit'], 100)
+        self.assertIsNone(response.data['total'])
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(
+            '/api/courses/', {'cursor': 'not-a-cursor', 'order_by': 'recent'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_mode_still_supported(self):
+        response = self.client.get('/api/courses/', {'page': 2, 'limit': 3})
+        self.assertEqual(response.data['total'], 7)
+        self.assertEqual(response.data['pages'], 3)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['catalog_versions'].clear()
+        self.client = APIClient()
+        self.instructor = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='testpass123',
+            role='instructor'
+        )
+        self.course = Course.objects.create(
+            title='Cached Course', description='Test Description',
+            instructor=self.instructor, status='approved')
+
+    def test_anonymous_list_is_served_from_cache(self):
+        self.client.get('/api/courses/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_write_bumps_version(self):
+        self.client.get(f'/api/courses/{self.course.id}/')
+        self.course.title = 'Renamed Course'
+        self.course.save()
+        response = self.client.get(f'/api/courses/{self.course.id}/')
+        self.assertEqual(response.data['title'], 'Renamed Course')
+        response = self.client.get('/api/courses/')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed Course')
+
+    def test_enrollment_bumps_version(self):
+        self.client.get(f'/api/courses/{self.course.id}/')
+        student = User.objects.create_user(
+            username='student', email='student@test.com', password='testpass123', role='student')
+        Enrollment.objects.create(student=student, course=self.course)
+        response = self.client.get(f'/api/courses/{self.course.id}/')
+        self.assertEqual(response.data['enrollments_count'], 1)
+
+    def test_enrollment_keeps_catalog_pages(self):
+        self.client.get('/api/courses/')
+        student = User.objects.create_user(
+            username='student', email='student@test.com', password='testpass123', role='student')
+        Enrollment.objects.create(student=student, course=self.course)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/courses/')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_instructor_list_only_bumped_by_listed_changes(self):
+        self.client.get('/api/courses/instructors/')
+        student = User.objects.create_user(
+            username='student', email='student@test.com', password='testpass123', role='student')
+        student.first_name = 'Renamed'
+        student.save()
+        self.instructor.last_login = timezone.now()
+        self.instructor.save(update_fields=['last_login'])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/courses/instructors/')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.instructor.first_name = 'Renamed'
+        self.instructor.save()
+        response = self.client.get('/api/courses/instructors/')
+        self.assertEqual(response.data[0]['first_name'], 'Renamed')
+
+        student.role = 'instructor'
+        student.save()
+        response = self.client.get('/api/courses/instructors/')
+        self.assertEqual(len(response.data), 2)
+
+    def test_evicted_version_does_not_serve_stale_response(self):
+        self.client.get(f'/api/courses/{self.course.id}/')
+        self.course.title = 'Renamed Course'
+        self.course.save()
+        self.client.get(f'/api/courses/{self.course.id}/')
+        caches['catalog_versions'].clear()
+        response = self.client.get(f'/api/courses/{self.course.id}/')
+        self.assertEqual(response.data['title'], 'Renamed Course')
 
-# Create your tests here.
+    def test_etag_not_modified(self):
+        first = self.client.get('/api/courses/categories/')
+        response = self.client.get(
+            '/api/courses/categories/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -12,6 +12,8 @@ urlpatterns = [
     path('<int:pk>/reject/', views.admin_reject_course,
          name='admin_reject_course'),
     path('categories/', views.get_all_categories, name='get_all_categories'),
+    path('search/suggest/', views.suggest_course_titles,
+         name='suggest_course_titles'),
     # Instructors
     path('instructors/', views.get_instructors, name='get_instructors'),
     path('pending/', views.list_pending_courses, name='list_pending_courses'),
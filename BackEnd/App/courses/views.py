@@ -5,15 +5,18 @@ from rest_framework.response import Response
 from rest_framework import status, parsers, generics
 from .models import Course, Enrollment, Category, Video, CourseReview, CourseNote
 from .serializers import CourseSerializer, EnrollmentSerializer, CategorySerializer, VideoSerializer, CourseReviewSerializer, CourseNoteSerializer
-from exams.serializers import ExamSerializer
+from exams.payloads import exam_payload
 from exams.models import Exam
 from authentication.serializers import UserProfileSerializer
 from authentication.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from notifications.tasks import queue_notification, queue_bulk_notification
+from jobs.queue import enqueue
 from django.db.models import Q
-from notifications.views import send_notification
-from django.db.models import Q
-from notifications.views import send_notification
+from .search import search_courses, suggest_courses
+from .pagination import SortKey, PaginationError, paginate
+from .cache import cache_public_response
 import stripe
 import os
 from dotenv import load_dotenv
@@ -25,12 +28,27 @@ STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 stripe.api_key = STRIPE_SECRET_KEY
 
 
+COURSE_ORDERINGS = {
+    'price_asc': SortKey('price'),
+    'price_desc': SortKey('price', descending=True),
+    # Served by the indexed CourseStats.enrollments_count column
+    'enrollments': SortKey('stats__enrollments_count', descending=True, nullable=True,
+                           attr='enrollments_count'),
+    'recent': SortKey('created_at', descending=True, nullable=True),
+    'relevance': SortKey('search_rank', descending=True),
+}
+DEFAULT_COURSE_ORDERING = SortKey('id')
+REVIEW_ORDERING = SortKey('posted_at', descending=True)
+NOTE_ORDERING = SortKey('posted_at', descending=True)
+
+
 def is_enrolled(user, course):
     return Enrollment.objects.filter(student=user, course=course).exists()
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_public_response(['instructors'])
 def get_instructors(request):
     search = request.query_params.get('search', '')
     instructors = User.objects.filter(role='instructor')
@@ -50,7 +68,8 @@ def get_instructors(request):
 def list_pending_courses(request):
     if request.user.role != 'admin':
         return Response({'error': 'Forbidden'}, status=403)
-    pending = Course.objects.filter(status='pending')
+    pending = Course.objects.filter(
+        status='pending').with_list_stats(request.user)
     return Response(CourseSerializer(pending, many=True, context={'request': request}).data)
 
 
@@ -63,7 +82,7 @@ def get_instructor_with_courses(request, instructor_id):
         return Response({'error': 'Instructor not found'}, status=status.HTTP_404_NOT_FOUND)
     from .serializers import InstructorSerializer, CourseSerializer
     instructor_data = InstructorSerializer(instructor).data
-    courses = instructor.created_courses.all()
+    courses = instructor.created_courses.with_list_stats(request.user)
     courses_data = CourseSerializer(courses, many=True, context={
                                     'request': request}).data  # Pass context
     instructor_data['courses'] = courses_data
@@ -81,16 +100,14 @@ def create_course(request):
         serializer.save(instructor=request.user, status='pending')
         # notify admin(s) about pending course
         try:
-            admin_ids = list(User.objects.filter(
-                role='admin').values_list('id', flat=True))
-            for admin_id in admin_ids:
-                send_notification(
-                    sender_id=request.user.id,
-                    receiver_id=admin_id,
-                    notification_type='course_update',
-                    title='Course Approval Needed',
-                    message=f"'{request.user.get_full_name() or request.user.email}' submitted course '{serializer.data.get('title')}' for approval"
-                )
+            queue_bulk_notification(
+                sender_id=request.user.id,
+                receiver_ids=User.objects.filter(
+                    role='admin').values_list('id', flat=True),
+                notification_type='course_update',
+                title='Course Approval Needed',
+                message=f"'{request.user.get_full_name() or request.user.email}' submitted course '{serializer.data.get('title')}' for approval"
+            )
         except Exception:
             pass
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -113,16 +130,14 @@ def update_course(request, pk):
         updated = serializer.save(status='pending')
         # notify admins about re-approval
         try:
-            admin_ids = list(User.objects.filter(
-                role='admin').values_list('id', flat=True))
-            for admin_id in admin_ids:
-                send_notification(
-                    sender_id=request.user.id,
-                    receiver_id=admin_id,
-                    notification_type='course_update',
-                    title='Course Requires Re-Approval',
-                    message=f"'{request.user.get_full_name() or request.user.email}' updated course '{updated.title}' and it requires approval again"
-                )
+            queue_bulk_notification(
+                sender_id=request.user.id,
+                receiver_ids=User.objects.filter(
+                    role='admin').values_list('id', flat=True),
+                notification_type='course_update',
+                title='Course Requires Re-Approval',
+                message=f"'{request.user.get_full_name() or request.user.email}' updated course '{updated.title}' and it requires approval again"
+            )
         except Exception:
             pass
         return Response(serializer.data)
@@ -142,7 +157,7 @@ def admin_approve_course(request, pk):
     course.save(update_fields=['status', 'rejection_reason'])
     try:
         if course.instructor_id:
-            send_notification(
+            queue_notification(
                 sender_id=request.user.id,
                 receiver_id=course.instructor_id,
                 notification_type='course_update',
@@ -168,7 +183,7 @@ def admin_reject_course(request, pk):
     course.save(update_fields=['status', 'rejection_reason'])
     try:
         if course.instructor_id:
-            send_notification(
+            queue_notification(
                 sender_id=request.user.id,
                 receiver_id=course.instructor_id,
                 notification_type='course_update',
@@ -195,6 +210,7 @@ def delete_course(request, pk):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_public_response(['catalog'])
 def get_courses(request):
     # Query params
     search = request.query_params.get('search')
@@ -205,18 +221,22 @@ def get_courses(request):
     max_price = request.query_params.get('max_price')
     # price_asc, price_desc, enrollments, recent
     order_by = request.query_params.get('order_by')
-    page = int(request.query_params.get('page', 1))
-    limit = int(request.query_params.get('limit', 5))
     sort = request.query_params.get('sort')  # e.g., 'top_sellers'
     # Filter for top sellers (by number of enrollments)
     top_sellers = request.query_params.get('top_sellers')
     min_enrollments_param = request.query_params.get('min_enrollments')
 
     # Base queryset: only approved courses visible to public
-    courses = Course.objects.filter(status='approved')
-
-    # Search filter
-    if search:
+    courses = Course.objects.filter(
+        status='approved').with_list_stats(request.user)
+
+    # Search filter (search_mode=fulltext uses the ranked search engine)
+    search_mode = request.query_params.get('search_mode')
+    if search and search_mode == 'fulltext':
+        courses = search_courses(courses, search)
+        if not order_by:
+            order_by = 'relevance'
+    elif search:
         courses = courses.filter(title__icontains=search)
 
     # Category filter (support multiple categories)
@@ -253,32 +273,29 @@ def get_courses(request):
     if max_price:
         courses = courses.filter(price__lte=max_price)
 
-    # Ordering
-    if order_by == 'price_asc':
-        courses = courses.order_by('price')
-    elif order_by == 'price_desc':
-        courses = courses.order_by('-price')
-    elif order_by == 'enrollments':
-        courses = courses.annotate(enrollments_count=models.Count(
-            'enrollments')).order_by('-enrollments_count')
-    elif order_by == 'recent':
-        courses = courses.order_by('-created_at')
-
-    # Pagination
-    total = courses.count()
-    start = (page - 1) * limit
-    end = start + limit
-    courses_page = courses[start:end]
+    # Ordering + pagination (keyset when ?cursor= is given, page/limit otherwise)
+    sort_key = COURSE_ORDERINGS.get(order_by, DEFAULT_COURSE_ORDERING)
+    try:
+        courses_page, meta = paginate(
+            request, courses, order_by or 'default', sort_key)
+    except PaginationError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     serializer = CourseSerializer(
         courses_page, many=True, context={'request': request})
-    return Response({
-        'results': serializer.data,
-        'total': total,
-        'page': page,
-        'limit': limit,
-        'pages': (total + limit - 1) // limit
-    })
+    return Response({'results': serializer.data, **meta})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def suggest_course_titles(request):
+    """Autocomplete approved course titles from the in-memory search index."""
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    return Response({'query': query, 'results': suggest_courses(query, limit=limit)})
 
 
 @api_view(['GET'])
@@ -292,8 +309,7 @@ def get_course_exam(request, pk):
         exam = Exam.objects.get(course=course)
     except Exam.DoesNotExist:
         return Response({'error': 'Exam not found'}, status=status.HTTP_404_NOT_FOUND)
-    serializer = ExamSerializer(exam)
-    return Response(serializer.data)
+    return Response(exam_payload(exam, request.user))
 
 
 @api_view(['GET'])
@@ -312,8 +328,8 @@ def get_course_enrollments(request, pk):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_student_enrollments(request, student_id):
-    enrollments = Enrollment.objects.filter(student__id=student_id)
-    courses = [enrollment.course for enrollment in enrollments]
+    courses = Course.objects.filter(
+        enrollments__student__id=student_id).with_list_stats(request.user)
     serializer = CourseSerializer(courses, many=True, context={
                                   'request': request})  # Pass context
     return Response(serializer.data)
@@ -344,50 +360,32 @@ def enroll_in_course(request, pk):
     except Exception as e:
         return Response({'error': f'Stripe error: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
-    enrollment = Enrollment.objects.create(student=request.user, course=course)
-
-    # 💳 Create transaction record
-    try:
-        from transactions.models import Transaction
-        transaction = Transaction.objects.create(
-            student=request.user,
-            course=course,
-            amount=course.price,
-            currency='USD',
-            payment_status='completed',
-            payment_method='stripe',
-            stripe_payment_intent_id=intent_id,
-            notes=f'Enrollment in {course.title}',
-            metadata={
-                'enrollment_id': enrollment.id,
-                'course_id': course.id,
-                'student_id': request.user.id,
-                'stripe_intent_status': intent.status,
-            }
-        )
-        print(f"Transaction created: {transaction.transaction_id}")
-    except Exception as e:
-        print(f"Transaction creation error: {e}")
-
-    # 🔔 Send notification to instructor about new enrollment
-    try:
-        send_notification(
+    # 💳 Transaction record and notifications run in the job worker; they
+    # are only queued if the enrollment commits
+    with transaction.atomic():
+        enrollment = Enrollment.objects.create(
+            student=request.user, course=course)
+        enqueue('transactions.record_enrollment_payment',
+                idempotency_key=f'enrollment-payment:{intent_id}',
+                enrollment_id=enrollment.id,
+                intent_id=intent_id,
+                intent_status=intent.status)
+        # 🔔 Notify instructor about new enrollment
+        queue_notification(
             sender_id=request.user.id,
-            receiver_id=course.instructor.id,
+            receiver_id=course.instructor_id,
             notification_type='course_enrollment',
             title=f"New Student Enrollment",
             message=f"{request.user.first_name} {request.user.last_name} enrolled in '{course.title}'"
         )
         # Notify user about successful payment and enrollment
-        send_notification(
-            sender_id=course.instructor.id,
+        queue_notification(
+            sender_id=course.instructor_id,
             receiver_id=request.user.id,
             notification_type='payment_success',
             title="Payment Complete",
             message=f"You have successfully paid and enrolled in '{course.title}'."
         )
-    except Exception as e:
-        print(f"Notification error: {e}")
 
     return Response({'message': 'Payment complete and enrolled successfully'}, status=status.HTTP_201_CREATED)
 
@@ -408,7 +406,7 @@ def mark_course_completed(request, pk):
     enrollment.completed_at = timezone.now()
     enrollment.save(update_fields=['completed_at'])
     try:
-        send_notification(
+        queue_notification(
             sender_id=request.user.id,
             receiver_id=course.instructor_id,
             notification_type='course_update',
@@ -422,6 +420,7 @@ def mark_course_completed(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def withdraw_from_course(request, pk):
     """Withdraw authenticated user from a course (students and instructors allowed)."""
     try:
@@ -450,6 +449,7 @@ def create_category(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_public_response(lambda pk: ['categories', f'course:{pk}'])
 def get_course_by_id(request, pk):
     try:
         course = Course.objects.get(pk=pk)
@@ -466,6 +466,7 @@ def get_course_by_id(request, pk):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_public_response(['categories'])
 def get_all_categories(request):
     categories = Category.objects.all()
     serializer = CategorySerializer(categories, many=True)
@@ -476,6 +477,7 @@ def get_all_categories(request):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_public_response(lambda pk: [f'course:{pk}'])
 def list_course_videos(request, pk):
     try:
         course = Course.objects.get(pk=pk)
@@ -488,7 +490,9 @@ def list_course_videos(request, pk):
 @api_view(['POST'])
 @parser_classes([parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def create_course_video(request, pk):
+    """Add a video by URL or small file; large files go through api/uploads/."""
     try:
         course = Course.objects.get(pk=pk)
     except Course.DoesNotExist:
@@ -510,6 +514,7 @@ def create_course_video(request, pk):
 @api_view(['PUT', 'DELETE'])
 @parser_classes([parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def update_delete_video(request, video_id):
     try:
         video = Video.objects.get(pk=video_id)
@@ -538,7 +543,7 @@ def notify_students(request, pk):
         course = Course.objects.get(pk=pk)
 
         # Check if user is the course instructor
-        if course.instructor != request.user:
+        if course.instructor_id != request.user.id:
             return Response({'error': 'Only the course instructor can send notifications'}, status=status.HTTP_403_FORBIDDEN)
 
         # Get notification data from request
@@ -549,25 +554,23 @@ def notify_students(request, pk):
         if not title or not message:
             return Response({'error': 'Title and message are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get all enrolled students
-        enrollments = Enrollment.objects.filter(course=course)
-        student_count = 0
-
-        # Send notification to each enrolled student
-        for enrollment in enrollments:
-            send_notification(
-                user_id=enrollment.student.id,
-                notification_type='course_update',
-                title=title,
-                message=message,
-                data={
-                    'course_id': course.id,
-                    'course_title': course.title,
-                    'instructor_name': course.instructor.get_full_name(),
-                    'update_type': update_type
-                }
-            )
-            student_count += 1
+        # Send notification to all enrolled students in bulk
+        student_ids = list(Enrollment.objects.filter(
+            course=course).values_list('student_id', flat=True))
+        student_count = len(student_ids)
+        queue_bulk_notification(
+            sender_id=request.user.id,
+            receiver_ids=student_ids,
+            notification_type='course_update',
+            title=title,
+            message=message,
+            data={
+                'course_id': course.id,
+                'course_title': course.title,
+                'instructor_name': request.user.get_full_name(),
+                'update_type': update_type
+            }
+        )
 
         return Response({
             'message': f'Notification sent to {student_count} enrolled students',
@@ -585,6 +588,7 @@ def notify_students(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def create_review(request, course_id):
     course = Course.objects.filter(pk=course_id).first()
     if not course:
@@ -602,6 +606,7 @@ def create_review(request, course_id):
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def edit_review(request, review_id):
     review = CourseReview.objects.filter(
         pk=review_id, rater=request.user).first()
@@ -617,6 +622,7 @@ def edit_review(request, review_id):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def delete_review(request, review_id):
     review = CourseReview.objects.filter(
         pk=review_id, rater=request.user).first()
@@ -673,25 +679,16 @@ def get_course_reviews(request, course_id):
     if not course:
         return Response({'error': 'Course not found'}, status=404)
 
-    # Pagination params
-    page = int(request.query_params.get('page', 1))
-    limit = int(request.query_params.get('limit', 5))
-
-    reviews = CourseReview.objects.filter(course=course)
-    total = reviews.count()
-
-    start = (page - 1) * limit
-    end = start + limit
-    reviews_page = reviews[start:end]
+    reviews = CourseReview.objects.filter(
+        course=course).select_related('rater')
+    try:
+        reviews_page, meta = paginate(
+            request, reviews, 'recent', REVIEW_ORDERING)
+    except PaginationError as e:
+        return Response({'error': str(e)}, status=400)
 
     serializer = CourseReviewSerializer(reviews_page, many=True)
-    return Response({
-        'results': serializer.data,
-        'total': total,
-        'page': page,
-        'limit': limit,
-        'pages': (total + limit - 1) // limit
-    })
+    return Response({'results': serializer.data, **meta})
 
 
 @api_view(['GET'])
@@ -701,29 +698,21 @@ def get_course_notes(request, course_id):
     if not course:
         return Response({'error': 'Course not found'}, status=404)
 
-    # Pagination params
-    page = int(request.query_params.get('page', 1))
-    limit = int(request.query_params.get('limit', 5))
-
-    notes = CourseNote.objects.filter(course=course)
-    total = notes.count()
-
-    start = (page - 1) * limit
-    end = start + limit
-    notes_page = notes[start:end]
+    notes = CourseNote.objects.filter(
+        course=course).select_related('author')
+    try:
+        notes_page, meta = paginate(
+            request, notes, 'recent', NOTE_ORDERING)
+    except PaginationError as e:
+        return Response({'error': str(e)}, status=400)
 
     serializer = CourseNoteSerializer(notes_page, many=True)
-    return Response({
-        'results': serializer.data,
-        'total': total,
-        'page': page,
-        'limit': limit,
-        'pages': (total + limit - 1) // limit
-    })
+    return Response({'results': serializer.data, **meta})
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_public_response(['catalog'])
 def recommend_courses(request, course_id):
     """
     Recommend up to 4 courses with the same category as the given course.
@@ -735,7 +724,7 @@ def recommend_courses(request, course_id):
 
     # Get courses with the same category, exclude the current course
     recommended = Course.objects.filter(
-        category=course.category).exclude(id=course.id)[:4]
+        category=course.category).exclude(id=course.id).with_list_stats(request.user)[:4]
     serializer = CourseSerializer(
         recommended, many=True, context={'request': request})
     return Response(serializer.data)
@@ -750,21 +739,21 @@ def recommend_for_user(request):
     """
     user = request.user
     interest_ids = list(user.interests.values_list('id', flat=True))
-    recommended = Course.objects.none()
+    recommended = []
 
     if interest_ids:
-        recommended = Course.objects.filter(
-            category__id__in=interest_ids).distinct()[:4]
+        recommended = list(Course.objects.filter(
+            category__id__in=interest_ids).distinct().with_list_stats(user)[:4])
 
-    count = recommended.count()
+    count = len(recommended)
     if count < 4:
         # Fill with most enrolled courses not already recommended
-        exclude_ids = recommended.values_list('id', flat=True)
+        exclude_ids = [c.id for c in recommended]
         fill_courses = Course.objects.exclude(id__in=exclude_ids)\
-            .annotate(enrollments_count=models.Count('enrollments'))\
-            .order_by('-enrollments_count')[:4 - count]
+            .with_list_stats(user)\
+            .order_by(F('stats__enrollments_count').desc(nulls_last=True))[:4 - count]
         # Combine QuerySets
-        recommended = list(recommended) + list(fill_courses)
+        recommended = recommended + list(fill_courses)
 
     serializer = CourseSerializer(
         recommended, many=True, context={'request': request})
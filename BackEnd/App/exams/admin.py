@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Exam, Question
+from .models import Exam, ExamAttempt, Question
 
 
 @admin.register(Question)
@@ -21,3 +21,11 @@ class ExamAdmin(admin.ModelAdmin):
     def question_count(self, obj):
         return obj.questions.count()
     question_count.short_description = 'Questions'
+
+
+@admin.register(ExamAttempt)
+class ExamAttemptAdmin(admin.ModelAdmin):
+    list_display = ['exam', 'student', 'score', 'max_score', 'status', 'submitted_at']
+    list_filter = ['status', 'submitted_at']
+    search_fields = ['exam__name', 'student__email']
+    readonly_fields = ['submitted_at', 'graded_at']
@@ -0,0 +1,335 @@
+"""
+Psychometric item analysis.
+
+Every attempt's answers are held as one (attempt x question) matrix of
+selection masks, encoded with the exam's answer key (see exams.grading).
+Each cell uses the smallest unsigned dtype that fits the largest question,
+which is one byte for up to seven choices. The top bit of the cell marks a
+selection that is no longer a choice of the question. The matrix is cached
+per exam under ``exams:analysis_matrix:<exam_id>``, along with the choice
+id behind each bit. New attempts are appended to it, so after the first
+build a refresh only reads the answers of attempts submitted since.
+Attempts never change their selections; regrading only rescores them. When
+the key changes, the cached matrix is translated to the new key's layout
+in memory instead of being rebuilt from the database.
+
+When the cache is shared with the job worker (ANALYSIS_BUILD_IN_WORKER), a
+refresh that would read more than ANALYSIS_INLINE_ATTEMPTS attempts (the
+first build of a large exam, or the cache was lost) raises
+AnalysisPending. The caller then queues 'exams.item_analysis', which does
+the build in the job worker. With a per-process cache the worker's result
+would never reach the web processes, so the build runs in the request.
+
+From the matrix, the statistics are plain array operations:
+
+* difficulty: the share of attempts answering the question correctly
+* discrimination: difficulty in the top 27% of total scores minus the
+  bottom 27%, plus the point-biserial correlation with the rest score
+* distractors: how often each choice was picked, overall and in the top
+  and bottom groups
+* the score distribution, with Cronbach's alpha (KR-20 for 1-point items)
+
+Scores are recomputed from the current key rather than read from the
+attempts, so the analysis is right even while a regrade is pending. The
+result is cached under a fingerprint of the exam's attempts (count and
+last id), so it is recomputed only when attempts arrive or are removed.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .grading import get_answer_key
+from .models import AttemptAnswer, Choice, ExamAttempt, Question
+
+ANALYSIS_CACHE_TTL = 24 * 60 * 60
+# Attempts whose answers are read per query while building the matrix
+MATRIX_CHUNK_SIZE = 5000
+# Larger refreshes are left to the job worker (about a second at 40 questions)
+ANALYSIS_INLINE_ATTEMPTS = 5000
+# Kelley's upper/lower group fraction for the discrimination index
+GROUP_FRACTION = 0.27
+
+
+class AnalysisPending(Exception):
+    """The matrix needs more reading than a request should do."""
+
+    def __init__(self, exam_id, version, fingerprint):
+        super().__init__(f'Item analysis of exam {exam_id} needs a build in the job worker')
+        # One build job per exam state
+        self.idempotency_key = (
+            f'exams.item_analysis:{exam_id}:{version}:{fingerprint[0]}:{fingerprint[1]}')
+
+
+def _fingerprint(exam):
+    attempts = ExamAttempt.objects.filter(exam=exam).aggregate(n=Count('id'), last=Max('id'))
+    return attempts['n'], attempts['last'] or 0
+
+
+def _cell_layout(answer_key):
+    """(choice bits per cell, cell dtype) for this key."""
+    per_question = np.bincount(answer_key.choice_columns, minlength=len(answer_key.question_ids))
+    width = int(per_question.max()) if len(per_question) else 0
+    # One extra bit flags invalid selections
+    return width, np.min_scalar_type((1 << (width + 1)) - 1)
+
+
+def _bit_choices(answer_key, width):
+    """(question x bit) table of the choice id behind each bit, 0 where unused."""
+    table = np.zeros((len(answer_key.question_ids), width), dtype=np.int64)
+    for choice_id, column, bit in zip(answer_key.choice_ids, answer_key.choice_columns,
+                                      answer_key.choice_bits):
+        table[column, int(bit).bit_length() - 1] = choice_id
+    return table
+
+
+def _translate(state, answer_key, width, dtype, choices):
+    """Re-encode a cached matrix built with an older key against ``answer_key``."""
+    matrix = state['matrix']
+    position = {int(choice_id): (column, bit)
+                for column, row in enumerate(choices) for bit, choice_id in enumerate(row) if choice_id}
+    translated = np.zeros((len(matrix), len(answer_key.question_ids)), dtype=dtype)
+    for old_column, question_id in enumerate(state['question_ids']):
+        column = answer_key.index.get(question_id)
+        if column is None:
+            continue  # Removed questions no longer count
+        cells = matrix[:, old_column].astype(np.uint64)
+        masks = np.zeros(len(matrix), dtype=np.uint64)
+        invalid = cells >> np.uint64(state['width'])
+        for old_bit, choice_id in enumerate(state['choices'][old_column]):
+            if not choice_id:
+                continue
+            chosen = (cells >> np.uint64(old_bit)) & np.uint64(1)
+            target = position.get(int(choice_id))
+            if target is not None and target[0] == column:
+                masks |= chosen << np.uint64(target[1])
+            else:
+                # The choice was deleted (or moved to another question)
+                invalid |= chosen
+        translated[:, column] = (masks | (invalid << np.uint64(width))).astype(dtype)
+    return translated
+
+
+def _encode_rows(answer_key, width, dtype, attempt_ids, answers):
+    """Compact mask rows for ``attempt_ids`` from (attempt_id, question_id, selected) answers."""
+    row_of = {attempt_id: i for i, attempt_id in enumerate(attempt_ids)}
+    rows = np.zeros((len(attempt_ids), len(answer_key.question_ids)), dtype=dtype)
+    answers = [a for a in answers if a[1] in answer_key.index]
+    if not answers:
+        return rows
+    columns = [answer_key.index[a[1]] for a in answers]
+    masks = answer_key.encode(columns, [a[2] for a in answers]).view(np.uint64)
+    # INVALID_BIT is bit 63; move it down to the cell's flag bit
+    cells = (masks & np.uint64((1 << width) - 1)) | ((masks >> np.uint64(63)) << np.uint64(width))
+    rows[[row_of[a[0]] for a in answers], columns] = cells.astype(dtype)
+    return rows
+
+
+def _append_attempts(exam, answer_key, width, dtype, after_id):
+    """Mask rows for the attempts of ``exam`` with id > after_id, in id order."""
+    blocks = []
+    while True:
+        attempt_ids = list(ExamAttempt.objects.filter(exam=exam, id__gt=after_id)
+                           .order_by('id').values_list('id', flat=True)[:MATRIX_CHUNK_SIZE])
+        if not attempt_ids:
+            break
+        answers = AttemptAnswer.objects.filter(
+            attempt__exam=exam, attempt_id__gte=attempt_ids[0], attempt_id__lte=attempt_ids[-1]
+        ).values_list('attempt_id', 'question_id', 'selected_choices')
+        blocks.append(_encode_rows(answer_key, width, dtype, attempt_ids, answers))
+        after_id = attempt_ids[-1]
+    return blocks, after_id
+
+
+def attempt_matrix(exam, answer_key, fingerprint, max_read=None):
+    """
+    The cached (attempt x question) selection matrix of ``exam``, brought
+    up to date with ``answer_key`` and ``fingerprint`` (attempt count, last
+    id). Raises AnalysisPending if that means reading more than
+    ``max_read`` attempts (None for no limit). Returns (matrix, choice bits
+    per cell).
+    """
+    count, last_id = fingerprint
+    key = f'exams:analysis_matrix:{exam.id}'
+    width, dtype = _cell_layout(answer_key)
+    choices = _bit_choices(answer_key, width)
+    state = cache.get(key)
+    stored = state
+    if state is not None and state['version'] != answer_key.version:
+        state = dict(state, version=answer_key.version, question_ids=answer_key.question_ids,
+                     width=width, choices=choices,
+                     matrix=_translate(state, answer_key, width, dtype, choices))
+
+    if state is None or state['last_id'] > last_id:
+        unread = count
+    else:
+        unread = ExamAttempt.objects.filter(exam=exam, id__gt=state['last_id']).count()
+        # Removed attempts leave rows that can't be told apart, so start over
+        if len(state['matrix']) + unread != count:
+            unread = count
+    if unread == count and (state is None or len(state['matrix'])):
+        state = {'version': answer_key.version, 'question_ids': answer_key.question_ids,
+                 'width': width, 'choices': choices, 'last_id': 0,
+                 'matrix': np.zeros((0, len(answer_key.question_ids)), dtype=dtype)}
+    if max_read is not None and unread > max_read:
+        raise AnalysisPending(exam.id, answer_key.version, fingerprint)
+
+    if unread:
+        blocks, last_read = _append_attempts(exam, answer_key, width, dtype, state['last_id'])
+        state = dict(state, last_id=last_read, matrix=np.concatenate([state['matrix'], *blocks]))
+    if state is not stored:
+        cache.set(key, state, ANALYSIS_CACHE_TTL)
+    return state['matrix'], width
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), 0.0)
+
+
+def _column_correlation(x, y):
+    """Pearson correlation of each column of x with the same column of y (0 where undefined)."""
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+    return _ratio((x * y).sum(axis=0), np.sqrt((x * x).sum(axis=0) * (y * y).sum(axis=0)))
+
+
+def compute_statistics(answer_key, matrix, width):
+    """Item and score statistics of a selection matrix; see the module docstring."""
+    attempts, question_count = matrix.shape
+    dtype = matrix.dtype
+    key_masks = answer_key.masks.astype(dtype)
+    correct = (matrix == key_masks) & (key_masks != 0)
+    item_scores = correct * answer_key.points
+    scores = item_scores.sum(axis=1)
+
+    # Upper and lower groups by total score; ties are broken by submission order
+    ranked = np.argsort(scores, kind='stable')
+    group = int(round(attempts * GROUP_FRACTION)) if attempts > 1 else 0
+    lower, upper = ranked[:group], ranked[attempts - group:]
+
+    difficulty = correct.mean(axis=0) if attempts else np.zeros(question_count)
+    if group:
+        discrimination = correct[upper].mean(axis=0) - correct[lower].mean(axis=0)
+    else:
+        discrimination = np.zeros(question_count)
+    if attempts:
+        point_biserial = _column_correlation(
+            correct.astype(np.float64), (scores[:, None] - item_scores).astype(np.float64))
+        omitted = (matrix == 0).mean(axis=0)
+    else:
+        point_biserial = omitted = np.zeros(question_count)
+
+    # Picks per (question, choice bit)
+    valid = matrix & dtype.type((1 << width) - 1)
+    picks = np.empty((3, question_count, width), dtype=np.int64)
+    for i, rows in enumerate((valid, valid[upper], valid[lower])):
+        for bit in range(width):
+            picks[i, :, bit] = ((rows >> dtype.type(bit)) & dtype.type(1)).sum(axis=0)
+
+    alpha = None
+    if attempts and question_count > 1 and scores.var() > 0:
+        alpha = question_count / (question_count - 1) * (
+            1 - item_scores.var(axis=0).sum() / scores.var())
+
+    return {
+        'attempts': attempts,
+        'scores': scores,
+        'difficulty': difficulty,
+        'discrimination': discrimination,
+        'point_biserial': point_biserial,
+        'omitted': omitted,
+        'picks': picks,
+        'group_size': group,
+        'alpha': alpha,
+    }
+
+
+def _round(value):
+    return round(float(value), 4)
+
+
+def _report(exam, answer_key, stats):
+    """JSON-ready report from compute_statistics() output, with question and choice texts."""
+    texts = dict(Question.objects.filter(exam=exam).values_list('id', 'text'))
+    choice_texts = dict(Choice.objects.filter(question__exam=exam).values_list('id', 'text'))
+    attempts, group = stats['attempts'], stats['group_size']
+    picks = stats['picks']
+    bits = [int(b).bit_length() - 1 for b in answer_key.choice_bits]
+    choices_of = [[] for _ in answer_key.question_ids]
+    for choice_id, column, bit in zip(answer_key.choice_ids, answer_key.choice_columns, bits):
+        choices_of[column].append((bit, int(choice_id)))
+
+    questions = []
+    for column, question_id in enumerate(answer_key.question_ids):
+        correct_mask = int(answer_key.masks[column])
+        questions.append({
+            'question_id': question_id,
+            'text': texts.get(question_id, ''),
+            'points': int(answer_key.points[column]),
+            'difficulty': _round(stats['difficulty'][column]),
+            'discrimination': _round(stats['discrimination'][column]),
+            'point_biserial': _round(stats['point_biserial'][column]),
+            'omitted': _round(stats['omitted'][column]),
+            'choices': [{
+                'choice_id': choice_id,
+                'text': choice_texts.get(choice_id, ''),
+                'is_correct': bool(correct_mask >> bit & 1),
+                'count': int(picks[0, column, bit]),
+                'rate': _round(picks[0, column, bit] / attempts) if attempts else 0.0,
+                'upper_rate': _round(picks[1, column, bit] / group) if group else 0.0,
+                'lower_rate': _round(picks[2, column, bit] / group) if group else 0.0,
+            } for bit, choice_id in sorted(choices_of[column])],
+        })
+
+    scores = stats['scores']
+    # Points may be negative, so the achievable range can start below zero
+    lowest = int(answer_key.points.clip(max=0).sum())
+    highest = int(answer_key.points.clip(min=0).sum())
+    if attempts:
+        q1, median, q3 = np.percentile(scores, [25, 50, 75])
+        summary = {
+            'mean': _round(scores.mean()), 'std': _round(scores.std()),
+            'min': int(scores.min()), 'max': int(scores.max()),
+            'median': _round(median), 'quartiles': [_round(q1), _round(q3)],
+        }
+    else:
+        summary = {'mean': None, 'std': None, 'min': None, 'max': None,
+                   'median': None, 'quartiles': None}
+    return {
+        'exam_id': exam.id,
+        'key_version': answer_key.version,
+        'attempts': attempts,
+        'max_score': answer_key.max_score,
+        'scores': {
+            **summary,
+            'reliability': None if stats['alpha'] is None else _round(stats['alpha']),
+            # histogram[i] = attempts scoring histogram_min + i
+            'histogram_min': lowest,
+            'histogram': np.bincount(scores - lowest, minlength=highest - lowest + 1).tolist(),
+        },
+        'questions': questions,
+        'computed_at': timezone.now().isoformat(),
+    }
+
+
+def item_analysis(exam, inline=True):
+    """
+    Item analysis report for ``exam`` (see the module docstring), which
+    must carry its current key_version. A cache hit costs one aggregate
+    query over the exam's attempts. With ``inline`` (in a request) and
+    ANALYSIS_BUILD_IN_WORKER, raises AnalysisPending instead of reading more
+    than ANALYSIS_INLINE_ATTEMPTS attempts.
+    """
+    fingerprint = _fingerprint(exam)
+    key = f'exams:analysis:{exam.id}:{exam.key_version}:{fingerprint[0]}:{fingerprint[1]}'
+    report = cache.get(key)
+    if report is None:
+        answer_key = get_answer_key(exam)
+        offload = inline and getattr(settings, 'ANALYSIS_BUILD_IN_WORKER', False)
+        matrix, width = attempt_matrix(
+            exam, answer_key, fingerprint, ANALYSIS_INLINE_ATTEMPTS if offload else None)
+        report = _report(exam, answer_key, compute_statistics(answer_key, matrix, width))
+        cache.set(key, report, ANALYSIS_CACHE_TTL)
+    return report
@@ -0,0 +1,265 @@
+"""
+Question-bank import/export as JSON Lines or CSV.
+
+JSON Lines: one question per line,
+``{"text": ..., "points": 1, "question_type": "multiple_choice",
+"choices": [{"text": ..., "is_correct": true}, ...]}``.
+
+CSV: a header row ``question,points,question_type,choice_1,correct_1,...``
+with as many choice/correct column pairs as the largest question needs;
+correct flags are 1/0 (true/false and yes/no are accepted on import).
+
+Both directions stream: export is a generator over
+``iterator(chunk_size=EXPORT_CHUNK_SIZE)`` with choices prefetched per
+chunk, and import parses the upload line by line and inserts questions
+and choices with bulk_create every IMPORT_CHUNK_SIZE rows, so memory use
+is bounded by the chunk size rather than the size of the bank.
+"""
+import codecs
+import csv
+import json
+from itertools import chain
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+
+from .models import Choice, Exam, Question
+from .editing import TRUE_FALSE_CHOICES
+from .serializers import is_true_false_question
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows per chunk of the HTTP response
+EXPORT_BLOCK_ROWS = 500
+IMPORT_CHUNK_SIZE = 1000
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+_FLAGS = {'1': True, 'true': True, 'yes': True, '0': False, 'false': False, 'no': False, '': False}
+
+
+class ImportRowError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'Line {line}: {message}')
+        self.line = line
+
+
+# ==================== EXPORT ====================
+
+
+def _iter_questions(questions):
+    return questions.order_by('id').prefetch_related(
+        Prefetch('choices', queryset=Choice.objects.order_by('order', 'id'))
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def question_record(question):
+    return {
+        'text': question.text,
+        'points': question.points,
+        'question_type': question.question_type,
+        'choices': [{'text': c.text, 'is_correct': c.is_correct} for c in question.choices.all()],
+    }
+
+
+def export_jsonl(questions):
+    for question in _iter_questions(questions):
+        yield json.dumps(question_record(question), ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted row back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(questions):
+    width = questions.annotate(n=Count('choices')).aggregate(width=Max('n'))['width'] or 0
+    writer = csv.writer(_Echo())
+    header = ['question', 'points', 'question_type']
+    for i in range(1, width + 1):
+        header += [f'choice_{i}', f'correct_{i}']
+    yield writer.writerow(header)
+    for question in _iter_questions(questions):
+        row = [question.text, question.points, question.question_type]
+        for choice in question.choices.all():
+            row += [choice.text, int(choice.is_correct)]
+        yield writer.writerow(row)
+
+
+def _blocks(rows, size=EXPORT_BLOCK_ROWS):
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+async def _async_blocks(blocks):
+    # One thread hop per block; thread-sensitive keeps the DB cursor on one thread
+    next_block = sync_to_async(next, thread_sensitive=True)
+    while (block := await next_block(blocks, None)) is not None:
+        yield block
+
+
+def export_questions(questions, file_format, asynchronous=False):
+    """
+    Export content for a StreamingHttpResponse. Under ASGI pass
+    ``asynchronous=True``: Django buffers a synchronous iterator into a
+    list before serving it there, which would defeat the streaming.
+    """
+    rows = export_csv(questions) if file_format == 'csv' else export_jsonl(questions)
+    blocks = _blocks(rows)
+    return _async_blocks(blocks) if asynchronous else blocks
+
+
+# ==================== IMPORT ====================
+
+
+def _clean_record(line, record):
+    """Validate one parsed question; returns (question fields, [(text, is_correct)])."""
+    if not isinstance(record, dict):
+        raise ImportRowError(line, 'expected a JSON object')
+    text = record.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise ImportRowError(line, 'question text is required')
+    try:
+        points = int(record.get('points', 1))
+    except (TypeError, ValueError):
+        raise ImportRowError(line, 'points must be an integer')
+    question_type = record.get('question_type') or 'multiple_choice'
+    if question_type not in dict(Question.QUESTION_TYPES):
+        raise ImportRowError(line, f'unknown question_type {question_type!r}')
+
+    choices = record.get('choices') or []
+    if not isinstance(choices, list):
+        raise ImportRowError(line, 'choices must be a list')
+    cleaned = []
+    for choice in choices:
+        if not isinstance(choice, dict) or not isinstance(choice.get('text'), str) or not choice['text']:
+            raise ImportRowError(line, 'every choice needs text')
+        if len(choice['text']) > 255:
+            raise ImportRowError(line, 'choice text is limited to 255 characters')
+        cleaned.append((choice['text'], bool(choice.get('is_correct', False))))
+    # Same defaults as QuestionCreateSerializer.create
+    if is_true_false_question(text) or not cleaned:
+        cleaned = [(choice['text'], choice['is_correct']) for choice in TRUE_FALSE_CHOICES]
+    return {'text': text, 'points': points, 'question_type': question_type}, cleaned
+
+
+def parse_jsonl(lines):
+    """Yield (line number, record) from an iterable of JSON Lines (bytes or str)."""
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8-sig' if number == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                raise ImportRowError(number, 'file is not valid UTF-8')
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ImportRowError(number, f'invalid JSON ({e})')
+        yield number, record
+
+
+def _decoded(lines):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    for number, line in enumerate(lines, start=1):
+        try:
+            yield decoder.decode(line)
+        except UnicodeDecodeError:
+            raise ImportRowError(number, 'file is not valid UTF-8')
+
+
+def _csv_rows(reader):
+    """csv.reader rows, with malformed input reported as ImportRowError."""
+    while True:
+        try:
+            yield next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            raise ImportRowError(reader.line_num, f'malformed CSV ({e})')
+
+
+def parse_csv(lines):
+    """Yield (line number, record) from an iterable of CSV lines (bytes or str)."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    lines = chain([first], lines)
+    if isinstance(first, bytes):
+        lines = _decoded(lines)
+    # Strict, so stray quotes are errors instead of silently merged fields
+    reader = csv.reader(lines, strict=True)
+    rows = _csv_rows(reader)
+    header = [column.strip().lower() for column in next(rows, [])]
+    if 'question' not in header:
+        raise ImportRowError(1, "CSV header must include a 'question' column")
+    pairs = []
+    i = 1
+    while f'choice_{i}' in header:
+        pairs.append((header.index(f'choice_{i}'),
+                      header.index(f'correct_{i}') if f'correct_{i}' in header else None))
+        i += 1
+    for row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        row += [''] * (len(header) - len(row))
+        values = dict(zip(header, row))
+        choices = []
+        for text_index, flag_index in pairs:
+            if not row[text_index]:
+                continue
+            flag = row[flag_index].strip().lower() if flag_index is not None else ''
+            if flag not in _FLAGS:
+                raise ImportRowError(reader.line_num, f'correct flag {flag!r} must be 1/0')
+            choices.append({'text': row[text_index], 'is_correct': _FLAGS[flag]})
+        yield reader.line_num, {
+            'text': values['question'],
+            'points': values.get('points') or 1,
+            'question_type': values.get('question_type'),
+            'choices': choices,
+        }
+
+
+def _flush(exam, user, batch):
+    questions = Question.objects.bulk_create(
+        [Question(exam=exam, created_by=user, **fields) for fields, _ in batch])
+    Choice.objects.bulk_create([
+        Choice(question=question, text=text, is_correct=is_correct, order=order)
+        for question, (_, choices) in zip(questions, batch)
+        for order, (text, is_correct) in enumerate(choices, start=1)
+    ], batch_size=IMPORT_CHUNK_SIZE)
+
+
+def import_questions(lines, file_format, user, exam=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import questions (created by ``user``, optionally into ``exam``) from an
+    iterable of lines. All or nothing: the first invalid row raises
+    ImportRowError and rolls the whole import back. Returns the number of
+    questions imported.
+    """
+    parse = parse_csv if file_format == 'csv' else parse_jsonl
+    imported = 0
+    batch = []
+    with transaction.atomic():
+        for line, record in parse(lines):
+            batch.append(_clean_record(line, record))
+            if len(batch) >= chunk_size:
+                _flush(exam, user, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            _flush(exam, user, batch)
+            imported += len(batch)
+        # bulk_create sends no signals, so bump the answer key once here
+        if exam is not None and imported:
+            Exam.bump_key_version(id=exam.id)
+    return imported
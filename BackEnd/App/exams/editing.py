@@ -0,0 +1,146 @@
+"""
+Bulk exam question editing.
+
+``apply_question_edits`` diffs a submitted question/choice tree against the
+stored one and writes only the differences: bulk_create for new rows,
+bulk_update for changed ones and one delete per model, all in a single
+transaction with one answer-key version bump, so a failure leaves the exam
+untouched and the query count doesn't grow with the number of questions.
+
+Submitted questions with an ``id`` update that question; without one they
+are created. A question's ``choices``, when non-empty, are its complete set: a
+choice matches by ``id``, otherwise the stored choice at the same ``order``
+is reused (so clients resending choices without ids keep stable ids), and
+stored choices left unmatched are deleted. True/False questions and new
+questions without choices get the default True/False pair, as in
+QuestionCreateSerializer. With ``prune=True`` stored questions missing
+from the submission are deleted too.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Choice, Question
+from .serializers import is_true_false_question
+from .signals import single_key_bump
+
+QUESTION_FIELDS = ('text', 'question_type', 'points')
+CHOICE_FIELDS = ('text', 'is_correct', 'order')
+TRUE_FALSE_CHOICES = [
+    {'text': 'True', 'is_correct': True, 'order': 1},
+    {'text': 'False', 'is_correct': False, 'order': 2},
+]
+# Orders are unique per question, so moved choices pass through order + this
+ORDER_SHIFT = 1_000_000
+
+
+class ExamEditError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _desired_choices(question, data, is_new):
+    """The question's complete choice list after the edit, or None to leave it alone."""
+    if is_true_false_question(question.text):
+        return TRUE_FALSE_CHOICES
+    if data.get('choices'):
+        return data['choices']
+    return TRUE_FALSE_CHOICES if is_new else None
+
+
+def _diff_choices(question, desired, stored):
+    """Split ``desired`` into (updated, created, deleted) against ``stored`` {id: Choice}."""
+    unclaimed = dict(stored)
+    by_order = {choice.order: choice for choice in stored.values()}
+    updated, created = [], []
+    for position, data in enumerate(desired, start=1):
+        data = {'order': position, **data}
+        if data.get('id'):
+            choice = unclaimed.pop(data['id'], None)
+            if choice is None:
+                raise ExamEditError(f'Choice with ID {data["id"]} not found in question {question.id}')
+        else:
+            choice = by_order.get(data['order'])
+            if choice is None or choice.id not in unclaimed:
+                created.append(Choice(question=question, **{f: data[f] for f in CHOICE_FIELDS if f in data}))
+                continue
+            del unclaimed[choice.id]
+        changed = {f: data[f] for f in CHOICE_FIELDS if f in data and getattr(choice, f) != data[f]}
+        if changed:
+            updated.append((choice, changed))
+    return updated, created, list(unclaimed.values())
+
+
+def apply_question_edits(exam, user, questions_data, prune=False):
+    """
+    Apply validated ``questions_data`` (see ExamQuestionsEditSerializer) to
+    ``exam``; new questions are created by ``user``. Raises ExamEditError,
+    with nothing written, for unknown question or choice ids.
+    """
+    with transaction.atomic(), single_key_bump(exam.id):
+        stored = {q.id: q for q in Question.objects.filter(exam=exam).select_for_update()}
+        stored_choices = defaultdict(dict)
+        for choice in Choice.objects.filter(question__exam=exam):
+            stored_choices[choice.question_id][choice.id] = choice
+
+        now = timezone.now()
+        changed_questions, new_questions, plans = [], [], []
+        for data in questions_data:
+            if data.get('id'):
+                question = stored.get(data['id'])
+                if question is None:
+                    raise ExamEditError(
+                        f'Question with ID {data["id"]} not found in this exam', status_code=404)
+                changed = [f for f in QUESTION_FIELDS if f in data and getattr(question, f) != data[f]]
+                for field in changed:
+                    setattr(question, field, data[field])
+                if changed:
+                    question.updated_at = now
+                    changed_questions.append(question)
+            else:
+                question = Question(exam=exam, created_by=user,
+                                    **{f: data[f] for f in QUESTION_FIELDS if f in data})
+                new_questions.append(question)
+            desired = _desired_choices(question, data, is_new=question.pk is None)
+            if desired is not None:
+                plans.append((question, desired))
+
+        updated_choices, new_choices, deleted_choices = [], [], []
+        for question, desired in plans:
+            updated, created, deleted = _diff_choices(
+                question, desired, stored_choices.get(question.pk, {}))
+            updated_choices += updated
+            new_choices += created
+            deleted_choices += deleted
+
+        # Deletes first, so their orders are free for moved and new choices
+        if prune:
+            kept = {data['id'] for data in questions_data if data.get('id')}
+            Question.objects.filter(id__in=set(stored) - kept).delete()
+        if deleted_choices:
+            Choice.objects.filter(id__in=[choice.id for choice in deleted_choices]).delete()
+
+        moved = [choice for choice, changed in updated_choices if 'order' in changed]
+        if moved:
+            for choice in moved:
+                choice.order += ORDER_SHIFT
+            Choice.objects.bulk_update(moved, ['order'], batch_size=500)
+        for choice, changed in updated_choices:
+            for field, value in changed.items():
+                setattr(choice, field, value)
+        if updated_choices:
+            Choice.objects.bulk_update([choice for choice, _ in updated_choices],
+                                       list(CHOICE_FIELDS), batch_size=500)
+        if changed_questions:
+            Question.objects.bulk_update(
+                changed_questions, list(QUESTION_FIELDS) + ['updated_at'], batch_size=500)
+
+        # Choices of new questions take the question ids assigned here
+        Question.objects.bulk_create(new_questions, batch_size=500)
+        Choice.objects.bulk_create(new_choices, batch_size=500)
+
+    return {'created': len(new_questions), 'updated': len(changed_questions),
+            'choices_created': len(new_choices), 'choices_updated': len(updated_choices),
+            'choices_deleted': len(deleted_choices)}
@@ -0,0 +1,231 @@
+"""
+Exam grading engine.
+
+An exam's answer key is compiled once per ``Exam.key_version`` (two
+queries) and cached under ``exams:answer_key:<exam_id>:<version>``.
+Question/choice edits bump the version (see exams.signals), so a stale
+key is simply never looked up again.
+
+Each question's choices map to bits of an int64, so an answer is one
+integer mask and a question is right when the mask equals the key's
+correct-choice mask. Grading a submission is then one row of array
+comparisons, and ``regrade_exam`` scores thousands of stored attempts
+per batch with the same vectorized NumPy code after the key changes.
+Results go to students as 'exam_result' notifications via the job queue.
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.tasks import queue_bulk_notification, queue_notification
+
+from .models import AttemptAnswer, Choice, ExamAttempt, Question
+
+ANSWER_KEY_CACHE_TTL = 24 * 60 * 60
+REGRADE_BATCH_SIZE = 2000
+# Bit 63 marks a selection that isn't one of the question's current choices
+MAX_CHOICES = 63
+INVALID_BIT = np.int64(-2 ** 63)
+
+
+class InvalidSubmission(ValueError):
+    pass
+
+
+class AnswerKey:
+    """Compiled answer key for one version of an exam."""
+
+    def __init__(self, exam_id, version, questions, choices):
+        self.exam_id = exam_id
+        self.version = version
+        self.question_ids = [question_id for question_id, _ in questions]
+        self.index = {question_id: i for i, question_id in enumerate(self.question_ids)}
+        self.points = np.array([points for _, points in questions], dtype=np.int64)
+        self.max_score = int(self.points.sum())
+        self.masks = np.zeros(len(questions), dtype=np.int64)
+
+        # Choices sorted by id so selections can be looked up with searchsorted
+        choices = sorted(choices)
+        self.choice_ids = np.array([c[0] for c in choices], dtype=np.int64)
+        self.choice_columns = np.empty(len(choices), dtype=np.int64)
+        self.choice_bits = np.empty(len(choices), dtype=np.int64)
+        next_bit = {}
+        for i, (choice_id, question_id, is_correct) in enumerate(choices):
+            column = self.index[question_id]
+            bit = next_bit.get(column, 0)
+            if bit >= MAX_CHOICES:
+                raise ValueError(f'Question {question_id} has more than {MAX_CHOICES} choices')
+            next_bit[column] = bit + 1
+            self.choice_columns[i] = column
+            self.choice_bits[i] = np.int64(1) << bit
+            if is_correct:
+                self.masks[column] |= self.choice_bits[i]
+
+    def encode(self, columns, choice_ids):
+        """
+        Selection masks for ``len(columns)`` answers. ``choice_ids`` is a
+        list of id lists, one per answer; ids that aren't choices of the
+        answer's question set INVALID_BIT so the answer can never match.
+        """
+        columns = np.asarray(columns, dtype=np.int64)
+        masks = np.zeros(len(columns), dtype=np.int64)
+        lengths = np.fromiter((len(ids) for ids in choice_ids), dtype=np.int64, count=len(columns))
+        if not lengths.sum():
+            return masks
+        owners = np.repeat(np.arange(len(columns)), lengths)
+        selected = np.fromiter((c for ids in choice_ids for c in ids), dtype=np.int64,
+                               count=int(lengths.sum()))
+        found = np.searchsorted(self.choice_ids, selected).clip(max=max(len(self.choice_ids) - 1, 0))
+        if len(self.choice_ids):
+            valid = (self.choice_ids[found] == selected) & (
+                self.choice_columns[found] == columns[owners])
+            bits = np.where(valid, self.choice_bits[found], INVALID_BIT)
+        else:
+            bits = np.full(len(selected), INVALID_BIT)
+        np.bitwise_or.at(masks, owners, bits)
+        return masks
+
+    def score(self, selections):
+        """Per-question correctness and total score for an (attempts x questions) mask matrix."""
+        correct = (selections == self.masks) & (self.masks != 0)
+        return correct, correct.astype(np.int64) @ self.points
+
+
+def compile_answer_key(exam_id, version):
+    questions = list(Question.objects.filter(exam_id=exam_id).order_by('id')
+                     .values_list('id', 'points'))
+    choices = list(Choice.objects.filter(question__exam_id=exam_id)
+                   .order_by('question_id', 'order', 'id')
+                   .values_list('id', 'question_id', 'is_correct'))
+    return AnswerKey(exam_id, version, questions, choices)
+
+
+def get_answer_key(exam):
+    key = f'exams:answer_key:{exam.id}:{exam.key_version}'
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = compile_answer_key(exam.id, exam.key_version)
+        cache.set(key, answer_key, ANSWER_KEY_CACHE_TTL)
+    return answer_key
+
+
+def _notify_result(attempt, exam):
+    queue_notification(
+        None, attempt.student_id, 'exam_result', 'Exam result',
+        f'You scored {attempt.score}/{attempt.max_score} on {exam.name}',
+        {'exam_id': exam.id, 'attempt_id': attempt.id,
+         'score': attempt.score, 'max_score': attempt.max_score})
+
+
+def grade_submission(exam, student, answers):
+    """
+    Create and grade an attempt of ``exam`` by ``student``.
+
+    ``answers`` maps question ids to lists of selected choice ids. Raises
+    InvalidSubmission for questions outside the exam or choices outside
+    their question. Unanswered questions score nothing.
+    """
+    answer_key = get_answer_key(exam)
+    answers = {int(question_id): sorted(set(int(c) for c in choice_ids))
+               for question_id, choice_ids in answers.items()}
+    unknown = [question_id for question_id in answers if question_id not in answer_key.index]
+    if unknown:
+        raise InvalidSubmission(f'Questions {unknown} are not part of this exam')
+    question_ids = list(answers)
+    columns = [answer_key.index[question_id] for question_id in question_ids]
+    masks = answer_key.encode(columns, [answers[q] for q in question_ids])
+    if (masks < 0).any():
+        raise InvalidSubmission('Selected choices must belong to their question')
+
+    selections = np.zeros((1, len(answer_key.question_ids)), dtype=np.int64)
+    selections[0, columns] = masks
+    correct, scores = answer_key.score(selections)
+
+    with transaction.atomic():
+        attempt = ExamAttempt.objects.create(
+            exam=exam, student=student, status='graded', score=int(scores[0]),
+            max_score=answer_key.max_score, key_version=answer_key.version,
+            graded_at=timezone.now())
+        AttemptAnswer.objects.bulk_create([
+            AttemptAnswer(
+                attempt=attempt, question_id=question_id, selected_choices=answers[question_id],
+                is_correct=bool(correct[0, column]),
+                points_awarded=int(answer_key.points[column]) if correct[0, column] else 0)
+            for question_id, column in zip(question_ids, columns)
+        ])
+        _notify_result(attempt, exam)
+    return attempt
+
+
+def _regrade_batch(answer_key, attempt_rows):
+    """Rescore one batch of (id, student_id, score) attempts; returns changed student ids."""
+    attempt_ids = [row[0] for row in attempt_rows]
+    row_of = {attempt_id: i for i, attempt_id in enumerate(attempt_ids)}
+    answers = list(AttemptAnswer.objects.filter(attempt_id__in=attempt_ids).values_list(
+        'id', 'attempt_id', 'question_id', 'selected_choices', 'is_correct', 'points_awarded'))
+
+    # Answers to questions that left the exam no longer count
+    columns = np.array([answer_key.index.get(a[2], -1) for a in answers], dtype=np.int64)
+    kept = columns >= 0
+    rows = np.array([row_of[a[1]] for a in answers], dtype=np.int64)
+    masks = answer_key.encode(np.where(kept, columns, 0), [a[3] for a in answers])
+
+    selections = np.zeros((len(attempt_ids), len(answer_key.question_ids)), dtype=np.int64)
+    selections[rows[kept], columns[kept]] = masks[kept]
+    correct, scores = answer_key.score(selections)
+
+    answer_correct = np.zeros(len(answers), dtype=bool)
+    answer_correct[kept] = correct[rows[kept], columns[kept]]
+    answer_points = np.zeros(len(answers), dtype=np.int64)
+    answer_points[kept] = np.where(answer_correct[kept], answer_key.points[columns[kept]], 0)
+    old_correct = np.array([a[4] for a in answers], dtype=bool)
+    old_points = np.array([a[5] for a in answers], dtype=np.int64)
+    changed_answers = np.flatnonzero((answer_correct != old_correct) | (answer_points != old_points))
+
+    old_scores = np.array([row[2] for row in attempt_rows], dtype=np.int64)
+    changed_attempts = np.flatnonzero(scores != old_scores)
+
+    with transaction.atomic():
+        # Few distinct new values per batch, so group rows by value: one
+        # UPDATE ... WHERE id IN (...) each instead of a per-row CASE
+        outcomes = answer_points[changed_answers] * 2 + answer_correct[changed_answers]
+        for outcome in np.unique(outcomes):
+            same = changed_answers[outcomes == outcome]
+            AttemptAnswer.objects.filter(id__in=[answers[i][0] for i in same]).update(
+                is_correct=bool(outcome % 2), points_awarded=int(outcome // 2))
+        for score in np.unique(scores[changed_attempts]):
+            same = changed_attempts[scores[changed_attempts] == score]
+            ExamAttempt.objects.filter(id__in=[attempt_ids[i] for i in same]).update(score=int(score))
+        ExamAttempt.objects.filter(id__in=attempt_ids).update(
+            status='graded', max_score=answer_key.max_score,
+            key_version=answer_key.version, graded_at=timezone.now())
+    return [attempt_rows[i][1] for i in changed_attempts]
+
+
+def regrade_exam(exam, batch_size=REGRADE_BATCH_SIZE, notify=True):
+    """
+    Rescore every attempt of ``exam`` not yet graded against its current
+    key, ``batch_size`` attempts per transaction. Students whose score
+    changed get one 'exam_result' notification per batch. Returns the
+    number of attempts whose score changed.
+    """
+    exam.refresh_from_db(fields=['key_version'])
+    answer_key = get_answer_key(exam)
+    pending = ExamAttempt.objects.filter(exam=exam).exclude(key_version=answer_key.version)
+    changed = 0
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id).order_by('id')
+                     .values_list('id', 'student_id', 'score')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        students = _regrade_batch(answer_key, batch)
+        changed += len(students)
+        if notify and students:
+            queue_bulk_notification(
+                None, students, 'exam_result', 'Exam result updated',
+                f'Your result for {exam.name} was updated after a change to the answer key',
+                {'exam_id': exam.id})
+    return changed
@@ -0,0 +1,80 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import User
+from exams.grading import get_answer_key, grade_submission, regrade_exam
+from exams.models import Choice, Exam, ExamAttempt, Question
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark exam grading: attempts graded per second on submit and on bulk regrade (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=5000,
+            help='Attempts to submit and then regrade (default: 5000)'
+        )
+        parser.add_argument(
+            '--questions',
+            type=int,
+            default=40,
+            help='Questions in the exam, 4 choices each (default: 40)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['attempts'], options['questions'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, attempts, question_count):
+        instructor = User.objects.create_user(
+            username='bench_instructor', email='bench_instructor@example.com',
+            password=None, role='instructor')
+        exam = Exam.objects.create(name='Benchmark exam', created_by=instructor)
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, text=f'Question {i}', points=1 + i % 3, created_by=instructor)
+            for i in range(question_count)])
+        choices = Choice.objects.bulk_create([
+            Choice(question=question, text=f'Choice {j}', order=j, is_correct=j == 0)
+            for question in questions for j in range(4)])
+        choice_ids = {}
+        for choice in choices:
+            choice_ids.setdefault(choice.question_id, []).append(choice.id)
+        students = User.objects.bulk_create([
+            User(username=f'bench_{i}', email=f'bench_{i}@example.com', role='student')
+            for i in range(attempts)], batch_size=5000)
+        Exam.bump_key_version(id=exam.id)
+        exam.refresh_from_db()
+        get_answer_key(exam)
+
+        rng = random.Random(0)
+        started = time.perf_counter()
+        for student in students:
+            grade_submission(exam, student, {
+                question_id: [rng.choice(ids)] for question_id, ids in choice_ids.items()})
+        submit_rate = attempts / (time.perf_counter() - started)
+
+        # Flip every question's correct answer, as after fixing a wrong key
+        Choice.objects.filter(question__exam=exam).update(is_correct=False)
+        Choice.objects.filter(id__in=[ids[1] for ids in choice_ids.values()]).update(is_correct=True)
+        Exam.bump_key_version(id=exam.id)
+        started = time.perf_counter()
+        changed = regrade_exam(exam)
+        regrade_rate = attempts / (time.perf_counter() - started)
+
+        self.stdout.write(f'{attempts} attempts x {question_count} questions')
+        self.stdout.write(f'  submit:  {submit_rate:>10.0f} attempts/s')
+        self.stdout.write(f'  regrade: {regrade_rate:>10.0f} attempts/s ({changed} scores changed)')
+        assert ExamAttempt.objects.filter(exam=exam, key_version=exam.key_version).count() == attempts
@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import User
+from exams.analysis import attempt_matrix, compute_statistics, item_analysis
+from exams.grading import get_answer_key
+from exams.models import AttemptAnswer, Choice, Exam, ExamAttempt, Question
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark exam item analysis: matrix build, refresh and statistics times (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--attempts',
+            type=int,
+            default=100000,
+            help='Stored attempts to analyse (default: 100000)'
+        )
+        parser.add_argument(
+            '--questions',
+            type=int,
+            default=40,
+            help='Questions in the exam, 4 choices each (default: 40)'
+        )
+        parser.add_argument(
+            '--new-attempts',
+            type=int,
+            default=500,
+            help='Attempts added before the incremental refresh (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['attempts'], options['questions'], options['new_attempts'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _add_attempts(self, exam, students, choice_ids, rng):
+        """Bulk-insert one random attempt per student, bypassing grading."""
+        now = timezone.now()
+        attempts = ExamAttempt.objects.bulk_create([
+            ExamAttempt(exam=exam, student=student, status='graded', key_version=exam.key_version,
+                        submitted_at=now, graded_at=now)
+            for student in students], batch_size=5000)
+        # Stronger students pick the correct (first) choice more often
+        ability = rng.random(len(attempts))
+        for start in range(0, len(attempts), 2000):
+            rows = []
+            for attempt, skill in zip(attempts[start:start + 2000], ability[start:start + 2000]):
+                picks = np.where(rng.random(len(choice_ids)) < skill, 0,
+                                 rng.integers(0, 4, len(choice_ids)))
+                rows += [AttemptAnswer(attempt=attempt, question_id=question_id,
+                                       selected_choices=[ids[pick]])
+                         for (question_id, ids), pick in zip(choice_ids.items(), picks)]
+            AttemptAnswer.objects.bulk_create(rows, batch_size=5000)
+
+    def _run(self, attempt_count, question_count, new_attempts):
+        instructor = User.objects.create_user(
+            username='bench_instructor', email='bench_instructor@example.com',
+            password=None, role='instructor')
+        exam = Exam.objects.create(name='Benchmark exam', created_by=instructor)
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, text=f'Question {i}', points=1 + i % 3, created_by=instructor)
+            for i in range(question_count)])
+        choices = Choice.objects.bulk_create([
+            Choice(question=question, text=f'Choice {j}', order=j, is_correct=j == 0)
+            for question in questions for j in range(4)])
+        choice_ids = {}
+        for choice in choices:
+            choice_ids.setdefault(choice.question_id, []).append(choice.id)
+        students = User.objects.bulk_create([
+            User(username=f'bench_{i}', email=f'bench_{i}@example.com', role='student')
+            for i in range(attempt_count + new_attempts)], batch_size=5000)
+        Exam.bump_key_version(id=exam.id)
+        exam.refresh_from_db()
+
+        rng = np.random.default_rng(0)
+        self.stdout.write(f'Loading {attempt_count} attempts x {question_count} questions...')
+        self._add_attempts(exam, students[:attempt_count], choice_ids, rng)
+        answer_key = get_answer_key(exam)
+
+        started = time.perf_counter()
+        report = item_analysis(exam, inline=False)
+        cold = time.perf_counter() - started
+
+        last_id = ExamAttempt.objects.filter(exam=exam).order_by('-id').values_list('id', flat=True)[0]
+        matrix, width = attempt_matrix(exam, answer_key, (attempt_count, last_id))
+        started = time.perf_counter()
+        compute_statistics(answer_key, matrix, width)
+        statistics = time.perf_counter() - started
+
+        started = time.perf_counter()
+        item_analysis(exam)
+        hit = time.perf_counter() - started
+
+        self._add_attempts(exam, students[attempt_count:], choice_ids, rng)
+        started = time.perf_counter()
+        refreshed = item_analysis(exam)
+        refresh = time.perf_counter() - started
+
+        # Flip one question's key, as after fixing a wrong answer
+        question_id, ids = next(iter(choice_ids.items()))
+        Choice.objects.filter(question_id=question_id).update(is_correct=False)
+        Choice.objects.filter(id=ids[1]).update(is_correct=True)
+        Exam.bump_key_version(id=exam.id)
+        exam.refresh_from_db()
+        started = time.perf_counter()
+        rekeyed = item_analysis(exam)
+        key_change = time.perf_counter() - started
+
+        self.stdout.write(f'  matrix: {matrix.nbytes / 2 ** 20:.1f} MiB ({matrix.dtype})')
+        self.stdout.write(f'  cold build + report:   {cold * 1000:>8.0f} ms')
+        self.stdout.write(f'  statistics only:       {statistics * 1000:>8.0f} ms')
+        self.stdout.write(f'  +{new_attempts} attempts refresh: {refresh * 1000:>8.0f} ms')
+        self.stdout.write(f'  key change refresh:    {key_change * 1000:>8.0f} ms')
+        self.stdout.write(f'  cached:                {hit * 1000:>8.1f} ms')
+        self.stdout.write(f'  reliability {report["scores"]["reliability"]}, '
+                          f'mean score {report["scores"]["mean"]}/{report["max_score"]}')
+        assert refreshed['attempts'] == rekeyed['attempts'] == attempt_count + new_attempts
@@ -0,0 +1,88 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import User
+from exams import bank
+from exams.models import Exam, Question
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark question-bank export and import: rows/s and peak memory (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--questions',
+            type=int,
+            default=50000,
+            help='Questions in the bank, 4 choices each (default: 50000)'
+        )
+        parser.add_argument(
+            '--trace-memory',
+            action='store_true',
+            help='Also report peak Python memory per pass (tracemalloc; several times slower)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['questions'], options['trace_memory'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _measure(self, func):
+        """(result, seconds, peak description) of func()."""
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        peak = ''
+        if self.trace_memory:
+            peak = f', peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB'
+            tracemalloc.stop()
+        return result, elapsed, peak
+
+    def _run(self, count, trace_memory):
+        self.trace_memory = trace_memory
+        instructor = User.objects.create_user(
+            username='bench_instructor', email='bench_instructor@example.com',
+            password=None, role='instructor')
+        source = Exam.objects.create(name='Benchmark bank', created_by=instructor)
+        records = (
+            f'{{"text": "Question {i}", "points": {1 + i % 3}, "choices": ['
+            + ', '.join(f'{{"text": "Choice {j}", "is_correct": {str(j == 0).lower()}}}'
+                        for j in range(4))
+            + ']}\n'
+            for i in range(count))
+        bank.import_questions(records, 'jsonl', instructor, exam=source)
+
+        self.stdout.write(f'{count} questions x 4 choices')
+        for file_format in bank.FORMATS:
+            # Count the streamed bytes without keeping them
+            def drain():
+                size = 0
+                for block in bank.export_questions(Question.objects.filter(exam=source), file_format):
+                    size += len(block)
+                return size
+
+            size, elapsed, peak = self._measure(drain)
+            self.stdout.write(f'  export {file_format:<5} {count / elapsed:>10.0f} rows/s, '
+                              f'{size / 2 ** 20:.1f} MiB out{peak}')
+
+            content = ''.join(bank.export_questions(Question.objects.filter(exam=source), file_format))
+            payload = content.encode().splitlines(keepends=True)
+            del content
+            target = Exam.objects.create(name=f'Imported {file_format}', created_by=instructor)
+            imported, elapsed, peak = self._measure(
+                lambda: bank.import_questions(iter(payload), file_format, instructor, exam=target))
+            # The upload itself is already in memory, as Django would have spooled it
+            self.stdout.write(f'  import {file_format:<5} {imported / elapsed:>10.0f} rows/s{peak}')
+            assert imported == count
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from authentication.models import User
 from courses.models import Course
 
@@ -14,10 +16,18 @@ class Exam(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='exam', null=True, blank=True)
+    # Bumped (with updated_at) whenever a question or choice changes; keys
+    # the cached answer key and exam payloads
+    key_version = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def bump_key_version(cls, **filters):
+        cls.objects.filter(**filters).update(
+            key_version=F('key_version') + 1, updated_at=timezone.now())
+
     class Meta:
         db_table = 'exams'
         ordering = ['-created_at']
@@ -72,3 +82,67 @@ class Choice(models.Model):
         db_table = 'choices'
         ordering = ['order']
         unique_together = ['question', 'order']
+
+
+class ExamAttempt(models.Model):
+    STATUS_CHOICES = (
+        ('submitted', 'Submitted'),
+        ('graded', 'Graded'),
+    )
+
+    exam = models.ForeignKey(
+        Exam,
+        on_delete=models.CASCADE,
+        related_name='attempts'
+    )
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='exam_attempts'
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='submitted')
+    score = models.IntegerField(default=0)
+    max_score = models.IntegerField(default=0)
+    # The Exam.key_version this attempt was last graded against
+    key_version = models.PositiveIntegerField(default=0)
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    graded_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.student.email} - {self.exam.name} ({self.score}/{self.max_score})"
+
+    @property
+    def percentage(self):
+        return round(100 * self.score / self.max_score, 2) if self.max_score else 0.0
+
+    class Meta:
+        db_table = 'exam_attempts'
+        ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['exam', 'student'], name='attempt_exam_student_idx'),
+        ]
+
+
+class AttemptAnswer(models.Model):
+    attempt = models.ForeignKey(
+        ExamAttempt,
+        on_delete=models.CASCADE,
+        related_name='answers'
+    )
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE,
+        related_name='attempt_answers'
+    )
+    # Selected Choice ids; a question is right when they equal its correct set
+    selected_choices = models.JSONField(default=list, blank=True)
+    is_correct = models.BooleanField(default=False)
+    points_awarded = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Attempt {self.attempt_id} - Question {self.question_id}"
+
+    class Meta:
+        db_table = 'attempt_answers'
+        unique_together = ['attempt', 'question']
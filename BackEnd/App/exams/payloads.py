@@ -0,0 +1,77 @@
+"""
+Compiled exam read payloads.
+
+An exam's question/choice tree is loaded in a fixed number of queries
+(questions and choices prefetched, every creator in one lookup) and
+serialized once with ExamSerializer. The result is cached under
+``exams:payload:<exam_id>:<updated_at>:<variant>``; question and choice
+edits touch Exam.updated_at (see Exam.bump_key_version), so an edited exam
+is simply compiled again. The 'student' variant has no ``is_correct``;
+only the exam's instructor gets the 'full' one. Creator profiles inside a
+payload may lag behind profile edits by up to PAYLOAD_CACHE_TTL.
+"""
+from django.core.cache import cache
+from django.db.models import Prefetch, prefetch_related_objects
+
+from authentication.models import User
+
+from .models import Question
+from .serializers import ExamSerializer
+
+PAYLOAD_CACHE_TTL = 60 * 60
+
+
+def _payload_key(exam, student_safe):
+    variant = 'student' if student_safe else 'full'
+    return f'exams:payload:{exam.id}:{exam.updated_at.timestamp()}:{variant}'
+
+
+def load_exam_trees(exams):
+    """Load questions, choices and creators onto ``exams`` in a fixed number of queries."""
+    prefetch_related_objects(
+        exams, Prefetch('questions', queryset=Question.objects.prefetch_related('choices')))
+    creator_ids = set()
+    for exam in exams:
+        creator_ids.add(exam.created_by_id)
+        creator_ids.update(question.created_by_id for question in exam.questions.all())
+    creators = User.objects.filter(id__in=creator_ids).prefetch_related('interests').in_bulk()
+    for exam in exams:
+        exam.created_by = creators[exam.created_by_id]
+        for question in exam.questions.all():
+            question.created_by = creators[question.created_by_id]
+    return exams
+
+
+def compile_payload(exam, student_safe=True):
+    """ExamSerializer data for an exam from load_exam_trees, optionally without answers."""
+    data = ExamSerializer(exam).data
+    if student_safe:
+        for question in data['questions']:
+            for choice in question['choices']:
+                choice.pop('is_correct', None)
+    return data
+
+
+def exam_payloads(exams, user=None):
+    """
+    Cached payloads for the Exam instances ``exams`` as seen by ``user``;
+    misses are compiled together in one batch.
+    """
+    keys = {}
+    for exam in exams:
+        student_safe = user is None or exam.created_by_id != user.id
+        keys[exam.id] = (_payload_key(exam, student_safe), student_safe)
+    cached = cache.get_many([key for key, _ in keys.values()])
+    missing = [exam for exam in exams if keys[exam.id][0] not in cached]
+    if missing:
+        compiled = {}
+        for exam in load_exam_trees(missing):
+            key, student_safe = keys[exam.id]
+            compiled[key] = compile_payload(exam, student_safe)
+        cache.set_many(compiled, PAYLOAD_CACHE_TTL)
+        cached.update(compiled)
+    return [cached[keys[exam.id][0]] for exam in exams]
+
+
+def exam_payload(exam, user=None):
+    return exam_payloads([exam], user)[0]
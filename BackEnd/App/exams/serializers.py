@@ -1,9 +1,50 @@
+import re
+
 from rest_framework import serializers
-from .models import Exam, Question, Choice
+from .models import Exam, Question, Choice, ExamAttempt, AttemptAnswer
 from authentication.serializers import UserProfileSerializer
 from courses.models import Course
 
 
+TRUE_FALSE_INDICATORS = [
+    "is this the answer is either true or false?",
+    "is the answer true or false?",
+    "is this true or false?",
+    "true or false?",
+    "is it true or false?",
+    "is this statement true or false?",
+    "is the following true or false?",
+    "is this correct true or false?",
+    "is this the answer true or false?",
+    "is this either true or false?",
+    "is this answer true or false?",
+    "is this the correct answer true or false?",
+    "is this the right answer true or false?",
+    "is this the solution true or false?",
+    "is this the case true or false?",
+    "is this the result true or false?",
+    "is this the outcome true or false?",
+    "is this the conclusion true or false?",
+    "is this the finding true or false?",
+    "is this the observation true or false?"
+]
+
+
+def _compile_indicators(indicators):
+    # An indicator that contains a shorter one can never change the result
+    # (today every phrase ends in "true or false?"), so one search suffices
+    minimal = [i for i in indicators if not any(o != i and o in i for o in indicators)]
+    return re.compile('|'.join(re.escape(i) for i in minimal))
+
+
+_TRUE_FALSE_MATCHER = _compile_indicators(TRUE_FALSE_INDICATORS)
+
+
+def is_true_false_question(text):
+    """Check if the question is asking for True/False answer"""
+    return _TRUE_FALSE_MATCHER.search(text.lower()) is not None
+
+
 class ChoiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Choice
@@ -39,31 +80,7 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
 
     def _is_true_false_question(self, text):
         """Check if the question is asking for True/False answer"""
-        true_false_indicators = [
-            "is this the answer is either true or false?",
-            "is the answer true or false?",
-            "is this true or false?",
-            "true or false?",
-            "is it true or false?",
-            "is this statement true or false?",
-            "is the following true or false?",
-            "is this correct true or false?",
-            "is this the answer true or false?",
-            "is this either true or false?",
-            "is this answer true or false?",
-            "is this the correct answer true or false?",
-            "is this the right answer true or false?",
-            "is this the solution true or false?",
-            "is this the case true or false?",
-            "is this the result true or false?",
-            "is this the outcome true or false?",
-            "is this the conclusion true or false?",
-            "is this the finding true or false?",
-            "is this the observation true or false?"
-        ]
-        
-        question_lower = text.lower().strip()
-        return any(indicator in question_lower for indicator in true_false_indicators)
+        return is_true_false_question(text)
 
     def create(self, validated_data):
         choices_data = validated_data.pop('choices', [])
@@ -155,6 +172,19 @@ class ExamSerializer(serializers.ModelSerializer):
         return obj.questions.count()
 
 
+class ExamSummarySerializer(serializers.ModelSerializer):
+    """Exam listing without questions; expects a question_count annotation"""
+    question_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Exam
+        fields = [
+            'id', 'name', 'created_by', 'question_count',
+            'created_at', 'updated_at', 'course'
+        ]
+        read_only_fields = fields
+
+
 class ExamDetailSerializer(serializers.ModelSerializer):
     created_by = UserProfileSerializer(read_only=True)
     questions = QuestionSerializer(many=True, read_only=True)
@@ -166,3 +196,84 @@ class ExamDetailSerializer(serializers.ModelSerializer):
             'questions', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_by', 'created_at', 'updated_at']
+
+
+class ChoiceEditSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    text = serializers.CharField(max_length=255)
+    is_correct = serializers.BooleanField(default=False)
+    order = serializers.IntegerField(min_value=0, required=False)
+
+
+class QuestionEditSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    text = serializers.CharField(required=False)
+    question_type = serializers.ChoiceField(choices=Question.QUESTION_TYPES, required=False)
+    points = serializers.IntegerField(required=False)
+    choices = ChoiceEditSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('id') and not attrs.get('text'):
+            raise serializers.ValidationError({'text': 'New questions need text'})
+        choices = attrs.get('choices')
+        if choices is not None:
+            # Unspecified orders follow the submitted position
+            orders = [choice.get('order', position) for position, choice in enumerate(choices, start=1)]
+            if len(set(orders)) != len(orders):
+                raise serializers.ValidationError({'choices': 'Choice orders must be unique'})
+            ids = [choice['id'] for choice in choices if choice.get('id')]
+            if len(set(ids)) != len(ids):
+                raise serializers.ValidationError({'choices': 'Duplicate choice ids'})
+        return attrs
+
+
+class ExamQuestionsEditSerializer(serializers.Serializer):
+    questions = QuestionEditSerializer(many=True)
+
+    def validate_questions(self, value):
+        ids = [question['id'] for question in value if question.get('id')]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Duplicate question ids')
+        return value
+
+
+class AnswerSubmissionSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    choices = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
+
+
+class ExamSubmissionSerializer(serializers.Serializer):
+    answers = AnswerSubmissionSerializer(many=True)
+
+    def validate_answers(self, value):
+        questions = [answer['question'] for answer in value]
+        if len(set(questions)) != len(questions):
+            raise serializers.ValidationError('Each question can only be answered once')
+        return value
+
+
+class AttemptAnswerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AttemptAnswer
+        fields = ['question', 'selected_choices', 'is_correct', 'points_awarded']
+
+
+class ExamAttemptSerializer(serializers.ModelSerializer):
+    exam_name = serializers.CharField(source='exam.name', read_only=True)
+    percentage = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ExamAttempt
+        fields = [
+            'id', 'exam', 'exam_name', 'student', 'status', 'score',
+            'max_score', 'percentage', 'submitted_at', 'graded_at'
+        ]
+        read_only_fields = fields
+
+
+class ExamAttemptDetailSerializer(ExamAttemptSerializer):
+    answers = AttemptAnswerSerializer(many=True, read_only=True)
+
+    class Meta(ExamAttemptSerializer.Meta):
+        fields = ExamAttemptSerializer.Meta.fields + ['answers']
+        read_only_fields = fields
@@ -0,0 +1,42 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Choice, Exam, Question
+
+_local = threading.local()
+
+
+@contextmanager
+def single_key_bump(exam_id):
+    """
+    Skip the per-row version bumps below while editing ``exam_id`` in bulk
+    and bump it once on success instead (see exams.editing).
+    """
+    _local.suspended = getattr(_local, 'suspended', 0) + 1
+    try:
+        yield
+    finally:
+        _local.suspended -= 1
+    Exam.bump_key_version(id=exam_id)
+
+
+def _bumps_suspended():
+    return getattr(_local, 'suspended', 0) > 0
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Any question edit can change the answer key (see exams.grading)."""
+    if instance.exam_id and not _bumps_suspended():
+        Exam.bump_key_version(id=instance.exam_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    if not _bumps_suspended():
+        Exam.bump_key_version(questions__id=instance.question_id)
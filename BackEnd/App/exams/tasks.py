@@ -0,0 +1,20 @@
+from jobs.queue import task, PRIORITY_LOW
+
+from .analysis import item_analysis
+from .grading import regrade_exam
+from .models import Exam
+
+
+@task('exams.regrade', max_attempts=3)
+def regrade(exam_id):
+    exam = Exam.objects.filter(id=exam_id).first()
+    if exam:
+        regrade_exam(exam)
+
+
+@task('exams.item_analysis', priority=PRIORITY_LOW, max_attempts=3)
+def build_item_analysis(exam_id):
+    """Build (and cache) an item analysis too large to build in a request."""
+    exam = Exam.objects.filter(id=exam_id).first()
+    if exam:
+        item_analysis(exam, inline=False)
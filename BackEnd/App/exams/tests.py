@@ -1,3 +1,407 @@
-from django.test import TestCase
+import json
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from courses.models import Course, Enrollment
+from jobs.queue import run_pending_jobs
+from notifications.models import Notification
+from . import bank
+from .grading import get_answer_key, grade_submission, regrade_exam
+from .models import AttemptAnswer, Choice, Exam, ExamAttempt, Question
+from .serializers import is_true_false_question
+
+
+class ExamTestMixin:
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='inst', email='inst@example.com', password='pw', role='instructor')
+        self.course = Course.objects.create(
+            title='Django', description='d', instructor=self.instructor, price=0, status='approved')
+        self.exam = Exam.objects.create(
+            name='Final', created_by=self.instructor, course=self.course)
+        self.questions = []
+        self.choices = {}
+        # Question 0: single answer, question 1: two correct choices worth 2 points
+        for i, correct in enumerate([{0}, {1, 2}]):
+            question = Question.objects.create(
+                exam=self.exam, text=f'Q{i}', points=i + 1, created_by=self.instructor)
+            self.questions.append(question)
+            self.choices[question.id] = [
+                Choice.objects.create(question=question, text=f'C{j}', order=j, is_correct=j in correct)
+                for j in range(4)]
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='pw', role='student')
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def _choice_ids(self, question, *positions):
+        return [self.choices[question.id][p].id for p in positions]
+
+
+class GradingTest(ExamTestMixin, TestCase):
+    def test_submit_grades_in_one_pass(self):
+        q0, q1 = self.questions
+        url = f'/api/exams/exams/{self.exam.id}/attempts/'
+        answers = [{'question': q0.id, 'choices': self._choice_ids(q0, 0)},
+                   {'question': q1.id, 'choices': self._choice_ids(q1, 1)}]
+        self.exam.refresh_from_db()
+        get_answer_key(self.exam)
+        # exam, enrollment, savepoint, 3 inserts (attempt, answers, notification job),
+        # release, answers for the response; no per-question queries
+        with self.assertNumQueries(8):
+            res = self.client.post(url, {'answers': answers}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual((res.data['score'], res.data['max_score']), (1, 3))
+        self.assertEqual([a['is_correct'] for a in res.data['answers']], [True, False])
+
+        run_pending_jobs()
+        notification = Notification.objects.get(receiver=self.student)
+        self.assertEqual(notification.notification_type, 'exam_result')
+        self.assertEqual(notification.data['score'], 1)
+
+        res = self.client.get(f'/api/exams/attempts/{res.data["id"]}/')
+        self.assertEqual(res.data['percentage'], 33.33)
+
+    def test_rejects_foreign_choices_and_questions(self):
+        q0, q1 = self.questions
+        url = f'/api/exams/exams/{self.exam.id}/attempts/'
+        res = self.client.post(url, {'answers': [
+            {'question': q0.id, 'choices': self._choice_ids(q1, 1)}]}, format='json')
+        self.assertEqual(res.status_code, 400)
+        res = self.client.post(url, {'answers': [
+            {'question': 0, 'choices': []}]}, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(ExamAttempt.objects.exists())
+
+        outsider = User.objects.create_user(
+            username='other', email='other@example.com', password='pw', role='student')
+        self.client.force_authenticate(outsider)
+        res = self.client.post(url, {'answers': []}, format='json')
+        self.assertEqual(res.status_code, 403)
+
+    def test_key_changes_bump_version_and_regrade(self):
+        q0, q1 = self.questions
+        right = grade_submission(self.exam, self.student, {q0.id: self._choice_ids(q0, 0)})
+        wrong = grade_submission(self.exam, self.student, {q0.id: self._choice_ids(q0, 3),
+                                                           q1.id: self._choice_ids(q1, 1, 2)})
+        self.assertEqual((right.score, wrong.score), (1, 2))
+
+        version = Exam.objects.get(id=self.exam.id).key_version
+        Choice.objects.filter(question=q0).update(is_correct=False)
+        Choice.objects.filter(id=self.choices[q0.id][3].id).update(is_correct=True)
+        Exam.bump_key_version(id=self.exam.id)
+        Question.objects.filter(id=q1.id).update(points=5)
+        q0.save()
+        self.assertEqual(Exam.objects.get(id=self.exam.id).key_version, version + 2)
+
+        self.assertEqual(regrade_exam(self.exam, batch_size=1), 2)
+        right.refresh_from_db()
+        wrong.refresh_from_db()
+        self.assertEqual((right.score, wrong.score, wrong.max_score), (0, 6, 6))
+        self.assertTrue(AttemptAnswer.objects.get(attempt=wrong, question=q0).is_correct)
+        self.assertEqual(regrade_exam(self.exam), 0)
+
+
+class ExamPayloadTest(ExamTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_student_payload_is_prefetched_cached_and_safe(self):
+        url = f'/api/exams/exams/?exam_id={self.exam.id}'
+        # exam, questions, choices, creators, creator interests
+        with self.assertNumQueries(5):
+            res = self.client.get(url)
+        self.assertEqual(res.data['question_count'], 2)
+        choices = [c for q in res.data['questions'] for c in q['choices']]
+        self.assertEqual(len(choices), 8)
+        self.assertFalse(any('is_correct' in c for c in choices))
+        self.assertEqual(res.data['questions'][0]['created_by']['email'], 'inst@example.com')
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        # More questions don't add queries; edits recompile the payload
+        Question.objects.create(exam=self.exam, text='Q2', created_by=self.instructor)
+        with self.assertNumQueries(5):
+            res = self.client.get(url)
+        self.assertEqual(res.data['question_count'], 3)
+
+        instructor = APIClient()
+        instructor.force_authenticate(self.instructor)
+        res = instructor.get(url)
+        self.assertIn('is_correct', res.data['questions'][-1]['choices'][0])
+
+    def test_summary_listing(self):
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/exams/exams/?summary=true')
+        self.assertEqual(res.data[0]['question_count'], 2)
+        self.assertNotIn('questions', res.data[0])
+
+
+class ExamEditTest(ExamTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.instructor)
+        self.url = f'/api/exams/exams/{self.exam.id}/questions/'
+
+    def _tree(self, count):
+        return [{'text': f'Question {i}', 'points': 2, 'choices': [
+            {'text': f'C{j}', 'is_correct': j == 0} for j in range(4)]} for i in range(count)]
+
+    def test_bulk_save_uses_constant_queries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.put(self.url, {'questions': self._tree(5)}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.put(self.url, {'questions': self._tree(200)}, format='json')
+        self.assertEqual(res.status_code, 200)
+        # Only the backend's INSERT batching grows with the tree
+        def statements(ctx):
+            return [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith('INSERT')]
+        self.assertEqual(len(statements(large)), len(statements(small)))
+        self.assertLess(len(large.captured_queries), 30)
+        self.assertEqual(res.data['question_count'], 200)
+        self.assertEqual(Choice.objects.filter(question__exam=self.exam).count(), 800)
+
+        # Updating every question and swapping choice orders
+        tree = [{'id': q['id'], 'text': q['text'] + '?', 'choices': [
+            {'id': c['id'], 'text': c['text'], 'order': 5 - c['order']} for c in q['choices']]}
+            for q in res.data['questions']]
+        with CaptureQueriesContext(connection) as update:
+            res = self.client.put(self.url, {'questions': tree}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertLess(len(update.captured_queries), 30)
+        first = Question.objects.get(id=tree[0]['id'])
+        self.assertTrue(first.text.endswith('?'))
+        self.assertEqual([c.text for c in first.choices.all()], ['C3', 'C2', 'C1', 'C0'])
+
+    def test_diff_keeps_ids_and_is_atomic(self):
+        q0, q1 = self.questions
+        version = Exam.objects.get(id=self.exam.id).key_version
+        c0 = self.choices[q0.id]
+        res = self.client.put(self.url, {'questions': [
+            {'id': q0.id, 'text': 'Renamed', 'choices': [
+                {'id': c0[1].id, 'text': 'now first', 'is_correct': True, 'order': 0},
+                {'text': 'C0 again', 'order': 1},
+                {'text': 'brand new', 'order': 7}]},
+            {'text': 'Is this true or false?'},
+        ]}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(Question.objects.filter(id=q1.id).exists())
+        choices = list(Choice.objects.filter(question=q0).order_by('order'))
+        self.assertEqual([(c.text, c.order) for c in choices],
+                         [('now first', 0), ('C0 again', 1), ('brand new', 7)])
+        self.assertEqual(choices[0].id, c0[1].id)
+        new = Question.objects.get(exam=self.exam, text='Is this true or false?')
+        self.assertEqual([c.text for c in new.choices.all()], ['True', 'False'])
+        self.assertEqual(Exam.objects.get(id=self.exam.id).key_version, version + 1)
+
+        before = list(Question.objects.filter(exam=self.exam).values_list('id', 'text'))
+        res = self.client.put(self.url, {'questions': [
+            {'id': q0.id, 'text': 'Changed again'}, {'id': 999999, 'text': 'x'}]}, format='json')
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(list(Question.objects.filter(exam=self.exam).values_list('id', 'text')), before)
+
+    def test_legacy_put_is_atomic(self):
+        q0, _ = self.questions
+        res = self.client.put('/api/exams/exams/', {'id': self.exam.id, 'name': 'Renamed', 'questions': [
+            {'id': q0.id, 'text': 'Edited'},
+            {'text': 'New', 'choices': [{'id': 999999, 'text': 'x'}]},
+        ]}, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(Exam.objects.get(id=self.exam.id).name, 'Final')
+        self.assertEqual(Question.objects.get(id=q0.id).text, 'Q0')
+
+
+class QuestionBankTest(ExamTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.instructor)
+
+    def _export(self, file_format, **params):
+        res = self.client.get('/api/exams/questions/export/',
+                              {'file_format': file_format, **params})
+        self.assertEqual(res.status_code, 200)
+        return b''.join(res.streaming_content)
+
+    def _import(self, name, content, **params):
+        return self.client.post(
+            '/api/exams/questions/import/?' + urlencode(params),
+            {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_round_trip_jsonl_and_csv(self):
+        lines = self._export('jsonl', exam_id=self.exam.id).decode().splitlines()
+        records = sorted((json.loads(line) for line in lines), key=lambda r: r['text'])
+        self.assertEqual(records[1]['points'], 2)
+        self.assertEqual([c['is_correct'] for c in records[1]['choices']], [False, True, True, False])
+
+        content = self._export('csv', exam_id=self.exam.id)
+        header = content.decode().splitlines()[0]
+        self.assertEqual(header, 'question,points,question_type,' + ','.join(
+            f'choice_{i},correct_{i}' for i in range(1, 5)))
+
+        other = Exam.objects.create(name='Copy', created_by=self.instructor)
+        res = self._import('bank.csv', content, file_format='csv', exam_id=other.id)
+        self.assertEqual(res.data, {'imported': 2})
+        copied = Question.objects.get(exam=other, text='Q1')
+        self.assertEqual([(c.text, c.is_correct) for c in copied.choices.all()],
+                         [('C0', False), ('C1', True), ('C2', True), ('C3', False)])
+        res = self._import('bank.jsonl', '\n'.join(lines).encode(), exam_id=other.id)
+        self.assertEqual(Question.objects.filter(exam=other).count(), 4)
+
+        # Streaming under ASGI goes through an async iterator
+        async def collect():
+            chunks = bank.export_questions(Question.objects.filter(exam=other), 'jsonl',
+                                           asynchronous=True)
+            return [chunk async for chunk in chunks]
+        self.assertEqual(''.join(async_to_sync(collect)()).count('\n'), 4)
+
+    def test_invalid_row_rolls_back(self):
+        content = (b'{"text": "Is the sky blue, true or false?"}\n'
+                   b'{"text": "Pick", "choices": [{"text": "a", "is_correct": true}]}\n'
+                   b'{"text": ""}\n')
+        res = self._import('bank.jsonl', content)
+        self.assertEqual((res.status_code, res.data['line']), (400, 3))
+        self.assertEqual(Question.objects.filter(exam=None).count(), 0)
+
+        res = self._import('bank.jsonl', content.rsplit(b'\n', 2)[0])
+        self.assertEqual(res.data, {'imported': 2})
+        true_false = Question.objects.get(text__startswith='Is the sky')
+        self.assertEqual([c.text for c in true_false.choices.all()], ['True', 'False'])
+
+        # Undecodable and malformed files are row errors too
+        for name, bad, line in [
+            ('bank.jsonl', b'{"text": "ok"}\n{"text": "\xff"}\n', 2),
+            ('bank.csv', b'question\nok\n\xff\n', 3),
+            ('bank.csv', b'question\nok\n"a"b\n', 3),
+        ]:
+            res = self._import(name, bad, file_format=name.rsplit('.', 1)[1])
+            self.assertEqual((res.status_code, res.data['line']), (400, line))
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self._import('bank.jsonl', content).status_code, 403)
+
+    def test_true_false_matcher(self):
+        self.assertTrue(is_true_false_question('  Is this statement TRUE or False? '))
+        self.assertTrue(is_true_false_question('Water boils at 100C. True or false?'))
+        self.assertFalse(is_true_false_question('Which is true: or false'))
+
+
+class ItemAnalysisTest(ExamTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _submit(self, student, q0_positions, q1_positions):
+        q0, q1 = self.questions
+        answers = {q0.id: self._choice_ids(q0, *q0_positions)}
+        if q1_positions is not None:
+            answers[q1.id] = self._choice_ids(q1, *q1_positions)
+        return grade_submission(self.exam, student, answers)
+
+    def test_statistics_and_refresh(self):
+        self.exam.refresh_from_db()
+        students = [User.objects.create_user(
+            username=f's{i}', email=f's{i}@example.com', password='pw', role='student')
+            for i in range(4)]
+        # Scores 3, 2, 1, 0; the last student skips question 1
+        self._submit(students[0], [0], [1, 2])
+        self._submit(students[1], [1], [1, 2])
+        self._submit(students[2], [0], [3])
+        self._submit(students[3], [2], None)
+
+        url = f'/api/exams/exams/{self.exam.id}/analysis/'
+        self.client.force_authenticate(self.instructor)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        report = res.data
+        self.assertEqual((report['attempts'], report['max_score']), (4, 3))
+        self.assertEqual(report['scores']['histogram'], [1, 1, 1, 1])
+        q0, q1 = report['questions']
+        self.assertEqual((q0['difficulty'], q1['difficulty'], q1['omitted']), (0.5, 0.5, 0.25))
+        # One attempt each in the top and bottom groups
+        self.assertEqual((q0['discrimination'], q1['discrimination']), (1.0, 1.0))
+        self.assertEqual([c['count'] for c in q0['choices']], [2, 1, 1, 0])
+        self.assertEqual([c['is_correct'] for c in q1['choices']], [False, True, True, False])
+        self.assertEqual([(c['upper_rate'], c['lower_rate']) for c in q0['choices']][:3],
+                         [(1.0, 0.0), (0.0, 0.0), (0.0, 1.0)])
+
+        # Cached until a new attempt arrives
+        with self.assertNumQueries(2):  # exam, attempt fingerprint
+            self.client.get(url)
+        self._submit(students[3], [0], [1, 2])
+        report = self.client.get(url).data
+        self.assertEqual((report['attempts'], report['scores']['histogram']), (5, [1, 1, 1, 2]))
+
+        # A key change rescores the cached selections without rereading them
+        Choice.objects.filter(id__in=self._choice_ids(self.questions[0], 0)).update(is_correct=False)
+        Choice.objects.filter(id__in=self._choice_ids(self.questions[0], 1)).update(is_correct=True)
+        Exam.bump_key_version(id=self.exam.id)
+        with CaptureQueriesContext(connection) as queries:
+            report = self.client.get(url).data
+        self.assertFalse([q for q in queries if 'attempt_answers' in q['sql']])
+        self.assertEqual(report['questions'][0]['difficulty'], 0.2)
+
+        # Deleted and added choices translate the same as a build from scratch
+        self.choices[self.questions[0].id][2].delete()
+        Choice.objects.create(question=self.questions[0], text='C4', order=4)
+        translated = self.client.get(url).data
+        cache.clear()
+        rebuilt = self.client.get(url).data
+        for report in (translated, rebuilt):
+            del report['computed_at']
+        self.assertEqual(translated, rebuilt)
+        self.assertEqual([c['count'] for c in rebuilt['questions'][0]['choices']], [3, 1, 0, 0])
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_negative_points(self):
+        Question.objects.filter(id=self.questions[0].id).update(points=-2)
+        Exam.bump_key_version(id=self.exam.id)
+        self.exam.refresh_from_db()
+        self._submit(self.student, [0], [3])
+        self.client.force_authenticate(self.instructor)
+        res = self.client.get(f'/api/exams/exams/{self.exam.id}/analysis/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['scores']['histogram_min'], -2)
+        self.assertEqual(res.data['scores']['histogram'], [1, 0, 0, 0, 0])
+
+    @override_settings(ANALYSIS_BUILD_IN_WORKER=True)
+    def test_large_builds_run_in_the_job_queue(self):
+        self.exam.refresh_from_db()
+        self._submit(self.student, [0], [1, 2])
+        run_pending_jobs()  # the result notification
+        url = f'/api/exams/exams/{self.exam.id}/analysis/'
+        self.client.force_authenticate(self.instructor)
+        with mock.patch('exams.analysis.ANALYSIS_INLINE_ATTEMPTS', 0):
+            self.assertEqual(self.client.get(url).status_code, 202)
+            self.assertEqual(self.client.get(url).status_code, 202)
+            self.assertEqual(run_pending_jobs(), 1)
+            res = self.client.get(url)
+            self.assertEqual((res.status_code, res.data['attempts']), (200, 1))
+            # The built report is lost (e.g. evicted): the finished job is
+            # not queued again, so the request builds it
+            cache.clear()
+            res = self.client.get(url)
+        self.assertEqual((res.status_code, res.data['attempts']), (200, 1))
+
+    def test_large_builds_run_inline_without_a_shared_cache(self):
+        self.exam.refresh_from_db()
+        self._submit(self.student, [0], [1, 2])
+        run_pending_jobs()  # the result notification
+        url = f'/api/exams/exams/{self.exam.id}/analysis/'
+        self.client.force_authenticate(self.instructor)
+        with mock.patch('exams.analysis.ANALYSIS_INLINE_ATTEMPTS', 0):
+            res = self.client.get(url)
+        self.assertEqual((res.status_code, res.data['attempts']), (200, 1))
+        self.assertEqual(run_pending_jobs(), 0)
@@ -5,7 +5,16 @@ urlpatterns = [
     # ==================== QUESTION URLS ====================
     path('questions/', views.question_list, name='question_list'),
     path('questions/<int:pk>/', views.question_detail, name='question_detail'),
+    path('questions/export/', views.question_export, name='question_export'),
+    path('questions/import/', views.question_import, name='question_import'),
 
     # ==================== EXAM URLS ====================
     path('exams/', views.exam_list, name='exam_list'),
+    path('exams/<int:exam_id>/questions/', views.exam_questions, name='exam_questions'),
+    path('exams/<int:exam_id>/attempts/', views.exam_attempts, name='exam_attempts'),
+    path('exams/<int:exam_id>/regrade/', views.exam_regrade, name='exam_regrade'),
+    path('exams/<int:exam_id>/analysis/', views.exam_analysis, name='exam_analysis'),
+
+    # ==================== ATTEMPT URLS ====================
+    path('attempts/<int:pk>/', views.attempt_detail, name='attempt_detail'),
 ]
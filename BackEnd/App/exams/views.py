@@ -1,11 +1,23 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Exam, Question
+from jobs.queue import enqueue
+from . import bank
+from .analysis import AnalysisPending, item_analysis
+from .editing import ExamEditError, apply_question_edits
+from .grading import InvalidSubmission, grade_submission
+from .models import Exam, ExamAttempt, Question
+from .payloads import exam_payload, exam_payloads, load_exam_trees
 from .serializers import (
-    ExamSerializer, QuestionCreateSerializer
+    ExamSerializer, ExamSummarySerializer, QuestionCreateSerializer,
+    ExamQuestionsEditSerializer, ExamSubmissionSerializer, ExamAttemptSerializer, ExamAttemptDetailSerializer
 )
 
 
@@ -59,6 +71,73 @@ def question_detail(request, pk):
             status=status.HTTP_200_OK)
 
 
+def _bank_request(request):
+    """(file_format, exam or None) for a question-bank request, or an error Response."""
+    if request.user.role != 'instructor':
+        return Response(
+            {'error': 'Only instructors can import or export questions'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    # Not ?format=, which DRF reserves for renderer selection
+    file_format = request.query_params.get('file_format', 'jsonl')
+    if file_format not in bank.FORMATS:
+        return Response(
+            {'error': f'file_format must be one of {", ".join(bank.FORMATS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    exam = None
+    exam_id = request.query_params.get('exam_id')
+    if exam_id:
+        exam = get_object_or_404(Exam, pk=exam_id)
+        if exam.created_by_id != request.user.id:
+            return Response(
+                {'error': 'You can only use question banks of your own exams'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+    return file_format, exam
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def question_export(request):
+    """Stream the instructor's questions (or one exam's) as JSON Lines or CSV"""
+    result = _bank_request(request)
+    if isinstance(result, Response):
+        return result
+    file_format, exam = result
+    questions = Question.objects.filter(exam=exam) if exam else \
+        Question.objects.filter(created_by=request.user)
+    response = StreamingHttpResponse(
+        bank.export_questions(questions, file_format,
+                              asynchronous=isinstance(request._request, ASGIRequest)),
+        content_type=bank.CONTENT_TYPES[file_format])
+    name = f'exam-{exam.id}-questions' if exam else 'questions'
+    response['Content-Disposition'] = f'attachment; filename="{name}.{file_format}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def question_import(request):
+    """Import a JSON Lines or CSV question bank uploaded as 'file'"""
+    result = _bank_request(request)
+    if isinstance(result, Response):
+        return result
+    file_format, exam = result
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response(
+            {'error': 'Upload the question bank as "file"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        imported = bank.import_questions(upload, file_format, request.user, exam)
+    except bank.ImportRowError as e:
+        return Response({'error': str(e), 'line': e.line}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'imported': imported}, status=status.HTTP_201_CREATED)
+
+
 # ==================== EXAM VIEWS ====================
 
 
@@ -72,8 +151,7 @@ def exam_list(request):
         if exam_id:
             # Get specific exam by ID
             exam = get_object_or_404(Exam, pk=exam_id)
-            serializer = ExamSerializer(exam)
-            return Response(serializer.data)
+            return Response(exam_payload(exam, request.user))
         else:
             # Get all exams
             user = request.user
@@ -81,8 +159,10 @@ def exam_list(request):
                 exams = Exam.objects.filter(created_by=user)
             else:
                 exams = Exam.objects.all()
-            serializer = ExamSerializer(exams, many=True)
-            return Response(serializer.data)
+            if request.query_params.get('summary') in ('1', 'true'):
+                exams = exams.annotate(question_count=Count('questions'))
+                return Response(ExamSummarySerializer(exams, many=True).data)
+            return Response(exam_payloads(list(exams), user))
 
     elif request.method == 'POST':
         # Only instructors can create exams
@@ -132,67 +212,33 @@ def exam_list(request):
         # Extract questions data from request
         questions_data = request.data.pop('questions', None)
         
-        # Update exam basic info
+        # Validate everything before writing anything
         serializer = ExamSerializer(exam, data=request.data, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            
-            # Handle questions updates only if questions_data is provided
-            if questions_data is not None:
-                # Process questions from request
-                for question_data in questions_data:
-                    question_id = question_data.get('id')
-                    
-                    if question_id:
-                        # Update existing question
-                        try:
-                            question = Question.objects.get(
-                                id=question_id, exam=exam
-                            )
-                            question_serializer = QuestionCreateSerializer(
-                                question, data=question_data, partial=True
-                            )
-                            if question_serializer.is_valid():
-                                question_serializer.save()
-                            else:
-                                return Response(
-                                    {
-                                        'error': f'Invalid question data: '
-                                        f'{question_serializer.errors}'
-                                    },
-                                    status=status.HTTP_400_BAD_REQUEST
-                                )
-                        except Question.DoesNotExist:
-                            return Response(
-                                {
-                                    'error': f'Question with ID {question_id} '
-                                    f'not found in this exam'
-                                },
-                                status=status.HTTP_404_NOT_FOUND
-                            )
-                    else:
-                        # Create new question
-                        question_data['exam'] = exam_id
-                        question_serializer = QuestionCreateSerializer(
-                            data=question_data
-                        )
-                        if question_serializer.is_valid():
-                            question_serializer.save(created_by=request.user)
-                        else:
-                            return Response(
-                                {
-                                    'error': f'Invalid new question data: '
-                                    f'{question_serializer.errors}'
-                                },
-                                status=status.HTTP_400_BAD_REQUEST
-                            )
-            
-            # Return updated exam with questions
-            updated_exam = Exam.objects.get(pk=exam_id)
-            response_serializer = ExamSerializer(updated_exam)
-            return Response(response_serializer.data)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        edits = None
+        if questions_data is not None:
+            edits = ExamQuestionsEditSerializer(data={'questions': questions_data})
+            if not edits.is_valid():
+                return Response(
+                    {'error': f'Invalid question data: {edits.errors}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # Exam info and question edits are saved together or not at all
+        try:
+            with transaction.atomic():
+                serializer.save()
+                if edits is not None:
+                    apply_question_edits(
+                        exam, request.user, edits.validated_data['questions'])
+        except ExamEditError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+
+        # Return updated exam with questions
+        updated_exam = Exam.objects.get(pk=exam_id)
+        response_serializer = ExamSerializer(load_exam_trees([updated_exam])[0])
+        return Response(response_serializer.data)
 
     elif request.method == 'DELETE':
         # Only instructors can delete exams
@@ -210,3 +256,120 @@ def exam_list(request):
         exam = get_object_or_404(Exam, pk=exam_id)
         exam.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def exam_questions(request, exam_id):
+    """
+    Replace an exam's question tree in one transaction: questions and
+    choices are matched by id, changed rows are bulk-updated, new ones
+    bulk-created and questions missing from the body deleted.
+    """
+    exam = get_object_or_404(Exam, pk=exam_id)
+    if exam.created_by_id != request.user.id:
+        return Response(
+            {'error': 'Only the exam instructor can edit its questions'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    serializer = ExamQuestionsEditSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        apply_question_edits(
+            exam, request.user, serializer.validated_data['questions'], prune=True)
+    except ExamEditError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    exam.refresh_from_db()
+    return Response(exam_payload(exam, request.user))
+
+
+# ==================== ATTEMPT VIEWS ====================
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def exam_attempts(request, exam_id):
+    """List attempts of an exam, or submit an attempt (graded on submit)"""
+    exam = get_object_or_404(Exam, pk=exam_id)
+
+    if request.method == 'GET':
+        attempts = ExamAttempt.objects.filter(exam=exam).select_related('exam')
+        # The exam's instructor sees every attempt, students their own
+        if exam.created_by_id != request.user.id:
+            attempts = attempts.filter(student=request.user)
+        serializer = ExamAttemptSerializer(attempts, many=True)
+        return Response(serializer.data)
+
+    if request.user.role != 'student':
+        return Response(
+            {'error': 'Only students can submit exam attempts'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    if exam.course_id and not request.user.enrollments.filter(course_id=exam.course_id).exists():
+        return Response(
+            {'error': 'You must be enrolled in this course to take its exam'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    serializer = ExamSubmissionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    answers = {answer['question']: answer['choices']
+               for answer in serializer.validated_data['answers']}
+    try:
+        attempt = grade_submission(exam, request.user, answers)
+    except InvalidSubmission as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(ExamAttemptDetailSerializer(attempt).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def attempt_detail(request, pk):
+    """An attempt with its per-question results"""
+    attempt = get_object_or_404(
+        ExamAttempt.objects.select_related('exam').prefetch_related('answers'), pk=pk)
+    if request.user.id not in (attempt.student_id, attempt.exam.created_by_id):
+        return Response(
+            {'error': 'You can only view your own attempts'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return Response(ExamAttemptDetailSerializer(attempt).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def exam_regrade(request, exam_id):
+    """Rescore every attempt against the current answer key (in the job worker)"""
+    exam = get_object_or_404(Exam, pk=exam_id)
+    if exam.created_by_id != request.user.id:
+        return Response(
+            {'error': 'Only the exam instructor can regrade it'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    enqueue('exams.regrade', exam_id=exam.id)
+    return Response({'message': 'Regrade queued'}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exam_analysis(request, exam_id):
+    """Item analysis of the exam's attempts: difficulty, discrimination, distractors, scores"""
+    exam = get_object_or_404(Exam, pk=exam_id)
+    if exam.created_by_id != request.user.id:
+        return Response(
+            {'error': 'Only the exam instructor can view its analysis'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    try:
+        return Response(item_analysis(exam))
+    except AnalysisPending as e:
+        job = enqueue('exams.item_analysis', idempotency_key=e.idempotency_key, exam_id=exam.id)
+        if job is None or job.status in ('succeeded', 'failed'):
+            # The job already ran for this state but its result is gone
+            # (evicted, or the build failed); don't answer 202 forever
+            return Response(item_analysis(exam, inline=False))
+        return Response(
+            {'message': 'Analysis is being prepared, try again shortly'},
+            status=status.HTTP_202_ACCEPTED
+        )
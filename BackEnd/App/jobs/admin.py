@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'queue', 'priority',
+                    'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'queue', 'task']
+    search_fields = ['task', 'idempotency_key', 'last_error']
+    readonly_fields = ['created_at', 'finished_at', 'locked_at', 'locked_by']
+    ordering = ['-created_at']
@@ -0,0 +1,120 @@
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import claim_jobs, execute_job, requeue_stale_jobs, worker_id
+
+
+def _run_job(job):
+    try:
+        execute_job(job)
+    finally:
+        close_old_connections()
+
+
+def _work(queues, threads, poll_interval, stop_event, once=False):
+    """Claim and run jobs on a thread pool until ``stop_event`` is set."""
+    name = worker_id()
+    last_stale_check = 0.0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while not stop_event.is_set():
+            if time.monotonic() - last_stale_check > 60:
+                requeue_stale_jobs()
+                last_stale_check = time.monotonic()
+            jobs = claim_jobs(queues, limit=threads, locked_by=name)
+            close_old_connections()
+            if jobs:
+                list(pool.map(_run_job, jobs))
+            elif once:
+                break
+            else:
+                stop_event.wait(poll_interval)
+
+
+def _process_main(queues, threads, poll_interval):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    try:
+        _work(queues, threads, poll_interval, stop_event)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database-backed job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues',
+            nargs='+',
+            default=None,
+            help='Only process these queues (default: all)'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Jobs run concurrently per process (default: 4)'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Worker processes to fork (default: 1)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when no job is due (default: 1.0)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no due jobs remain'
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues']
+        threads = max(1, options['threads'])
+        processes = max(1, options['processes'])
+        poll_interval = options['poll_interval']
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Starting job worker: queues={queues or 'all'} "
+                f"processes={processes} threads={threads}")
+        )
+
+        if processes == 1 or options['once']:
+            stop_event = threading.Event()
+            try:
+                _work(queues, threads, poll_interval,
+                      stop_event, once=options['once'])
+            except KeyboardInterrupt:
+                stop_event.set()
+            return
+
+        # Children must not inherit the parent's open database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(target=_process_main, args=(
+                queues, threads, poll_interval), daemon=False)
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            for child in children:
+                child.terminate()
+            for child in children:
+                child.join()
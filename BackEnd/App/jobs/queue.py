@@ -0,0 +1,174 @@
+"""
+Database-backed background job queue.
+
+Declare work with ``@task('app.name')`` in an app's ``tasks.py`` and
+schedule it with ``enqueue('app.name', key=value, ...)``. Jobs are rows in
+the ``jobs`` table, so enqueueing inside a request's transaction only
+publishes the job if that transaction commits. ``run_worker`` claims jobs
+with a conditional UPDATE (works on SQLite and PostgreSQL without a
+broker), retries failures with exponential backoff and records the last
+error. Set ``JOBS_ALWAYS_EAGER = True`` to run tasks inline instead.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_LOW = 9
+
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+# Jobs left 'running' longer than this are assumed orphaned by a dead worker
+STALE_LOCK_SECONDS = 15 * 60
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, name, func, queue, priority, max_attempts):
+        self.name = name
+        self.func = func
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, **kwargs):
+        return enqueue(self.name, **kwargs)
+
+
+def task(name, queue='default', priority=PRIORITY_DEFAULT, max_attempts=5):
+    """Register ``func`` as a background task under ``name``."""
+    def decorator(func):
+        registered = Task(name, func, queue, priority, max_attempts)
+        _registry[name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f'Unknown task {name!r}')
+
+
+def enqueue(task_name, idempotency_key=None, priority=None, queue=None, delay=None, **payload):
+    """
+    Schedule ``task_name`` with ``payload`` as keyword arguments (must be
+    JSON serializable). A second enqueue with the same ``idempotency_key``
+    returns the existing job instead of creating a duplicate.
+    """
+    registered = get_task(task_name)
+    if getattr(settings, 'JOBS_ALWAYS_EAGER', False):
+        registered(**payload)
+        return None
+    fields = {
+        'task': task_name,
+        'payload': payload,
+        'queue': queue or registered.queue,
+        'priority': registered.priority if priority is None else priority,
+        'max_attempts': registered.max_attempts,
+        'run_at': timezone.now() + (delay or timedelta()),
+    }
+    if idempotency_key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key, **fields)
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key)
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)),
+                BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay + random.uniform(0, delay / 10))
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale_jobs():
+    cutoff = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None)
+
+
+def claim_jobs(queues=None, limit=10, locked_by=None):
+    """
+    Claim up to ``limit`` due jobs, highest priority first. Each claim is a
+    conditional UPDATE, so concurrent workers never run the same job.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_at__lte=now)
+    if queues:
+        candidates = candidates.filter(queue__in=queues)
+    candidate_ids = list(candidates.order_by(
+        'priority', 'run_at', 'id').values_list('id', flat=True)[:limit * 2])
+    claimed = []
+    for job_id in candidate_ids:
+        won = Job.objects.filter(id=job_id, status='queued').update(
+            status='running', locked_by=locked_by or worker_id(), locked_at=now)
+        if won:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return list(Job.objects.filter(id__in=claimed).order_by('priority', 'run_at', 'id'))
+
+
+def execute_job(job):
+    """Run a claimed job and record its outcome. Returns True on success."""
+    job.attempts += 1
+    try:
+        get_task(job.task)(**job.payload)
+    except Exception as exc:
+        job.last_error = f'{exc!r}\n{traceback.format_exc()}'[-4000:]
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error('Job %s (%s) failed permanently: %r',
+                         job.id, job.task, exc)
+        else:
+            job.status = 'queued'
+            job.run_at = timezone.now() + backoff_delay(job.attempts)
+            logger.warning('Job %s (%s) failed, retry %s/%s: %r',
+                           job.id, job.task, job.attempts, job.max_attempts, exc)
+        job.save(update_fields=['attempts', 'status', 'run_at', 'last_error',
+                                'locked_by', 'locked_at', 'finished_at'])
+        return False
+    job.status = 'succeeded'
+    job.finished_at = timezone.now()
+    job.last_error = ''
+    job.save(update_fields=['attempts', 'status',
+             'finished_at', 'last_error'])
+    return True
+
+
+def run_pending_jobs(queues=None, limit=None):
+    """Drain due jobs synchronously in this thread (tests, cron, debugging)."""
+    processed = 0
+    while limit is None or processed < limit:
+        batch = claim_jobs(queues, limit=1)
+        if not batch:
+            break
+        execute_job(batch[0])
+        processed += 1
+    return processed
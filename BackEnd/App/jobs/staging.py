@@ -0,0 +1,45 @@
+"""
+Local staging area for files handed to background jobs.
+
+Request handlers copy uploads here and pass the returned name in the job
+payload; the task reads the file back with ``open_staged`` and removes it
+with ``discard_staged`` once processed. Workers must share this directory
+with the web process (``JOBS_STAGING_DIR``).
+"""
+import os
+import uuid
+
+from django.conf import settings
+
+
+def _staging_dir():
+    path = getattr(settings, 'JOBS_STAGING_DIR',
+                   os.path.join(settings.BASE_DIR, 'job_staging'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def staged_path(name):
+    # Names are generated by stage_file; basename() guards against traversal
+    return os.path.join(_staging_dir(), os.path.basename(name))
+
+
+def stage_file(uploaded_file):
+    """Stream an UploadedFile into the staging area and return its staged name."""
+    _, ext = os.path.splitext(uploaded_file.name or '')
+    name = f'{uuid.uuid4().hex}{ext[:10]}'
+    with open(staged_path(name), 'wb') as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+    return name
+
+
+def open_staged(name):
+    return open(staged_path(name), 'rb')
+
+
+def discard_staged(name):
+    try:
+        os.remove(staged_path(name))
+    except FileNotFoundError:
+        pass
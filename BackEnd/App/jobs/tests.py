@@ -0,0 +1,103 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import User
+from notifications.models import Notification
+from notifications.tasks import queue_bulk_notification, queue_notification
+from .models import Job
+from .queue import task, enqueue, claim_jobs, run_pending_jobs
+
+calls = []
+
+
+@task('jobs.tests.record', max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task('jobs.tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        job = enqueue('jobs.tests.record', value=1)
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(calls, [1])
+
+    def test_idempotency_key_deduplicates(self):
+        first = enqueue('jobs.tests.record', idempotency_key='once', value=1)
+        second = enqueue('jobs.tests.record', idempotency_key='once', value=2)
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_priority_order_and_delay(self):
+        enqueue('jobs.tests.record', value='low', priority=9)
+        enqueue('jobs.tests.record', value='high', priority=0)
+        enqueue('jobs.tests.record', value='later',
+                delay=timedelta(minutes=5))
+        run_pending_jobs()
+        self.assertEqual(calls, ['high', 'low'])
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        job = enqueue('jobs.tests.explode')
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        enqueue('jobs.tests.record', value=1)
+        self.assertEqual(len(claim_jobs(limit=5, locked_by='a')), 1)
+        self.assertEqual(claim_jobs(limit=5, locked_by='b'), [])
+
+    @override_settings(JOBS_ALWAYS_EAGER=True)
+    def test_always_eager_runs_inline(self):
+        self.assertIsNone(enqueue('jobs.tests.record', value=3))
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
+
+    def test_queued_notification_is_delivered_by_worker(self):
+        sender = User.objects.create_user(
+            username='sender', email='sender@example.com', password='pw', role='admin')
+        receiver = User.objects.create_user(
+            username='receiver', email='receiver@example.com', password='pw', role='student')
+        queue_notification(sender.id, receiver.id, 'announcement', 'Hi', 'Hello')
+        self.assertFalse(Notification.objects.exists())
+        run_pending_jobs()
+        self.assertTrue(Notification.objects.filter(receiver=receiver).exists())
+
+    def test_bulk_notification_is_queued_per_chunk(self):
+        receivers = [
+            User.objects.create_user(username=f'r{i}', email=f'r{i}@example.com',
+                                     password='pw', role='student')
+            for i in range(3)
+        ]
+        ids = [r.id for r in receivers]
+        with mock.patch('notifications.tasks.BULK_NOTIFICATION_CHUNK_SIZE', 2):
+            jobs = queue_bulk_notification(None, ids + [None, ids[0]], 'announcement', 'Hi', 'Hello')
+        self.assertEqual([job.payload['receiver_ids'] for job in jobs], [ids[:2], ids[2:]])
+        self.assertEqual(run_pending_jobs(), 2)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_notification_without_receiver_is_not_queued(self):
+        self.assertIsNone(queue_notification(None, None, 'announcement', 'Hi', 'Hello'))
+        self.assertFalse(Job.objects.exists())
@@ -1,7 +1,26 @@
+import asyncio
 import json
+from collections import Counter
+
+from channels.exceptions import StopConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
+
+from authentication.consumers import JWTHttpConsumer
+from authentication.principal import user_from_token
+from . import counters
 from .models import Notification
+from .presence import ADMINS_GROUP, presence
+
+# Seconds between SSE keep-alive comments (keeps proxies from closing idle streams)
+STREAM_KEEPALIVE = 15
+# Stored notifications replayed on (re)connect
+BACKLOG_LIMIT = 50
+
+
+# In-process connection counters
+stats = Counter()
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -9,12 +28,15 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         await self.accept()
         self.user = None
         self.room_name = None
-        print("🔌 WebSocket connected (waiting for authentication)")
+        stats['connects'] += 1
+        presence.ensure_broadcaster()
 
     async def disconnect(self, close_code):
+        stats['disconnects'] += 1
         if self.room_name:
             await self.channel_layer.group_discard(self.room_name, self.channel_name)
-            print(f"❌ WebSocket disconnected ({self.user.email if self.user else 'Unauthenticated'})")
+        if self.user and self.user.role == 'admin':
+            await self.channel_layer.group_discard(ADMINS_GROUP, self.channel_name)
 
     async def receive(self, text_data):
         """Handle incoming messages from WebSocket"""
@@ -24,29 +46,35 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
             # Handle authentication
             if message_type == 'auth' and not self.user:
-                print(f"🔐 Received auth request")
                 token = data.get('token')
                 if token:
-                    print(f"🔍 Token received, length: {len(token)}")
                     user = await self.get_user_from_token(token)
                     if user:
                         self.user = user
                         self.room_name = f"user_{self.user.id}"
                         await self.channel_layer.group_add(self.room_name, self.channel_name)
-                        print(f"✅ Authenticated: {self.user.email}")
+                        if self.user.role == 'admin':
+                            # Coalesced online counts (see notifications.presence)
+                            await self.channel_layer.group_add(ADMINS_GROUP, self.channel_name)
+                        presence.touch(self.user.id, self.user.role)
+                        stats['auth_success'] += 1
                         await self.send_json({
                             'type': 'auth_success',
                             'message': 'Successfully authenticated'
                         })
                     else:
-                        print("❌ Authentication failed - invalid token")
+                        stats['auth_failure'] += 1
                         await self.send_json({'type': 'auth_error', 'message': 'Invalid token'})
                         await self.close(code=1011)
                 else:
-                    print("❌ Authentication failed - no token provided")
+                    stats['auth_failure'] += 1
                     await self.send_json({'type': 'auth_error', 'message': 'No token provided'})
                     await self.close(code=1011)
 
+            # Heartbeats keep the user counted as online
+            elif message_type == 'heartbeat' and self.user:
+                presence.touch(self.user.id, self.user.role)
+
             # Handle marking notification as read
             elif message_type == 'mark_read' and self.user:
                 notification_id = data.get('notification_id')
@@ -70,53 +98,153 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
         """Mark notification as read"""
-        try:
-            notification = Notification.objects.get(id=notification_id, receiver=self.user)
-            notification.is_read = True
-            notification.save()
-        except Notification.DoesNotExist:
-            pass
+        counters.mark_read(self.user, Notification.objects.filter(id=notification_id))
 
     @database_sync_to_async
     def get_user_from_token(self, token):
         """Get user from JWT token"""
+        return user_from_token(token)
+
+
+@database_sync_to_async
+def get_backlog(user, since):
+    """Payloads of the user's notifications newer than ``since``, oldest first."""
+    from .views import notification_payload
+    notifications = Notification.objects.filter(
+        receiver=user, id__gt=since).select_related('sender', 'receiver').order_by('id')
+    return [notification_payload(n) for n in notifications[:BACKLOG_LIMIT]]
+
+
+def _parse_id(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class NotificationStreamConsumer(JWTHttpConsumer):
+    """
+    Server-sent events: GET /api/notifications/stream/ with a Bearer header
+    or ?token=<JWT> (EventSource can't set headers).
+
+    Every event published to the user's ``user_<id>`` group (the same one
+    NotificationConsumer serves) is written as an SSE event; notifications
+    carry their id so a reconnect with Last-Event-ID (or ?since=<id>)
+    replays what was missed. An idle stream costs no database queries.
+    """
+
+    allow_query_token = True
+
+    async def http_request(self, message):
+        # Unlike handle(), returning from here keeps the response open; the
+        # consumer then dispatches notify events until http.disconnect
+        if message.get('more_body'):
+            return
+        self.user = await self.handle_common()
+        if not self.user:
+            raise StopConsumer()
+        self.group = f"user_{self.user.id}"
+        self.replayed_id = 0
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.send_headers(headers=[
+            (b'Content-Type', b'text/event-stream'),
+            (b'Cache-Control', b'no-cache'),
+            (b'X-Accel-Buffering', b'no'),
+        ] + self.cors_headers())
+        await self.send_body(b'retry: 3000\n\n', more_body=True)
+        stats['streams'] += 1
+
+        since = _parse_id(self.header('last-event-id') or self.query_params.get('since'))
+        if since is not None:
+            backlog = await get_backlog(self.user, since)
+            for payload in backlog:
+                await self.send_event(payload)
+            if backlog:
+                self.replayed_id = backlog[-1]['id']
+        self.keepalive = asyncio.ensure_future(self.send_keepalive())
+
+    async def disconnect(self):
+        if getattr(self, 'keepalive', None):
+            self.keepalive.cancel()
+        if getattr(self, 'group', None):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def notify(self, event):
+        payload = event['data']
+        # Skip what the backlog already replayed. Live notifications can
+        # arrive out of id order (concurrent senders, bulk chunks), so
+        # only the replayed range is compared, never the last live id
+        if 'notification_type' in payload and payload['id'] <= self.replayed_id:
+            return
+        await self.send_event(payload)
+
+    async def send_event(self, payload):
+        event_id = payload.get('id') if 'notification_type' in payload else None
+        if event_id is not None:
+            frame = f"id: {event_id}\nevent: notification\n"
+        else:
+            frame = f"event: {payload.get('type', 'message')}\n"
+        frame += f"data: {json.dumps(payload)}\n\n"
+        await self.send_body(frame.encode(), more_body=True)
+
+    async def send_keepalive(self):
+        while True:
+            await asyncio.sleep(STREAM_KEEPALIVE)
+            await self.send_body(b': keepalive\n\n', more_body=True)
+
+
+class NotificationPollConsumer(JWTHttpConsumer):
+    """
+    Long-poll: GET /api/notifications/poll/?since=<id>&wait=<seconds>.
+
+    Returns the notifications newer than ``since`` at once if there are
+    any, otherwise the first one published to ``user_<id>`` within
+    ``wait`` seconds (capped at LONG_POLL_MAX_WAIT), or an empty list.
+    Without ``since`` it only waits for new notifications and never
+    queries the database.
+    """
+
+    async def http_request(self, message):
+        if message.get('more_body'):
+            return
+        self.user = await self.handle_common()
+        if not self.user:
+            raise StopConsumer()
         try:
-            from rest_framework_simplejwt.tokens import AccessToken, TokenError
-            from authentication.models import User
-            import jwt
-            from django.conf import settings
-            
-            print(f"🔍 Attempting to validate token: {token[:50]}...")
-            
-            # Try using SimpleJWT first
-            try:
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                print(f"🔍 Token valid via SimpleJWT, user_id: {user_id}")
-            except TokenError as e:
-                print(f"⚠️ SimpleJWT failed: {str(e)}, trying manual decode...")
-                # Try manual JWT decode as fallback
-                payload = jwt.decode(
-                    token, 
-                    settings.SECRET_KEY, 
-                    algorithms=['HS256']
-                )
-                user_id = payload['user_id']
-                print(f"🔍 Token valid via manual decode, user_id: {user_id}")
-            
-            user = User.objects.get(id=user_id)
-            print(f"✅ User found: {user.email}")
-            return user
-            
-        except jwt.ExpiredSignatureError:
-            print("❌ Token expired")
-            return None
-        except jwt.InvalidTokenError as e:
-            print(f"❌ Invalid token: {str(e)}")
-            return None
-        except User.DoesNotExist:
-            print(f"❌ User with id {user_id} not found")
-            return None
-        except Exception as e:
-            print(f"❌ Token validation failed: {str(e)}")
-            return None
+            wait = max(0.0, min(float(self.query_params.get('wait', 0)),
+                                settings.LONG_POLL_MAX_WAIT))
+        except ValueError:
+            await self.send_json_response(400, {'error': 'wait must be a number of seconds'})
+            raise StopConsumer()
+        self.since = _parse_id(self.query_params.get('since'))
+
+        # Subscribe before reading the backlog so nothing falls in between
+        self.group = f"user_{self.user.id}"
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        backlog = await get_backlog(self.user, self.since) if self.since is not None else []
+        if backlog or not wait:
+            await self.finish(backlog)
+        self.timeout = asyncio.get_running_loop().call_later(
+            wait, lambda: asyncio.ensure_future(
+                self.channel_layer.send(self.channel_name, {'type': 'poll.timeout'})))
+
+    async def disconnect(self):
+        if getattr(self, 'timeout', None):
+            self.timeout.cancel()
+        if getattr(self, 'group', None):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def notify(self, event):
+        payload = event['data']
+        # Heartbeats and analytics pings share the group; only answer with notifications
+        if 'notification_type' in payload and payload['id'] > (self.since or 0):
+            await self.finish([payload])
+
+    async def poll_timeout(self, event):
+        await self.finish([])
+
+    async def finish(self, notifications):
+        last_id = notifications[-1]['id'] if notifications else self.since
+        await self.send_json_response(200, {'notifications': notifications, 'last_id': last_id})
+        await self.disconnect()
+        raise StopConsumer()
@@ -0,0 +1,69 @@
+"""
+Per-user unread notification counters.
+
+UnreadNotificationCounter.unread is adjusted with F() expressions when
+notifications are created, marked read or deleted, so the unread badge is
+a primary-key read instead of a COUNT over the user's notifications.
+Run `manage.py repair_notification_counters` once to seed counters for
+notifications that predate them (and whenever they may have drifted).
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Notification, UnreadNotificationCounter
+
+
+def bump_unread(deltas):
+    """Apply ``{user_id: delta}`` to the users' unread counters."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if user_id and delta}
+    if not deltas:
+        return
+    UnreadNotificationCounter.objects.bulk_create(
+        [UnreadNotificationCounter(user_id=user_id) for user_id in deltas],
+        ignore_conflicts=True)
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        UnreadNotificationCounter.objects.filter(
+            user_id__in=user_ids).update(unread=F('unread') + delta)
+
+
+def unread_count(user):
+    counter = UnreadNotificationCounter.objects.filter(user=user).values_list(
+        'unread', flat=True).first()
+    if counter is None:
+        counter = Notification.objects.filter(receiver=user, is_read=False).count()
+        UnreadNotificationCounter.objects.get_or_create(
+            user=user, defaults={'unread': counter})
+    return max(counter, 0)
+
+
+def mark_read(user, notifications):
+    """Mark ``user``'s unread ``notifications`` read; returns how many changed."""
+    with transaction.atomic():
+        # Concurrent calls only count rows their own UPDATE flipped
+        updated = notifications.filter(receiver=user, is_read=False).update(is_read=True)
+        bump_unread({user.id: -updated})
+    return updated
+
+
+def repair_unread_counters(dry_run=False):
+    """Recompute every counter from the notifications table; returns how many were wrong."""
+    with transaction.atomic():
+        actual = dict(
+            Notification.objects.filter(is_read=False, receiver__isnull=False)
+            .values('receiver').annotate(n=Count('id')).order_by()
+            .values_list('receiver', 'n'))
+        drifted = []
+        for counter in UnreadNotificationCounter.objects.iterator(chunk_size=2000):
+            expected = actual.pop(counter.user_id, 0)
+            if counter.unread != expected:
+                counter.unread = expected
+                drifted.append(counter)
+        missing = [UnreadNotificationCounter(user_id=user_id, unread=n)
+                   for user_id, n in actual.items()]
+        if not dry_run:
+            UnreadNotificationCounter.objects.bulk_update(drifted, ['unread'], batch_size=1000)
+            UnreadNotificationCounter.objects.bulk_create(missing, batch_size=1000)
+    return len(drifted) + len(missing)
@@ -0,0 +1,102 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import User
+from notifications import counters
+from notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = ('Grow the notifications table to --rows and time the per-user access paths '
+            '(feed page, unread page, unread badge, mark-all-read) at each checkpoint. '
+            'Run it against a scratch database; its rows are deleted at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=10_000_000,
+            help='Final table size (default: 10000000)'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10_000,
+            help='Receivers the rows are spread over (default: 10000)'
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=50,
+            help='Users timed per checkpoint (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            self._run(options['rows'], options['users'], options['samples'])
+        finally:
+            User.objects.filter(username__startswith='bench_store_').delete()
+
+    def _run(self, rows, users, samples):
+        User.objects.bulk_create([
+            User(username=f'bench_store_{i}', email=f'bench_store_{i}@example.com', role='student')
+            for i in range(users)
+        ], batch_size=5000)
+        user_ids = list(User.objects.filter(
+            username__startswith='bench_store_').values_list('id', flat=True))
+        sampled = User.objects.filter(id__in=user_ids[::max(len(user_ids) // samples, 1)])
+
+        checkpoints = [n for n in (10_000, 100_000, 1_000_000, 10_000_000, 100_000_000) if n < rows]
+        checkpoints.append(rows)
+        self.stdout.write(f"{'rows':>11} {'feed ms':>8} {'unread ms':>10} "
+                          f"{'badge ms':>9} {'mark-all ms':>12}   (median per user)")
+        inserted = 0
+        for checkpoint in checkpoints:
+            inserted += self._fill(user_ids, inserted, checkpoint - inserted)
+            self.stdout.write(f"{checkpoint:>11} " + " ".join(
+                f"{self._median(sampled, path):>{width}.2f}"
+                for path, width in ((self._feed, 8), (self._unread, 10),
+                                    (self._badge, 9), (self._mark_all, 12))))
+
+    def _fill(self, user_ids, offset, count, batch_size=10_000):
+        for start in range(offset, offset + count, batch_size):
+            batch = range(start, min(start + batch_size, offset + count))
+            with transaction.atomic():
+                notifications = Notification.objects.bulk_create([
+                    Notification(receiver_id=user_ids[i % len(user_ids)],
+                                 notification_type='announcement', title='Bench',
+                                 message='Benchmark row', is_read=i % 10 != 0)
+                    for i in batch
+                ])
+                deltas = {}
+                for n in notifications:
+                    if not n.is_read:
+                        deltas[n.receiver_id] = deltas.get(n.receiver_id, 0) + 1
+                counters.bump_unread(deltas)
+        return count
+
+    def _median(self, users, path):
+        timings = []
+        for user in users:
+            started = time.perf_counter()
+            path(user)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _feed(self, user):
+        list(Notification.objects.filter(receiver=user).order_by('-created_at')[:20])
+
+    def _unread(self, user):
+        list(Notification.objects.filter(receiver=user, is_read=False).order_by('-created_at')[:10])
+
+    def _badge(self, user):
+        counters.unread_count(user)
+
+    def _mark_all(self, user):
+        # Rolled back so later checkpoints still have the unread rows
+        with transaction.atomic():
+            counters.mark_read(user, Notification.objects.all())
+            transaction.set_rollback(True)
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentication.models import User
+from notifications.views import send_notification, send_bulk_notification
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-recipient send_notification against send_bulk_notification (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Recipient counts to benchmark (default: 1000 10000 100000)'
+        )
+        parser.add_argument(
+            '--loop-sample',
+            type=int,
+            default=1000,
+            help='Recipients timed with the per-recipient loop; larger sizes are extrapolated (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'recipients':>10} {'loop (s)':>12} {'bulk (s)':>10} {'speed-up':>9}")
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['loop_sample'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, loop_sample):
+        sender = User.objects.create_user(
+            username='bench_sender', email='bench_sender@example.com',
+            password=None, role='instructor')
+        User.objects.bulk_create([
+            User(username=f'bench_{i}', email=f'bench_{i}@example.com',
+                 first_name='Bench', last_name=str(i), role='student')
+            for i in range(size)
+        ], batch_size=5000)
+        receiver_ids = list(User.objects.filter(
+            username__startswith='bench_').exclude(id=sender.id).values_list('id', flat=True))
+
+        sample = receiver_ids[:min(loop_sample, size)]
+        started = time.perf_counter()
+        for receiver_id in sample:
+            send_notification(sender.id, receiver_id, 'announcement',
+                              'Benchmark', 'Loop delivery')
+        loop_seconds = (time.perf_counter() - started) * size / len(sample)
+
+        started = time.perf_counter()
+        send_bulk_notification(sender.id, receiver_ids, 'announcement',
+                               'Benchmark', 'Bulk delivery')
+        bulk_seconds = time.perf_counter() - started
+
+        estimated = '~' if len(sample) < size else ' '
+        self.stdout.write(
+            f"{size:>10} {estimated}{loop_seconds:>11.2f} {bulk_seconds:>10.2f} "
+            f"{loop_seconds / bulk_seconds:>8.1f}x")
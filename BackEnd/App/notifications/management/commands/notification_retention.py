@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.retention import DEFAULT_CHUNK_SIZE, DESTINATIONS, DIGEST_WINDOWS, enforce_retention
+
+
+class Command(BaseCommand):
+    help = ('Fold bursts of same-type notifications into digests, then archive or delete '
+            'old read notifications, in short chunked transactions. Run it periodically '
+            '(e.g. nightly from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.NOTIFICATION_RETENTION_DAYS,
+            help='Archive read notifications older than this (default: NOTIFICATION_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--destination',
+            choices=DESTINATIONS,
+            default='table',
+            help="Where archived rows go: the archive table, a JSON-lines file or nowhere (default: table)"
+        )
+        parser.add_argument(
+            '--path',
+            help='JSON-lines file to append to with --destination jsonl'
+        )
+        parser.add_argument(
+            '--digest-after-hours',
+            type=int,
+            default=settings.NOTIFICATION_DIGEST_AFTER_HOURS,
+            help='Only collapse bursts older than this (default: NOTIFICATION_DIGEST_AFTER_HOURS)'
+        )
+        parser.add_argument(
+            '--window',
+            choices=list(DIGEST_WINDOWS),
+            default='hour',
+            help='Notifications of one type in the same hour/day form a burst (default: hour)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows per transaction (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between chunks to leave room for other writers'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many notifications would be collapsed and archived'
+        )
+
+    def handle(self, *args, **options):
+        if options['destination'] == 'jsonl' and not options['path']:
+            raise CommandError('--destination jsonl requires --path')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        folded, archived = enforce_retention(
+            retention_days=options['older_than_days'],
+            destination=options['destination'],
+            path=options['path'],
+            digest_after_hours=options['digest_after_hours'],
+            window=options['window'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{folded} notification(s) would be collapsed into digests, '
+                              f'{archived} archived')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Collapsed {folded} notification(s) into digests, archived {archived}'))
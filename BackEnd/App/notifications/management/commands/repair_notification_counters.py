@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from notifications.counters import repair_unread_counters
+
+
+class Command(BaseCommand):
+    help = ('Recompute the per-user unread notification counters from the notifications table. '
+            'Run once after deploying the counters, and safe to run at any time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report wrong or missing counters without fixing them'
+        )
+
+    def handle(self, *args, **options):
+        fixed = repair_unread_counters(dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{fixed} user(s) have wrong or missing unread counters')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired unread counters for {fixed} user(s)'))
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 
@@ -46,6 +46,15 @@ class Notification(models.Model):
     class Meta:
         ordering = ['-created_at']
         db_table = 'notifications'
+        indexes = [
+            # A user's feed, newest first (list/retrieve)
+            models.Index(fields=['receiver', '-created_at'],
+                         name='notif_receiver_created_idx'),
+            # Unread feed (recent, mark_all_read); stays small as users read
+            models.Index(fields=['receiver', '-created_at'],
+                         condition=models.Q(is_read=False),
+                         name='notif_receiver_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.notification_type} - {self.receiver.email if self.receiver else 'Unknown'}"
@@ -53,4 +62,52 @@ class Notification(models.Model):
     def save(self, *args, **kwargs):
         if not self.receiver and self.recipient:  # auto-populate
             self.receiver = self.recipient
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        from .counters import bump_unread
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.is_read and self.receiver_id:
+                bump_unread({self.receiver_id: 1})
+
+
+class UnreadNotificationCounter(models.Model):
+    """Per-user unread notification count, maintained by notifications.counters"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_notification_counter'
+    )
+    unread = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'notification_unread_counters'
+
+
+class ArchivedNotification(models.Model):
+    """
+    Compact copy of a read notification removed from the live table by
+    notifications.retention. Keeps the original id and only what a history
+    view needs; no sender/recipient foreign keys or feed indexes.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    receiver = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications',
+        null=True,
+        blank=True
+    )
+    sender_id = models.IntegerField(null=True, blank=True)
+    notification_type = models.CharField(max_length=20)
+    title = models.CharField(max_length=255, blank=True)
+    message = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        db_table = 'notifications_archive'
@@ -0,0 +1,207 @@
+"""
+Presence: which users are online, for the admin dashboard.
+
+Sockets call touch() on connect and on every heartbeat frame, an O(1)
+write into an in-process buffer. Once per PRESENCE_BROADCAST_INTERVAL a
+single task per process flushes the buffer into the store, counts the
+users seen within PRESENCE_TIMEOUT and, if the counts changed, sends one
+coalesced ``analytics_update`` to the ADMINS_GROUP, instead of one
+group_send per admin per heartbeat.
+
+PRESENCE_BACKEND selects the store: 'memory' (one web process) or
+'redis' (shared across processes; one sorted set per role, and a short
+lock so only one process broadcasts per interval). The last broadcast
+counts live in the store too, so ``online_delta`` is right whichever
+process wins the lock. A 'memory' process that never held a socket
+cannot know who is online, so it reports None rather than zeros.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+ADMINS_GROUP = 'admins'
+ROLES = ('student', 'instructor', 'admin')
+
+
+def _timeout():
+    return getattr(settings, 'PRESENCE_TIMEOUT', 60)
+
+
+def _interval():
+    return getattr(settings, 'PRESENCE_BROADCAST_INTERVAL', 1.0)
+
+
+def _empty_counts():
+    return {'total': 0, **dict.fromkeys(ROLES, 0)}
+
+
+class MemoryPresenceStore:
+    shared = False
+
+    def __init__(self):
+        self.last_seen = {}  # user_id -> (timestamp, role)
+        self.lock = threading.Lock()
+        self.last_counts = None
+
+    def save(self, seen):
+        with self.lock:
+            self.last_seen.update(seen)
+
+    def counts(self, since):
+        counts = _empty_counts()
+        with self.lock:
+            for user_id, (seen_at, role) in list(self.last_seen.items()):
+                if seen_at < since:
+                    del self.last_seen[user_id]
+                    continue
+                counts['total'] += 1
+                if role in counts:
+                    counts[role] += 1
+        return counts
+
+    def acquire_broadcast(self, interval):
+        return True
+
+    def swap_last_counts(self, counts):
+        """Store the counts just broadcast and return the previous ones."""
+        previous, self.last_counts = self.last_counts, counts
+        return previous
+
+
+class RedisPresenceStore:
+    KEY = 'presence:{}'
+    LOCK_KEY = 'presence:broadcast'
+    LAST_COUNTS_KEY = 'presence:last_counts'
+    shared = True
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def save(self, seen):
+        by_role = {}
+        for user_id, (seen_at, role) in seen.items():
+            by_role.setdefault(role or 'unknown', {})[user_id] = seen_at
+        pipe = self.client.pipeline(transaction=False)
+        for role, members in by_role.items():
+            pipe.zadd(self.KEY.format(role), members)
+        pipe.execute()
+
+    def counts(self, since):
+        roles = ROLES + ('unknown',)
+        pipe = self.client.pipeline(transaction=False)
+        for role in roles:
+            pipe.zremrangebyscore(self.KEY.format(role), '-inf', f'({since}')
+            pipe.zcard(self.KEY.format(role))
+        sizes = pipe.execute()[1::2]
+        counts = _empty_counts()
+        for role, size in zip(roles, sizes):
+            counts['total'] += size
+            if role in counts:
+                counts[role] = size
+        return counts
+
+    def acquire_broadcast(self, interval):
+        return bool(self.client.set(
+            self.LOCK_KEY, 1, nx=True, px=max(int(interval * 1000) - 50, 1)))
+
+    def swap_last_counts(self, counts):
+        previous = self.client.getset(self.LAST_COUNTS_KEY, json.dumps(counts))
+        return json.loads(previous) if previous else None
+
+
+class Presence:
+    def __init__(self):
+        self.pending = {}
+        self.store = None
+        self.task = None
+        self.touched = False
+
+    def get_store(self):
+        if self.store is None:
+            if getattr(settings, 'PRESENCE_BACKEND', 'memory') == 'redis':
+                url = getattr(settings, 'PRESENCE_REDIS_URL', None)
+                if not url:
+                    raise ImproperlyConfigured(
+                        "PRESENCE_BACKEND='redis' requires PRESENCE_REDIS_URL or REDIS_URL")
+                self.store = RedisPresenceStore(url)
+            else:
+                self.store = MemoryPresenceStore()
+        return self.store
+
+    def touch(self, user_id, role=None):
+        """Record that the user is online now."""
+        self.pending[user_id] = (time.time(), role)
+        self.touched = True
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        if pending:
+            self.get_store().save(pending)
+
+    def online_counts(self):
+        """
+        {'total': n, 'student': n, 'instructor': n, 'admin': n}, or None when
+        the store is per-process and no socket ever reported to this one.
+        """
+        self.flush()
+        store = self.get_store()
+        if not store.shared and not self.touched:
+            logger.error("Presence is unknown in this process; PRESENCE_BACKEND='redis' "
+                         "is required when sockets are served by other processes")
+            return None
+        return store.counts(time.time() - _timeout())
+
+    def tick(self):
+        """
+        Flush and count. Returns ``(counts, previously broadcast counts)``,
+        or None unless this process should broadcast.
+        """
+        self.flush()
+        store = self.get_store()
+        if not store.acquire_broadcast(_interval()):
+            return None
+        counts = store.counts(time.time() - _timeout())
+        return counts, store.swap_last_counts(counts)
+
+    async def broadcast_forever(self):
+        channel_layer = get_channel_layer()
+        while True:
+            await asyncio.sleep(_interval())
+            try:
+                result = await sync_to_async(self.tick, thread_sensitive=False)()
+                if result is None:
+                    continue
+                counts, previous = result
+                if counts == previous:
+                    continue
+                await channel_layer.group_send(ADMINS_GROUP, {
+                    'type': 'notify',
+                    'data': {
+                        'type': 'analytics_update',
+                        'online': counts,
+                        'online_delta': counts['total'] - (previous or _empty_counts())['total'],
+                    },
+                })
+            except Exception:
+                logger.exception('Presence broadcast failed')
+
+    def ensure_broadcaster(self):
+        """Start the broadcast task on the running event loop if it isn't running."""
+        if not _interval():
+            return
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.broadcast_forever())
+
+
+presence = Presence()
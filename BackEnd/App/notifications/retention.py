@@ -0,0 +1,207 @@
+"""
+Notification retention.
+
+The live ``notifications`` table only needs what users still look at, so
+two passes keep it small:
+
+* ``collapse_bursts`` folds runs of same-type notifications for one
+  receiver (e.g. dozens of ``course_enrollment`` events for an instructor
+  in one hour) into a single digest row carrying the count.
+* ``archive_read_notifications`` moves read notifications older than the
+  retention age into ``ArchivedNotification`` (or a JSON-lines file), or
+  just deletes them.
+
+Both work in chunks of ``chunk_size`` rows, each in its own short
+transaction, so no statement locks more than one chunk. Unread counters
+are kept in step via notifications.counters. Run them with
+`manage.py notification_retention` from cron, or enqueue the
+'notifications.enforce_retention' job.
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .counters import bump_unread
+from .models import ArchivedNotification, Notification
+
+DEFAULT_CHUNK_SIZE = 1000
+DESTINATIONS = ('table', 'jsonl', 'delete')
+DIGEST_WINDOWS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+# Types that arrive in bursts and read fine as "N new ..." digests
+DIGEST_TYPES = ('course_enrollment', 'course_update', 'message', 'analytics_update')
+
+ARCHIVE_FIELDS = ('id', 'receiver_id', 'sender_id', 'notification_type',
+                  'title', 'message', 'data', 'created_at')
+
+
+def retention_cutoff(days=None):
+    if days is None:
+        days = settings.NOTIFICATION_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_read_notifications(cutoff, destination='table', path=None,
+                               chunk_size=DEFAULT_CHUNK_SIZE, pause=0, dry_run=False):
+    """
+    Move read notifications created before ``cutoff`` out of the live table.
+
+    ``destination`` is 'table' (ArchivedNotification), 'jsonl' (append one
+    JSON object per line to ``path``) or 'delete'. Rows are walked in id
+    order; each chunk is copied and deleted in one transaction, sleeping
+    ``pause`` seconds between chunks. A JSON-lines write is not part of
+    the transaction, so a crash can repeat (never lose) a chunk there.
+    Returns the number of notifications removed.
+    """
+    if destination not in DESTINATIONS:
+        raise ValueError(f'destination must be one of {", ".join(DESTINATIONS)}')
+    if destination == 'jsonl' and not path:
+        raise ValueError('A path is required for the jsonl destination')
+
+    candidates = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+    if dry_run:
+        return candidates.count()
+
+    out = open(path, 'a', encoding='utf-8') if destination == 'jsonl' else None
+    removed = 0
+    last_id = 0
+    try:
+        while True:
+            with transaction.atomic():
+                rows = list(candidates.filter(id__gt=last_id).select_for_update()
+                            .order_by('id').values(*ARCHIVE_FIELDS)[:chunk_size])
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                if destination == 'table':
+                    ArchivedNotification.objects.bulk_create(
+                        [ArchivedNotification(**row) for row in rows], ignore_conflicts=True)
+                elif destination == 'jsonl':
+                    out.writelines(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+                    out.flush()
+                removed += Notification.objects.filter(
+                    id__in=[row['id'] for row in rows]).delete()[0]
+            if pause:
+                time.sleep(pause)
+    finally:
+        if out:
+            out.close()
+    return removed
+
+
+def burst_groups(cutoff, window='hour', min_size=None, types=DIGEST_TYPES):
+    """(receiver_id, notification_type, bucket start, count) for each burst to collapse."""
+    if min_size is None:
+        min_size = settings.NOTIFICATION_DIGEST_MIN_SIZE
+    return list(
+        Notification.objects.filter(
+            created_at__lt=cutoff, notification_type__in=types, receiver__isnull=False)
+        .exclude(data__has_key='digest')
+        .annotate(bucket=Trunc('created_at', window))
+        .values('receiver_id', 'notification_type', 'bucket')
+        .annotate(n=Count('id')).filter(n__gte=min_size)
+        .order_by('bucket', 'receiver_id')
+        .values_list('receiver_id', 'notification_type', 'bucket', 'n'))
+
+
+def _digest_text(notification_type, count, latest_message):
+    label = dict(Notification.NOTIFICATION_TYPES).get(notification_type, notification_type)
+    return f'{count} {label} notifications', f'{latest_message} (and {count - 1} more)'
+
+
+def _fold_chunk(receiver_id, notification_type, start, end, chunk_size):
+    """Fold up to chunk_size rows of one burst into its digest; returns rows folded."""
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.filter(
+                receiver_id=receiver_id, notification_type=notification_type,
+                created_at__gte=start, created_at__lt=end)
+            .exclude(data__has_key='digest').select_for_update()
+            .order_by('created_at', 'id')
+            .values('id', 'sender_id', 'message', 'data', 'is_read', 'created_at')[:chunk_size])
+        if not rows:
+            return 0
+        Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        unread = sum(not row['is_read'] for row in rows)
+        latest = rows[-1]
+
+        digest = (Notification.objects.filter(
+            receiver_id=receiver_id, notification_type=notification_type,
+            created_at__gte=start, created_at__lt=end, data__has_key='digest')
+            .select_for_update().first())
+        if digest is None:
+            digest = Notification(receiver_id=receiver_id, notification_type=notification_type,
+                                  created_at=latest['created_at'], is_read=not unread,
+                                  data={'digest': True, 'count': 0,
+                                        'first_at': rows[0]['created_at'].isoformat()})
+            was_unread = False
+        else:
+            was_unread = not digest.is_read
+            digest.is_read = digest.is_read and not unread
+        # The digest sits where the burst ended and shows its newest message
+        if latest['created_at'] >= digest.created_at:
+            digest.created_at = latest['created_at']
+            digest.sender_id = latest['sender_id']
+            digest.data.update(last_at=latest['created_at'].isoformat(),
+                               latest=latest['data'], latest_message=latest['message'])
+        digest.data['count'] += len(rows)
+        digest.title, digest.message = _digest_text(
+            notification_type, digest.data['count'], digest.data['latest_message'])
+        if digest.pk:
+            digest.save(update_fields=['sender', 'title', 'message', 'data', 'is_read', 'created_at'])
+        else:
+            # bulk_create skips save()'s counter bump (applied below) but
+            # still stamps auto_now_add, hence the follow-up UPDATE
+            Notification.objects.bulk_create([digest])
+            Notification.objects.filter(id=digest.id).update(created_at=latest['created_at'])
+        bump_unread({receiver_id: int(not digest.is_read) - int(was_unread) - unread})
+    return len(rows)
+
+
+def collapse_bursts(cutoff, window='hour', min_size=None, types=DIGEST_TYPES,
+                    chunk_size=DEFAULT_CHUNK_SIZE, pause=0, dry_run=False):
+    """
+    Replace every run of at least ``min_size`` notifications of one type
+    for one receiver inside the same ``window`` ('hour' or 'day'), created
+    before ``cutoff``, with one digest row. The digest keeps the newest
+    message and data, counts the folded rows in ``data['count']`` and is
+    unread if any of them was. Returns the number of rows folded.
+    """
+    if window not in DIGEST_WINDOWS:
+        raise ValueError(f'window must be one of {", ".join(DIGEST_WINDOWS)}')
+    groups = burst_groups(cutoff, window, min_size, types)
+    if dry_run:
+        return sum(group[3] for group in groups)
+
+    folded = 0
+    for receiver_id, notification_type, start, _ in groups:
+        end = min(start + DIGEST_WINDOWS[window], cutoff)
+        while True:
+            count = _fold_chunk(receiver_id, notification_type, start, end, chunk_size)
+            folded += count
+            if pause and count:
+                time.sleep(pause)
+            if count < chunk_size:
+                break
+    return folded
+
+
+def enforce_retention(retention_days=None, destination='table', path=None,
+                      digest_after_hours=None, window='hour', chunk_size=DEFAULT_CHUNK_SIZE,
+                      pause=0, dry_run=False):
+    """Collapse bursts, then archive old read notifications; returns (folded, archived)."""
+    if digest_after_hours is None:
+        digest_after_hours = settings.NOTIFICATION_DIGEST_AFTER_HOURS
+    folded = collapse_bursts(
+        timezone.now() - timedelta(hours=digest_after_hours), window=window,
+        chunk_size=chunk_size, pause=pause, dry_run=dry_run)
+    archived = archive_read_notifications(
+        retention_cutoff(retention_days), destination=destination, path=path,
+        chunk_size=chunk_size, pause=pause, dry_run=dry_run)
+    return folded, archived
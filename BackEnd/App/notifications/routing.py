@@ -8,3 +8,9 @@ websocket_urlpatterns = [
     path('ws/notifications', consumers.NotificationConsumer.as_asgi()),
     path('ws/notifications/', consumers.NotificationConsumer.as_asgi()),
 ]
+
+# Served by the ASGI router ahead of Django (see App/asgi.py)
+http_urlpatterns = [
+    path('api/notifications/stream/', consumers.NotificationStreamConsumer.as_asgi()),
+    path('api/notifications/poll/', consumers.NotificationPollConsumer.as_asgi()),
+]
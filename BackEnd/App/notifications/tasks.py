@@ -0,0 +1,50 @@
+from jobs.queue import task, enqueue, PRIORITY_HIGH, PRIORITY_LOW
+from .retention import enforce_retention
+from .views import BULK_NOTIFICATION_CHUNK_SIZE, send_notification, send_bulk_notification
+
+
+@task('notifications.send', priority=PRIORITY_HIGH)
+def deliver_notification(sender_id, receiver_id, notification_type, title, message, data=None):
+    send_notification(sender_id, receiver_id,
+                      notification_type, title, message, data)
+
+
+@task('notifications.send_bulk')
+def deliver_bulk_notification(sender_id, receiver_ids, notification_type, title, message, data=None):
+    send_bulk_notification(sender_id, receiver_ids,
+                           notification_type, title, message, data)
+
+
+def queue_notification(sender_id, receiver_id, notification_type, title, message, data=None):
+    """Deliver send_notification from the job worker instead of the request.
+
+    Nothing is queued when there is no receiver (e.g. a course without an
+    instructor); such a job could only fail.
+    """
+    if receiver_id is None:
+        return None
+    return enqueue('notifications.send', sender_id=sender_id, receiver_id=receiver_id,
+                   notification_type=notification_type, title=title, message=message, data=data)
+
+
+def queue_bulk_notification(sender_id, receiver_ids, notification_type, title, message, data=None):
+    """
+    Deliver send_bulk_notification from the job worker instead of the request.
+
+    One job per chunk of receivers, so a retry after a failure only redoes
+    that chunk instead of sending the chunks that already went out again.
+    Returns the queued jobs.
+    """
+    receiver_ids = list(dict.fromkeys(pk for pk in receiver_ids if pk is not None))
+    return [
+        enqueue('notifications.send_bulk', sender_id=sender_id,
+                receiver_ids=receiver_ids[start:start + BULK_NOTIFICATION_CHUNK_SIZE],
+                notification_type=notification_type, title=title, message=message, data=data)
+        for start in range(0, len(receiver_ids), BULK_NOTIFICATION_CHUNK_SIZE)
+    ]
+
+
+@task('notifications.enforce_retention', priority=PRIORITY_LOW, max_attempts=3)
+def run_retention(**options):
+    """Collapse bursts and archive old read notifications from the job worker."""
+    enforce_retention(**options)
@@ -1,3 +1,306 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .counters import mark_read, repair_unread_counters
+from .models import ArchivedNotification, Notification, UnreadNotificationCounter
+from .presence import presence
+from .retention import archive_read_notifications, collapse_bursts, retention_cutoff
+from .routing import http_urlpatterns, websocket_urlpatterns
+from .views import send_bulk_notification, send_notification
+
+User = get_user_model()
+
+
+class BulkNotificationTest(TestCase):
+    def setUp(self):
+        self.sender = User.objects.create_user(
+            username='instructor',
+            email='instructor@test.com',
+            password='testpass123',
+            first_name='Test',
+            last_name='Instructor',
+            role='instructor'
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@test.com',
+                password='testpass123',
+                role='student'
+            )
+            for i in range(5)
+        ]
+
+    def test_bulk_send_creates_one_row_per_receiver(self):
+        ids = [s.id for s in self.students]
+        with CaptureQueriesContext(connection) as ctx:
+            created = send_bulk_notification(
+                self.sender.id, ids + ids[:2], 'course_update', 'Update', 'New lesson',
+                chunk_size=2)
+        self.assertEqual(created, 5)
+        self.assertEqual(Notification.objects.filter(
+            receiver_id__in=ids, title='Update').count(), 5)
+        statements = [q for q in ctx.captured_queries
+                      if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        # sender lookup + (name lookup + insert + 2 counter statements) per chunk of 2
+        self.assertEqual(len(statements), 1 + 3 * 4)
+        self.assertEqual(UnreadNotificationCounter.objects.get(user=self.students[0]).unread, 1)
+
+    def test_publish_failure_does_not_fail_the_send(self):
+        ids = [s.id for s in self.students]
+        layer = mock.Mock()
+        layer.group_send = mock.AsyncMock(side_effect=RuntimeError('layer down'))
+        with mock.patch('notifications.views.get_channel_layer', return_value=layer), \
+                self.assertLogs('notifications.views', 'ERROR'):
+            created = send_bulk_notification(
+                self.sender.id, ids, 'course_update', 'Update', 'New lesson')
+        self.assertEqual(created, 5)
+        self.assertEqual(Notification.objects.filter(title='Update').count(), 5)
+
+    def test_empty_receivers(self):
+        self.assertEqual(send_bulk_notification(
+            None, [], 'announcement', 'Hi', 'Nobody'), 0)
+
+
+class UnreadCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student', email='student@test.com', password='pw', role='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.notifications = [
+            send_notification(None, self.user.id, 'announcement', f'N{i}', 'Body')
+            for i in range(3)]
+
+    def _badge(self):
+        return self.client.get('/api/notifications/unread_count/').data['unread_count']
+
+    def test_counter_follows_reads_and_deletes(self):
+        self.assertEqual(self._badge(), 3)
+        self.client.patch(f'/api/notifications/{self.notifications[0].id}/mark_read/')
+        self.client.patch(f'/api/notifications/{self.notifications[0].id}/mark_read/')
+        self.assertEqual(self._badge(), 2)
+        self.client.delete(f'/api/notifications/{self.notifications[1].id}/')
+        self.assertEqual(self._badge(), 1)
+        res = self.client.get('/api/notifications/recent/')
+        self.assertEqual(res.data['unread_count'], 1)
+        self.client.post('/api/notifications/mark_all_read/')
+        with self.assertNumQueries(1):
+            self.assertEqual(self._badge(), 0)
+
+    def test_repair(self):
+        UnreadNotificationCounter.objects.filter(user=self.user).update(unread=9)
+        self.assertEqual(repair_unread_counters(), 1)
+        self.assertEqual(self._badge(), 3)
+        UnreadNotificationCounter.objects.all().delete()
+        self.assertEqual(repair_unread_counters(dry_run=True), 1)
+        self.assertEqual(repair_unread_counters(), 1)
+        self.assertEqual(repair_unread_counters(), 0)
+
+
+
+class RetentionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='instructor', email='instructor@test.com', password='pw', role='instructor')
+        self.old = timezone.now().replace(minute=10) - timedelta(days=120)
+
+    def _notify(self, notification_type='announcement', when=None, is_read=False, **fields):
+        notification = send_notification(None, self.user.id, notification_type, 'T', 'Body', fields)
+        Notification.objects.filter(id=notification.id).update(created_at=when or self.old)
+        if is_read:
+            mark_read(self.user, Notification.objects.filter(id=notification.id))
+        return notification
+
+    def _badge(self):
+        return UnreadNotificationCounter.objects.get(user=self.user).unread
+
+    def test_archives_old_read_notifications_in_chunks(self):
+        old_read = [self._notify(is_read=True, n=i) for i in range(5)]
+        old_unread = self._notify()
+        recent_read = self._notify(when=timezone.now(), is_read=True)
+
+        cutoff = retention_cutoff(90)
+        self.assertEqual(archive_read_notifications(cutoff, dry_run=True), 5)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(archive_read_notifications(cutoff, chunk_size=2), 5)
+        deletes = [q for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)),
+                         {old_unread.id, recent_read.id})
+        archived = ArchivedNotification.objects.get(id=old_read[2].id)
+        self.assertEqual((archived.receiver_id, archived.data), (self.user.id, {'n': 2}))
+        self.assertEqual(self._badge(), 1)
+
+        self._notify(is_read=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'archive.jsonl')
+            self.assertEqual(archive_read_notifications(cutoff, 'jsonl', path), 1)
+            with open(path) as f:
+                self.assertEqual(json.loads(f.readline())['title'], 'T')
+
+    def test_collapses_bursts_into_one_digest(self):
+        [self._notify('course_enrollment', self.old + timedelta(seconds=i),
+                              is_read=i < 2, course_id=i) for i in range(6)]
+        self._notify('course_enrollment', self.old + timedelta(hours=3))
+        self._notify('announcement')
+        self.assertEqual(self._badge(), 6)
+
+        cutoff = timezone.now() - timedelta(days=1)
+        self.assertEqual(collapse_bursts(cutoff, min_size=5, dry_run=True), 6)
+        self.assertEqual(collapse_bursts(cutoff, min_size=5, chunk_size=4), 6)
+        digest = Notification.objects.get(data__has_key='digest')
+        self.assertEqual(digest.data['count'], 6)
+        self.assertEqual(digest.data['latest'], {'course_id': 5})
+        self.assertEqual(digest.created_at, self.old + timedelta(seconds=5))
+        self.assertFalse(digest.is_read)
+        self.assertEqual(digest.title, '6 Course Enrollment notifications')
+        self.assertEqual(Notification.objects.count(), 3)
+        # 4 unread folded into one unread digest
+        self.assertEqual(self._badge(), 3)
+        self.assertEqual(repair_unread_counters(dry_run=True), 0)
+        self.assertEqual(collapse_bursts(cutoff, min_size=5), 0)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationStreamTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student', email='student@test.com', password='pw', role='student')
+        self.token = str(AccessToken.for_user(self.user))
+        self.notify = database_sync_to_async(
+            lambda title: send_notification(None, self.user.id, 'announcement', title, 'Body'))
+
+    def _communicator(self, path, **headers):
+        return HttpCommunicator(
+            URLRouter(http_urlpatterns), 'GET', path,
+            headers=[(k.replace('_', '-').encode(), v.encode()) for k, v in headers.items()])
+
+    async def test_stream_replays_backlog_then_pushes(self):
+        first = await self.notify('Missed')
+        communicator = self._communicator(
+            f'/api/notifications/stream/?token={self.token}&since=0')
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(2)
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'Content-Type', b'text/event-stream'), start['headers'])
+        self.assertEqual((await communicator.receive_output(2))['body'], b'retry: 3000\n\n')
+
+        frame = (await communicator.receive_output(2))['body'].decode()
+        self.assertTrue(frame.startswith(f'id: {first.id}\nevent: notification\n'))
+
+        live = await self.notify('Live')
+        frame = (await communicator.receive_output(2))['body'].decode()
+        self.assertIn(f'id: {live.id}', frame)
+        self.assertEqual(json.loads(frame.split('data: ', 1)[1])['title'], 'Live')
+
+        # Out-of-order live events are delivered; only the backlog is deduped
+        layer = get_channel_layer()
+        for event_id in (live.id + 2, live.id + 1, first.id):
+            await layer.group_send(f'user_{self.user.id}', {'type': 'notify', 'data': {
+                'id': event_id, 'notification_type': 'announcement', 'title': 'Raced'}})
+        for event_id in (live.id + 2, live.id + 1):
+            frame = (await communicator.receive_output(2))['body'].decode()
+            self.assertTrue(frame.startswith(f'id: {event_id}\n'))
+        self.assertTrue(await communicator.receive_nothing(0.2))
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+
+    async def test_long_poll(self):
+        old = await self.notify('Old')
+        path = '/api/notifications/poll/?since={}&wait={}'
+        response = await self._communicator(
+            path.format(0, 5), authorization=f'Bearer {self.token}').get_response()
+        self.assertEqual(json.loads(response['body'])['last_id'], old.id)
+
+        poll = asyncio.ensure_future(self._communicator(
+            path.format(old.id, 5), authorization=f'Bearer {self.token}').get_response(timeout=10))
+        await asyncio.sleep(0.3)
+        self.assertFalse(poll.done())
+        new = await self.notify('New')
+        body = json.loads((await asyncio.wait_for(poll, 2))['body'])
+        self.assertEqual([n['id'] for n in body['notifications']], [new.id])
+
+        response = await self._communicator(
+            path.format(new.id, 0.2), authorization=f'Bearer {self.token}').get_response()
+        self.assertEqual(json.loads(response['body']), {'notifications': [], 'last_id': new.id})
+        response = await self._communicator('/api/notifications/poll/').get_response()
+        self.assertEqual(response['status'], 401)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   PRESENCE_BACKEND='memory', PRESENCE_BROADCAST_INTERVAL=0.1)
+class PresenceTest(TransactionTestCase):
+    def setUp(self):
+        presence.__init__()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@test.com', password='pw', role='admin')
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@test.com', password='pw', role='student')
+            for i in range(3)]
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), '/ws/notifications/')
+        await communicator.connect()
+        await communicator.send_json_to({'type': 'auth', 'token': str(AccessToken.for_user(user))})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'auth_success')
+        return communicator
+
+    async def test_admins_get_one_coalesced_update(self):
+        admin = await self._connect(self.admin)
+        students = [await self._connect(student) for student in self.students]
+        for student in students:
+            await student.send_json_to({'type': 'heartbeat'})
+
+        event = (await admin.receive_json_from(timeout=2))['notification']
+        self.assertEqual(event['type'], 'analytics_update')
+        self.assertEqual(event['online'], {'total': 4, 'student': 3, 'instructor': 0, 'admin': 1})
+        # Nothing changed, so nothing more is sent
+        self.assertTrue(await admin.receive_nothing(timeout=0.3))
+        for student in students:
+            self.assertTrue(await student.receive_nothing(timeout=0))
+
+        presence.task.cancel()
+        for communicator in [admin] + students:
+            await communicator.disconnect()
+
+    def test_summary_reports_online_counts(self):
+        presence.touch(self.students[0].id, 'student')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        res = client.get('/api/admin/analytics/summary/')
+        self.assertEqual(res.data['online']['student'], 1)
+
+    def test_memory_presence_without_sockets_is_unknown(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.assertLogs('notifications.presence', 'ERROR'):
+            res = client.get('/api/admin/analytics/summary/')
+        self.assertIsNone(res.data['online'])
+
+    def test_online_delta_uses_the_stored_last_counts(self):
+        presence.touch(self.students[0].id, 'student')
+        counts, previous = presence.tick()
+        self.assertIsNone(previous)
+        other_process = type(presence)()
+        other_process.store = presence.get_store()
+        other_process.touch(self.students[1].id, 'student')
+        counts, previous = other_process.tick()
+        self.assertEqual((previous['total'], counts['total']), (1, 2))
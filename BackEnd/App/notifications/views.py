@@ -1,16 +1,23 @@
+import asyncio
+import logging
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from . import counters
 from .models import Notification
+from .presence import presence
 from .serializers import NotificationSerializer
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.db import transaction
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from authentication.models import User
 
+logger = logging.getLogger(__name__)
+
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
@@ -19,40 +26,77 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Notification.objects.filter(receiver=self.request.user)
 
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        with transaction.atomic():
+            notification = serializer.save()
+            if notification.is_read != was_read:
+                counters.bump_unread({notification.receiver_id: -1 if notification.is_read else 1})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            if not instance.is_read:
+                counters.bump_unread({instance.receiver_id: -1})
+
     @action(detail=True, methods=['patch'])
     def mark_read(self, request, pk=None):
         """Mark a specific notification as read"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        counters.mark_read(request.user, self.get_queryset().filter(pk=notification.pk))
         return Response({'status': 'marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        self.get_queryset().update(is_read=True)
+        counters.mark_read(request.user, self.get_queryset())
         return Response({'status': 'all marked as read'})
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications"""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': counters.unread_count(request.user)})
     
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recent notifications for polling"""
-        notifications = self.get_queryset().filter(
+        notifications = list(self.get_queryset().filter(
             is_read=False
-        ).order_by('-created_at')[:10]
+        ).select_related('sender', 'receiver').order_by('-created_at')[:10])
         
         return Response({
             'notifications': NotificationSerializer(notifications, many=True).data,
-            'unread_count': notifications.count(),
+            'unread_count': counters.unread_count(request.user),
             'timestamp': timezone.now().isoformat()
         })
 
 
+def _notification_payload(notification, sender_name, receiver_name):
+    return {
+        "id": notification.id,
+        "sender": notification.sender_id,
+        "sender_name": sender_name,
+        "receiver": notification.receiver_id,
+        "receiver_name": receiver_name,
+        "title": notification.title,
+        "message": notification.message,
+        "notification_type": notification.notification_type,
+        "is_read": notification.is_read,
+        "created_at": notification.created_at.isoformat(),
+        "data": notification.data
+    }
+
+
+
+def notification_payload(notification):
+    """Event payload for a stored notification (select_related sender and receiver)."""
+    return _notification_payload(
+        notification,
+        notification.sender.get_full_name() if notification.sender else "System",
+        notification.receiver.get_full_name() if notification.receiver else "",
+    )
+
+
 # Utility function to send notifications
 def send_notification(sender_id, receiver_id, notification_type, title, message, data=None):
     """
@@ -84,48 +128,97 @@ def send_notification(sender_id, receiver_id, notification_type, title, message,
         f"user_{receiver_id}",
         {
             "type": "notify",
-            "data": {
-                "id": notification.id,
-                "sender": notification.sender_id,
-                "sender_name": notification.sender.get_full_name() if notification.sender else "System",
-                "receiver": notification.receiver_id,
-                "receiver_name": notification.receiver.get_full_name() if notification.receiver else "",
-                "title": notification.title,
-                "message": notification.message,
-                "notification_type": notification.notification_type,
-                "is_read": notification.is_read,
-                "created_at": notification.created_at.isoformat(),
-                "data": notification.data
-            }
+            "data": notification_payload(notification)
         }
     )
 
     return notification
 
 
-# --- Online users tracking (simplified) ---
-ONLINE_USERS_KEY = 'online_users_last_seen'
+BULK_NOTIFICATION_CHUNK_SIZE = 1000
+
+
+async def _publish_notifications(channel_layer, messages):
+    await asyncio.gather(*[
+        channel_layer.group_send(group, message) for group, message in messages
+    ])
+
+
+def send_bulk_notification(sender_id, receiver_ids, notification_type, title, message, data=None,
+                           chunk_size=BULK_NOTIFICATION_CHUNK_SIZE):
+    """
+    Send the same notification to many receivers.
 
+    Rows are inserted with bulk_create and published to the channel layer
+    one chunk at a time, so the cost per chunk is one insert, one name
+    lookup, two unread-counter statements and one event-loop round trip instead of several queries and a
+    blocking group_send per receiver. A chunk that fails to publish is
+    logged rather than raised: its rows are already committed, and a job
+    retry would store them twice.
+
+    Args:
+        sender_id: ID of the sending user (None for system notifications)
+        receiver_ids: Iterable of receiver user IDs (duplicates are ignored)
+        notification_type, title, message, data: as for send_notification
+        chunk_size: Receivers handled per insert/publish batch
+
+    Returns:
+        Number of notifications created
+    """
+    from .models import Notification
+
+    receiver_ids = list(dict.fromkeys(rid for rid in receiver_ids if rid))
+    if not receiver_ids:
+        return 0
+
+    sender_name = "System"
+    if sender_id:
+        sender = User.objects.filter(id=sender_id).only(
+            'first_name', 'last_name').first()
+        if sender:
+            sender_name = sender.get_full_name()
 
-def track_user_activity(user_id):
-    """Track last seen for a user and broadcast analytics update"""
     channel_layer = get_channel_layer()
-    now_iso = timezone.now().isoformat()
-    async_to_sync(channel_layer.group_send)(
-        f"user_{user_id}",
-        {"type": "notify", "data": {"type": "heartbeat", "at": now_iso}}
-    )
-    # Broadcast analytics update to admins (placeholder event)
-    admin_ids = list(User.objects.filter(
-        role='admin').values_list('id', flat=True))
-    for admin_id in admin_ids:
-        async_to_sync(channel_layer.group_send)(
-            f"user_{admin_id}",
-            {
-                "type": "notify",
-                "data": {
-                    "type": "analytics_update",
-                    "online_delta": 1,
-                },
-            },
-        )
+    created = 0
+    for start in range(0, len(receiver_ids), chunk_size):
+        chunk = receiver_ids[start:start + chunk_size]
+        receiver_names = {
+            row['id']: f"{row['first_name']} {row['last_name']}".strip()
+            for row in User.objects.filter(id__in=chunk).values('id', 'first_name', 'last_name')
+        }
+        with transaction.atomic():
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    sender_id=sender_id,
+                    receiver_id=receiver_id,
+                    notification_type=notification_type,
+                    title=title,
+                    message=message,
+                    data=data or {}
+                )
+                for receiver_id in chunk if receiver_id in receiver_names
+            ])
+            counters.bump_unread({n.receiver_id: 1 for n in notifications})
+        created += len(notifications)
+        if channel_layer is None:
+            continue
+        try:
+            async_to_sync(_publish_notifications)(channel_layer, [
+                (
+                    f"user_{n.receiver_id}",
+                    {
+                        "type": "notify",
+                        "data": _notification_payload(
+                            n, sender_name, receiver_names[n.receiver_id]),
+                    },
+                )
+                for n in notifications
+            ])
+        except Exception:
+            logger.exception('Bulk notification publish failed')
+    return created
+
+
+def track_user_activity(user_id, role=None):
+    """Mark a user as online; admins get coalesced counts (see notifications.presence)"""
+    presence.touch(user_id, role)
@@ -105,7 +105,16 @@ class Transaction(models.Model):
         indexes = [
             models.Index(fields=['student', 'created_at']),
             models.Index(fields=['course', 'created_at']),
-            models.Index(fields=['payment_status']),
+            # Ledger analytics (transactions.analytics): status/date range
+            # scans and per-course revenue read `amount` from the index on
+            # PostgreSQL; completed payments get their own partial index.
+            models.Index(fields=['payment_status', 'created_at'],
+                         include=['amount'], name='txn_status_created_idx'),
+            models.Index(fields=['course', 'payment_status'],
+                         include=['amount'], name='txn_course_status_idx'),
+            models.Index(fields=['created_at'], include=['amount', 'course'],
+                         condition=models.Q(payment_status='completed'),
+                         name='txn_completed_created_idx'),
             models.Index(fields=['transaction_id']),
             models.Index(fields=['stripe_payment_intent_id']),
         ]
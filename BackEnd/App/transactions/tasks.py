@@ -0,0 +1,29 @@
+from jobs.queue import task
+from courses.models import Enrollment
+from .models import Transaction
+
+
+@task('transactions.record_enrollment_payment')
+def record_enrollment_payment(enrollment_id, intent_id, intent_status):
+    """Create the Transaction row for a Stripe-paid enrollment (idempotent per intent)."""
+    if Transaction.objects.filter(stripe_payment_intent_id=intent_id).exists():
+        return
+    enrollment = Enrollment.objects.select_related(
+        'course').get(id=enrollment_id)
+    course = enrollment.course
+    Transaction.objects.create(
+        student_id=enrollment.student_id,
+        course=course,
+        amount=course.price,
+        currency='USD',
+        payment_status='completed',
+        payment_method='stripe',
+        stripe_payment_intent_id=intent_id,
+        notes=f'Enrollment in {course.title}',
+        metadata={
+            'enrollment_id': enrollment.id,
+            'course_id': course.id,
+            'student_id': enrollment.student_id,
+            'stripe_intent_status': intent_status,
+        }
+    )
@@ -89,3 +89,37 @@ class TransactionModelTest(TestCase):
         )
         
         self.assertEqual(transaction.instructor_name, 'Test Instructor')
+
+
+class LedgerAnalyticsTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username='ledger_student', email='ledger_student@test.com',
+            password='testpass123', role='student')
+        self.course = Course.objects.create(
+            title='Ledger Course', description='d', price=50)
+
+    def _payment(self, n, amount, payment_status, days_ago=0):
+        payment = Transaction.objects.create(
+            transaction_id=f'TXN_LEDGER_{n}', student=self.student, course=self.course,
+            amount=amount, payment_status=payment_status)
+        Transaction.objects.filter(id=payment.id).update(
+            created_at=timezone.now() - timezone.timedelta(days=days_ago))
+
+    def test_ledger_summary_is_one_query(self):
+        from .analytics import ledger_summary
+        self._payment(1, 50, 'completed')
+        self._payment(2, 30, 'completed', days_ago=60)
+        self._payment(3, 20, 'refunded')
+        self._payment(4, 10, 'pending')
+        with self.assertNumQueries(1):
+            stats = ledger_summary()
+        self.assertEqual(stats['total_revenue'], 80)
+        self.assertEqual(stats['recent_revenue'], 50)
+        self.assertEqual(stats['refunded_amount'], 20)
+        self.assertEqual(stats['recent_transactions'], 3)
+        self.assertEqual(stats['status_counts'], [
+            {'payment_status': 'completed', 'count': 2},
+            {'payment_status': 'pending', 'count': 1},
+            {'payment_status': 'refunded', 'count': 1},
+        ])
@@ -2,9 +2,10 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Sum, Count
+from django.db.models import Q
 from django.utils import timezone
 from .models import Transaction
+from .analytics import ledger_summary
 from .serializers import (
     TransactionSerializer,
     TransactionCreateSerializer,
@@ -111,36 +112,16 @@ class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
 @permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
 def transaction_stats(request):
     """
-    Get transaction statistics for admin dashboard
+    Get transaction statistics for admin dashboard (single ledger query)
     """
-    # Total revenue
-    total_revenue = Transaction.objects.filter(
-        payment_status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Transaction counts by status
-    status_counts = Transaction.objects.values('payment_status').annotate(
-        count=Count('id')
-    ).order_by('payment_status')
-    
-    # Recent transactions (last 30 days)
-    thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    recent_transactions = Transaction.objects.filter(
-        created_at__gte=thirty_days_ago
-    ).count()
-    
-    # Monthly revenue (current month)
-    current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    monthly_revenue = Transaction.objects.filter(
-        payment_status='completed',
-        created_at__gte=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
+    stats = ledger_summary()
     return Response({
-        'total_revenue': float(total_revenue),
-        'monthly_revenue': float(monthly_revenue),
-        'recent_transactions': recent_transactions,
-        'status_counts': list(status_counts),
+        'total_revenue': float(stats['total_revenue']),
+        'monthly_revenue': float(stats['monthly_revenue']),
+        'recent_revenue': float(stats['recent_revenue']),
+        'refunded_amount': float(stats['refunded_amount']),
+        'recent_transactions': stats['recent_transactions'],
+        'status_counts': stats['status_counts'],
     })
 
 
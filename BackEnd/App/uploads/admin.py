@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Upload
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    list_display = ['id', 'owner', 'purpose', 'filename', 'status',
+                    'received_bytes', 'total_size', 'created_at']
+    list_filter = ['status', 'purpose']
+    search_fields = ['filename', 'owner__email']
+    readonly_fields = ['created_at', 'updated_at', 'completed_at']
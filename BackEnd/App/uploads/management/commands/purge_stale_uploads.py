@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.models import Job
+from uploads.models import Upload
+from uploads.storage import get_upload_storage
+
+
+class Command(BaseCommand):
+    help = ('Abort chunked uploads that stopped receiving data, fail uploads whose '
+            'finalize job gave up, and delete their parts')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Abort uploads idle for this many hours (default: 24)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        storage = get_upload_storage()
+        stale = Upload.objects.filter(status='uploading', updated_at__lt=cutoff)
+        purged = 0
+        for upload in stale.iterator():
+            storage.delete(upload.storage_name)
+            purged += Upload.objects.filter(
+                id=upload.id, status='uploading').update(status='aborted')
+
+        # Uploads stay 'processing' while uploads.finalize retries; once the
+        # job has failed permanently nothing will ever finish them
+        failed = 0
+        processing = Upload.objects.filter(status='processing', updated_at__lt=cutoff)
+        for upload in processing.iterator():
+            if Job.objects.filter(idempotency_key=f'upload-finalize:{upload.id}',
+                                  status__in=('queued', 'running')).exists():
+                continue
+            storage.delete(upload.storage_name)
+            failed += Upload.objects.filter(id=upload.id, status='processing').update(
+                status='failed', error=upload.error or 'Processing did not complete')
+        self.stdout.write(self.style.SUCCESS(
+            f'Aborted {purged} stale uploads, failed {failed} stuck in processing'))
@@ -0,0 +1,71 @@
+import uuid
+
+from django.db import models
+from authentication.models import User
+
+
+class Upload(models.Model):
+    """
+    A resumable chunked upload. Chunks are appended to `storage_name` in the
+    upload storage backend (see uploads.storage); once complete, a background
+    job publishes the file and attaches it according to `purpose`.
+    """
+    PURPOSE_CHOICES = (
+        ('course_video', 'Course Video'),
+        ('instructor_document', 'Instructor Document'),
+        ('identity_photo', 'Identity Photo'),
+    )
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('aborted', 'Aborted'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='uploads')
+    purpose = models.CharField(max_length=30, choices=PURPOSE_CHOICES)
+    # Purpose specific details, e.g. course_id/title for course videos
+    target = models.JSONField(default=dict, blank=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    processed_bytes = models.BigIntegerField(default=0)
+    # Optional sha256 of the whole file, verified before publishing
+    checksum = models.CharField(max_length=64, blank=True)
+    storage_name = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=12, choices=STATUS_CHOICES, default='uploading')
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'uploads'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at']),
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def upload_progress(self):
+        if not self.total_size:
+            return 100.0
+        return round(100.0 * self.received_bytes / self.total_size, 1)
+
+    @property
+    def processing_progress(self):
+        if self.status == 'completed':
+            return 100.0
+        if not self.total_size:
+            return 0.0
+        return round(100.0 * self.processed_bytes / self.total_size, 1)
@@ -0,0 +1,84 @@
+"""
+Pluggable storage for in-progress chunked uploads.
+
+The backend is configured with ``UPLOAD_STORAGE = {'BACKEND': <dotted path>,
+'OPTIONS': {...}}``. ``LocalUploadStorage`` keeps partial files on the local
+filesystem (and is what the tests use); a shared volume works for multiple
+web/worker hosts. Other backends (e.g. object storage multipart uploads)
+only need to implement the ``UploadStorage`` methods.
+"""
+import os
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadStorage:
+    def write_chunk(self, name, offset, blocks):
+        """Write an iterable of byte blocks at ``offset``; return bytes written."""
+        raise NotImplementedError
+
+    def truncate(self, name, length):
+        """Discard everything after ``length`` bytes (used to drop bad chunks)."""
+        raise NotImplementedError
+
+    def size(self, name):
+        raise NotImplementedError
+
+    def open(self, name):
+        """Return a binary file object for reading the assembled file."""
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+
+class LocalUploadStorage(UploadStorage):
+    def __init__(self, location=None):
+        self.location = str(location or os.path.join(
+            settings.BASE_DIR, 'upload_staging'))
+
+    def path(self, name):
+        os.makedirs(self.location, exist_ok=True)
+        # Names are generated server side; basename() guards against traversal
+        return os.path.join(self.location, os.path.basename(name))
+
+    def write_chunk(self, name, offset, blocks):
+        path = self.path(name)
+        written = 0
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as fh:
+            fh.seek(offset)
+            for block in blocks:
+                fh.write(block)
+                written += len(block)
+        return written
+
+    def truncate(self, name, length):
+        path = self.path(name)
+        if os.path.exists(path):
+            with open(path, 'r+b') as fh:
+                fh.truncate(length)
+
+    def size(self, name):
+        try:
+            return os.path.getsize(self.path(name))
+        except FileNotFoundError:
+            return 0
+
+    def open(self, name):
+        return open(self.path(name), 'rb')
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+
+def get_upload_storage():
+    config = getattr(settings, 'UPLOAD_STORAGE', {})
+    backend = import_string(config.get(
+        'BACKEND', 'uploads.storage.LocalUploadStorage'))
+    return backend(**config.get('OPTIONS', {}))
@@ -0,0 +1,182 @@
+import hashlib
+
+from cloudinary import CloudinaryResource
+from cloudinary.uploader import upload_large as cloudinary_upload_large
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import InstructorRequest, IdentityVerificationRequest
+from courses.models import Course, Video
+from jobs.queue import task
+from .models import Upload
+from .storage import BLOCK_SIZE, get_upload_storage
+
+# Cloudinary chunked upload part size (their minimum is 5MB)
+CLOUDINARY_CHUNK_SIZE = 20 * 1024 * 1024
+# Persist processing progress at most once per this many bytes
+PROGRESS_STEP = 5 * 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """The upload can never be finalized (bad checksum, missing target...)."""
+
+
+class ProgressReader:
+    """File wrapper that records how much of an upload has been published."""
+
+    def __init__(self, fh, upload_id):
+        self._fh = fh
+        self._upload_id = upload_id
+        self._reported = 0
+
+    def read(self, size=-1):
+        data = self._fh.read(size)
+        position = self._fh.tell()
+        if not data or position - self._reported >= PROGRESS_STEP:
+            Upload.objects.filter(id=self._upload_id).update(
+                processed_bytes=position)
+            self._reported = position
+        return data
+
+    def seek(self, *args):
+        position = self._fh.seek(*args)
+        self._reported = min(self._reported, self._fh.tell())
+        return position
+
+    def __getattr__(self, name):
+        return getattr(self._fh, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._fh.close()
+
+
+def _verify(upload, storage):
+    if storage.size(upload.storage_name) != upload.total_size:
+        raise UploadRejected('Stored size does not match the declared size')
+    if not upload.checksum:
+        return
+    digest = hashlib.sha256()
+    with storage.open(upload.storage_name) as fh:
+        for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    if digest.hexdigest() != upload.checksum:
+        raise UploadRejected('Checksum mismatch')
+
+
+def _default_is_cloudinary():
+    return type(storages['default']).__module__.startswith('cloudinary_storage')
+
+
+def _publish(upload, storage, folder, resource_type='auto'):
+    """
+    Stream the assembled file to Cloudinary in parts. If that fails and the
+    default storage is somewhere else (e.g. local media in development),
+    the file is saved there instead; otherwise the error propagates so the
+    job queue retries. Returns ``(url, cloudinary_result_or_None)``.
+    """
+    with ProgressReader(storage.open(upload.storage_name), upload.id) as reader:
+        error = None
+        try:
+            result = cloudinary_upload_large(
+                reader, folder=folder, resource_type=resource_type,
+                filename=upload.filename, chunk_size=CLOUDINARY_CHUNK_SIZE)
+            if result and 'secure_url' in result:
+                return result['secure_url'], result
+        except Exception as exc:
+            error = exc
+        # Saving to a Cloudinary-backed default storage would just retry Cloudinary
+        if _default_is_cloudinary():
+            raise error or RuntimeError('Cloudinary upload returned no secure_url')
+        reader.seek(0)
+        stored_name = default_storage.save(
+            f"{folder}/{upload.filename}", File(reader, name=upload.filename))
+        return default_storage.url(stored_name), None
+
+
+def _finalize_course_video(upload, storage):
+    target = upload.target
+    course = Course.objects.filter(
+        id=target.get('course_id'), instructor_id=upload.owner_id).first()
+    if not course:
+        raise UploadRejected('Course not found')
+    url, result = _publish(
+        upload, storage, f"courses/{course.id}/videos", 'video')
+    video = Video(
+        course=course,
+        title=target.get('title') or upload.filename,
+        description=target.get('description') or '',
+        order=target.get('order') or 0,
+    )
+    if result:
+        video.file = CloudinaryResource(
+            public_id=result['public_id'], version=result.get('version'),
+            format=result.get('format'), type=result.get('type', 'upload'),
+            resource_type='video')
+    else:
+        video.url = url
+    video.save()
+    return {'video_id': video.id, 'url': url}
+
+
+def _finalize_instructor_document(upload, storage):
+    url, result = _publish(upload, storage, f"instructors/{upload.owner_id}")
+    if result:
+        is_image = result.get('resource_type') == 'image'
+    else:
+        is_image = upload.content_type.startswith('image/')
+    with transaction.atomic():
+        ir, _ = InstructorRequest.objects.select_for_update().get_or_create(
+            user_id=upload.owner_id)
+        ir.documents = list(ir.documents or []) + [url]
+        if is_image and not ir.photo_url:
+            ir.photo_url = url
+        ir.save(update_fields=['documents', 'photo_url'])
+    return {'instructor_request_id': ir.id, 'url': url}
+
+
+def _finalize_identity_photo(upload, storage):
+    url, _ = _publish(upload, storage, f"id_verifications/{upload.owner_id}")
+    ivr, created = IdentityVerificationRequest.objects.get_or_create(
+        user_id=upload.owner_id, defaults={'id_photo_url': url})
+    if not created:
+        ivr.id_photo_url = url
+        ivr.save(update_fields=['id_photo_url'])
+    return {'identity_verification_request_id': ivr.id, 'url': url}
+
+
+FINALIZERS = {
+    'course_video': _finalize_course_video,
+    'instructor_document': _finalize_instructor_document,
+    'identity_photo': _finalize_identity_photo,
+}
+
+
+@task('uploads.finalize', max_attempts=3)
+def finalize_upload(upload_id):
+    """Verify a completed chunked upload, publish it and attach it to its target."""
+    upload = Upload.objects.filter(id=upload_id, status='processing').first()
+    if not upload:
+        return
+    storage = get_upload_storage()
+    try:
+        _verify(upload, storage)
+        result = FINALIZERS[upload.purpose](upload, storage)
+    except UploadRejected as exc:
+        Upload.objects.filter(id=upload.id).update(
+            status='failed', error=str(exc), processed_bytes=0)
+        storage.delete(upload.storage_name)
+        return
+    except Exception as exc:
+        # Keep the parts for the job retry, but surface the error
+        Upload.objects.filter(id=upload.id).update(
+            error=repr(exc)[:1000], processed_bytes=0)
+        raise
+    Upload.objects.filter(id=upload.id).update(
+        status='completed', result=result, error='',
+        processed_bytes=upload.total_size, completed_at=timezone.now())
+    storage.delete(upload.storage_name)
@@ -0,0 +1,139 @@
+import hashlib
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from courses.models import Course, Video
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from .models import Upload
+from .storage import get_upload_storage
+
+_tmp = tempfile.mkdtemp()
+
+
+@override_settings(
+    UPLOAD_STORAGE={'BACKEND': 'uploads.storage.LocalUploadStorage',
+                    'OPTIONS': {'location': _tmp}},
+    MEDIA_ROOT=_tmp,
+    STORAGES={**settings.STORAGES, 'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': _tmp}}},
+)
+@mock.patch('uploads.tasks.cloudinary_upload_large', side_effect=Exception('offline'))
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            username='inst', email='inst@example.com', password='pw', role='instructor')
+        self.course = Course.objects.create(
+            title='Django', description='d', instructor=self.instructor, price=10, status='approved')
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+        self.content = b'0123456789' * 1000
+
+    def _init(self, **extra):
+        data = {'purpose': 'course_video', 'filename': 'lesson.mp4', 'size': len(self.content),
+                'course_id': self.course.id, 'title': 'Lesson 1',
+                'checksum': hashlib.sha256(self.content).hexdigest()}
+        data.update(extra)
+        return self.client.post('/api/uploads/', data, format='json')
+
+    def _put(self, upload_id, offset, chunk, checksum=None):
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = checksum
+        return self.client.put(f'/api/uploads/{upload_id}/chunk/', chunk,
+                               content_type='application/octet-stream', **headers)
+
+    def test_resumable_upload_creates_video_after_finalize(self, _cloudinary):
+        upload_id = self._init().data['id']
+        first, second = self.content[:4000], self.content[4000:]
+
+        res = self._put(upload_id, 0, first, hashlib.sha256(first).hexdigest())
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['offset'], 4000)
+
+        # replaying a stale offset reports where to resume
+        res = self._put(upload_id, 0, first)
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.data['offset'], 4000)
+
+        self._put(upload_id, 4000, second)
+        res = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.data['status'], 'processing')
+        self.assertFalse(Video.objects.exists())
+
+        run_pending_jobs()
+        res = self.client.get(f'/api/uploads/{upload_id}/')
+        self.assertEqual(res.data['status'], 'completed')
+        self.assertEqual(res.data['processing_progress'], 100.0)
+        video = Video.objects.get(id=res.data['result']['video_id'])
+        self.assertEqual(video.title, 'Lesson 1')
+        self.assertEqual(video.course_id, self.course.id)
+        upload = Upload.objects.get(id=upload_id)
+        self.assertEqual(get_upload_storage().size(upload.storage_name), 0)
+
+    def test_cloudinary_failure_is_retried_not_saved_to_cloudinary_storage(self, _cloudinary):
+        upload_id = self._init().data['id']
+        self._put(upload_id, 0, self.content)
+        self.client.post(f'/api/uploads/{upload_id}/complete/')
+        cloudinary_storages = {**settings.STORAGES, 'default': {
+            'BACKEND': 'cloudinary_storage.storage.MediaCloudinaryStorage'}}
+        with override_settings(STORAGES=cloudinary_storages), \
+                mock.patch('uploads.tasks.default_storage') as fallback:
+            run_pending_jobs()
+        fallback.save.assert_not_called()
+        upload = Upload.objects.get(id=upload_id)
+        self.assertEqual(upload.status, 'processing')
+        self.assertIn('offline', upload.error)
+        self.assertFalse(Video.objects.exists())
+
+    def test_purge_fails_uploads_whose_finalize_job_gave_up(self, _cloudinary):
+        upload_id = self._init().data['id']
+        self._put(upload_id, 0, self.content)
+        self.client.post(f'/api/uploads/{upload_id}/complete/')
+        call_command('purge_stale_uploads', hours=0, stdout=StringIO())
+        self.assertEqual(Upload.objects.get(id=upload_id).status, 'processing')
+
+        Job.objects.filter(task='uploads.finalize').update(status='failed')
+        call_command('purge_stale_uploads', hours=0, stdout=StringIO())
+        upload = Upload.objects.get(id=upload_id)
+        self.assertEqual(upload.status, 'failed')
+        self.assertEqual(get_upload_storage().size(upload.storage_name), 0)
+
+    def test_bad_chunk_checksum_is_discarded(self, _cloudinary):
+        upload_id = self._init().data['id']
+        res = self._put(upload_id, 0, self.content[:100], '0' * 64)
+        self.assertEqual(res.status_code, 400)
+        upload = Upload.objects.get(id=upload_id)
+        self.assertEqual(upload.received_bytes, 0)
+        self.assertEqual(get_upload_storage().size(upload.storage_name), 0)
+
+    def test_complete_requires_all_bytes(self, _cloudinary):
+        upload_id = self._init().data['id']
+        self._put(upload_id, 0, self.content[:100])
+        res = self.client.post(f'/api/uploads/{upload_id}/complete/')
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.data['offset'], 100)
+
+    def test_whole_file_checksum_mismatch_fails_upload(self, _cloudinary):
+        upload_id = self._init(checksum='f' * 64).data['id']
+        self._put(upload_id, 0, self.content)
+        self.client.post(f'/api/uploads/{upload_id}/complete/')
+        run_pending_jobs()
+        upload = Upload.objects.get(id=upload_id)
+        self.assertEqual(upload.status, 'failed')
+        self.assertFalse(Video.objects.exists())
+
+    def test_only_course_instructor_can_upload_videos(self, _cloudinary):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='pw', role='instructor')
+        self.client.force_authenticate(other)
+        self.assertEqual(self._init().status_code, 403)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.init_upload, name='init_upload'),
+    path('<uuid:upload_id>/', views.upload_detail, name='upload_detail'),
+    path('<uuid:upload_id>/chunk/', views.upload_chunk, name='upload_chunk'),
+    path('<uuid:upload_id>/complete/',
+         views.complete_upload, name='complete_upload'),
+]
@@ -0,0 +1,206 @@
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from courses.models import Course
+from jobs.queue import enqueue
+from .models import Upload
+from .storage import BLOCK_SIZE, get_upload_storage
+
+MAX_UPLOAD_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+MAX_CHUNK_SIZE = getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 ** 2)
+
+
+class ChunkRejected(Exception):
+    pass
+
+
+def _upload_data(upload):
+    return {
+        'id': str(upload.id),
+        'purpose': upload.purpose,
+        'filename': upload.filename,
+        'status': upload.status,
+        'total_size': upload.total_size,
+        'offset': upload.received_bytes,
+        'upload_progress': upload.upload_progress,
+        'processing_progress': upload.processing_progress,
+        'result': upload.result,
+        'error': upload.error,
+        'created_at': upload.created_at,
+        'completed_at': upload.completed_at,
+    }
+
+
+def _get_own_upload(request, upload_id):
+    return Upload.objects.filter(id=upload_id, owner=request.user).first()
+
+
+def _target_for(request, purpose):
+    """Validate purpose specific fields; returns (target, error_response)."""
+    if purpose == 'course_video':
+        course = Course.objects.filter(
+            id=request.data.get('course_id')).first()
+        if not course:
+            return None, Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.user.role != 'instructor' or course.instructor_id != request.user.id:
+            return None, Response({'error': 'Only the course instructor can add videos'}, status=status.HTTP_403_FORBIDDEN)
+        if not request.data.get('title'):
+            return None, Response({'error': 'title is required'}, status=status.HTTP_400_BAD_REQUEST)
+        return {
+            'course_id': course.id,
+            'title': request.data.get('title'),
+            'description': request.data.get('description', ''),
+            'order': int(request.data.get('order') or 0),
+        }, None
+    return {}, None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def init_upload(request):
+    """
+    Start a resumable upload. Body: purpose, filename, size and optionally
+    content_type, checksum (sha256 hex of the whole file) and purpose
+    specific fields (course_video: course_id, title, description, order).
+    """
+    purpose = request.data.get('purpose')
+    if purpose not in dict(Upload.PURPOSE_CHOICES):
+        return Response({'error': 'Invalid purpose'}, status=status.HTTP_400_BAD_REQUEST)
+    filename = (request.data.get('filename') or '').strip()
+    if not filename:
+        return Response({'error': 'filename is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        total_size = int(request.data.get('size'))
+        int(request.data.get('order') or 0)  # stored by _target_for
+    except (TypeError, ValueError):
+        return Response({'error': 'size and order must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if total_size <= 0 or total_size > MAX_UPLOAD_SIZE:
+        return Response({'error': f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+    checksum = (request.data.get('checksum') or '').lower()
+    if checksum and len(checksum) != 64:
+        return Response({'error': 'checksum must be a sha256 hex digest'}, status=status.HTTP_400_BAD_REQUEST)
+
+    target, error = _target_for(request, purpose)
+    if error:
+        return error
+    upload = Upload(
+        owner=request.user,
+        purpose=purpose,
+        target=target,
+        filename=filename[-255:],
+        content_type=(request.data.get('content_type') or '')[:100],
+        total_size=total_size,
+        checksum=checksum,
+    )
+    upload.storage_name = f'{upload.id}.part'
+    upload.save()
+    data = _upload_data(upload)
+    data['chunk_size'] = MAX_CHUNK_SIZE
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_detail(request, upload_id):
+    """GET: progress of an upload (offset to resume from). DELETE: abort it."""
+    upload = _get_own_upload(request, upload_id)
+    if not upload:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'DELETE':
+        if upload.status == 'uploading':
+            upload.status = 'aborted'
+            upload.save(update_fields=['status', 'updated_at'])
+            get_upload_storage().delete(upload.storage_name)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(_upload_data(upload))
+
+
+def _read_chunk(stream, length, digest):
+    """Yield the request body in blocks, hashing as we go."""
+    remaining = length
+    while remaining > 0:
+        block = stream.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            raise ChunkRejected('Request body shorter than Content-Length')
+        digest.update(block)
+        remaining -= len(block)
+        yield block
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def upload_chunk(request, upload_id):
+    """
+    Append the raw request body at ``offset`` (``Upload-Offset`` header or
+    ``?offset=``). An optional ``Upload-Checksum`` header / ``?checksum=``
+    carries the chunk's sha256; a mismatching chunk is discarded. Returns
+    409 with the current offset if the client is out of sync.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset')
+                     or request.query_params.get('offset'))
+        length = int(request.headers.get('Content-Length') or 0)
+    except (TypeError, ValueError):
+        return Response({'error': 'offset is required'}, status=status.HTTP_400_BAD_REQUEST)
+    expected_checksum = (request.headers.get('Upload-Checksum')
+                         or request.query_params.get('checksum') or '').lower()
+    if length <= 0:
+        return Response({'error': 'Empty chunk'}, status=status.HTTP_400_BAD_REQUEST)
+    if length > MAX_CHUNK_SIZE:
+        return Response({'error': f'Chunks are limited to {MAX_CHUNK_SIZE} bytes'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    storage = get_upload_storage()
+    # The row lock serializes concurrent writers of the same upload
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().filter(
+            id=upload_id, owner=request.user).first()
+        if not upload:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if upload.status != 'uploading':
+            return Response({'error': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+        if offset != upload.received_bytes:
+            return Response({'error': 'Offset mismatch', 'offset': upload.received_bytes}, status=status.HTTP_409_CONFLICT)
+        if offset + length > upload.total_size:
+            return Response({'error': 'Chunk exceeds declared size'}, status=status.HTTP_400_BAD_REQUEST)
+
+        digest = hashlib.sha256()
+        try:
+            storage.write_chunk(upload.storage_name, offset,
+                                _read_chunk(request.stream, length, digest))
+            if expected_checksum and digest.hexdigest() != expected_checksum:
+                raise ChunkRejected('Chunk checksum mismatch')
+        except ChunkRejected as exc:
+            storage.truncate(upload.storage_name, offset)
+            return Response({'error': str(exc), 'offset': offset}, status=status.HTTP_400_BAD_REQUEST)
+        upload.received_bytes = offset + length
+        upload.save(update_fields=['received_bytes', 'updated_at'])
+    return Response(_upload_data(upload))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload(request, upload_id):
+    """Queue finalization once every byte has been received."""
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().filter(
+            id=upload_id, owner=request.user).first()
+        if not upload:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if upload.status in ('processing', 'completed'):
+            return Response(_upload_data(upload), status=status.HTTP_202_ACCEPTED)
+        if upload.status != 'uploading':
+            return Response({'error': f'Upload is {upload.status}'}, status=status.HTTP_409_CONFLICT)
+        if upload.received_bytes != upload.total_size:
+            return Response({'error': 'Upload is incomplete', 'offset': upload.received_bytes}, status=status.HTTP_409_CONFLICT)
+        upload.status = 'processing'
+        upload.save(update_fields=['status', 'updated_at'])
+        enqueue('uploads.finalize', idempotency_key=f'upload-finalize:{upload.id}',
+                upload_id=str(upload.id))
+    upload.refresh_from_db()
+    return Response(_upload_data(upload), status=status.HTTP_202_ACCEPTED)